@@ -2,8 +2,8 @@
 # which is the Flask web service, and add all the needed configuration options
 # for this project.
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 
+from app.database import Database
 from app.functions import set_basic_configuration_and_views
 
 # Create a new Flask application
@@ -13,7 +13,8 @@ app = Flask(__name__)
 app.config.from_object('config')
 
 # Create a new database connection, we will use everywhere, using the settings in this application
-db = SQLAlchemy(app, session_options={"autoflush": False, "autocommit": False})
+# (see app/database.py for the options for many concurrent players)
+db = Database(app, session_options={"autoflush": False, "autocommit": False})
 
 # Add the configurations and functionality specific to this web service.
 set_basic_configuration_and_views(app)
\ No newline at end of file
@@ -0,0 +1,141 @@
+# Database setup for many concurrent players. The options are read from the config when the engine is created:
+#
+#     SQLITE_PRAGMAS:           the pragmas executed on every new SQLite connection, e.g. the WAL journal mode
+#                               (readers do not block the writer anymore), synchronous=NORMAL (no fsync on every
+#                               commit in WAL mode), memory mapped reading and the busy timeout (waiting for the
+#                               lock of another writer instead of failing with "database is locked").
+#     DATABASE_POOL_SIZE:       the number of connections kept open (and DATABASE_MAX_OVERFLOW more while needed).
+#                               Without it, Flask-SQLAlchemy opens a new connection for every session on SQLite.
+#     DATABASE_READ_ONLY:       use a separate engine with read only connections for the views decorated with
+#                               read_only, so they never wait for the connections of the writing views.
+#
+# Without these options, the defaults of Flask-SQLAlchemy are used.
+from functools import wraps
+
+from flask import g, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute("PRAGMA {name} = {value}".format(name=name, value=value))
+    finally:
+        cursor.close()
+
+
+def add_sqlite_pragmas(engine, pragmas):
+    """
+    Execute the pragmas (a dictionary name -> value) on every new connection of the engine, if it is a SQLite engine.
+    """
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    def connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    event.listen(engine, "connect", connect)
+
+
+def get_pool_options(config, sa_url):
+    """
+    Return the options of the connection pool described by the config (or none, if it does not describe one).
+    """
+    pool_size = config.get("DATABASE_POOL_SIZE")
+    if not pool_size:
+        return {}
+
+    options = {"poolclass": QueuePool, "pool_size": pool_size,
+               "max_overflow": config.get("DATABASE_MAX_OVERFLOW", 10),
+               "pool_timeout": config.get("DATABASE_POOL_TIMEOUT", 30)}
+
+    if sa_url.drivername == "sqlite":
+        # The connections are shared by the threads of the pool, but only used by one at a time
+        options["connect_args"] = {"check_same_thread": False}
+
+    return options
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session using the read only engine during requests to views decorated with read_only.
+    """
+    def __init__(self, db, **options):
+        self.db = db
+        SignallingSession.__init__(self, db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if has_request_context() and g.get("read_only_database", False) and \
+                self.app.config.get("DATABASE_READ_ONLY", False):
+            return self.db.get_read_only_engine(self.app)
+
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class Database(SQLAlchemy):
+    """
+    Flask-SQLAlchemy with the options for concurrent players described above.
+    """
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        config = self.get_app().config
+
+        engine_opts = dict(engine_opts)
+        engine_opts.update(get_pool_options(config, sa_url))
+
+        engine = SQLAlchemy.create_engine(self, sa_url, engine_opts)
+        add_sqlite_pragmas(engine, config.get("SQLITE_PRAGMAS"))
+
+        return engine
+
+    def get_read_only_engine(self, app=None):
+        """
+        Return the engine with the read only connections to the database of the app. It is created on first use.
+        """
+        app = self.get_app(app)
+        # The url is changed by Flask-SQLAlchemy (e.g. the absolute path of SQLite databases), so reuse it
+        url = str(self.get_engine(app).url)
+
+        url_and_engine = app.extensions.get("read_only_engine")
+        if url_and_engine is not None:
+            engine_url, engine = url_and_engine
+            if engine_url == url:
+                return engine
+            engine.dispose()
+
+        sa_url = make_url(url)
+        engine_opts = get_pool_options(app.config, sa_url)
+
+        engine = SQLAlchemy.create_engine(self, sa_url, engine_opts)
+        pragmas = dict(app.config.get("SQLITE_PRAGMAS") or {})
+        # The journal mode is stored in the database, so the read only connections must not change it
+        pragmas.pop("journal_mode", None)
+        pragmas["query_only"] = 1
+        add_sqlite_pragmas(engine, pragmas)
+
+        app.extensions["read_only_engine"] = url, engine
+        return engine
+
+
+def read_only(f):
+    """
+    Function decorator for flask routes, which only read from the database: with DATABASE_READ_ONLY in the config,
+    they use the read only engine. Use it with
+
+        @mod.route("/page/")
+        @read_only
+        def route_for_page():
+            ...
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.read_only_database = True
+        return f(*args, **kwargs)
+
+    return decorated_function
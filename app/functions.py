@@ -6,6 +6,8 @@ from urllib.parse import urlparse, urljoin
 
 from flask import session, g, flash, redirect, url_for, request, render_template
 
+from app.instrumentation import measure_template_rendering
+
 
 def set_basic_configuration_and_views(app):
     """
@@ -13,7 +15,9 @@ def set_basic_configuration_and_views(app):
         1. Add a proper error page
         2. Add the user functionality and views
         3. Add the game functionality and views
-        4. Set the start page to be game/home
+        4. Add the JSON API of the games
+        5. Add the instrumentation of the requests (only active with INSTRUMENTATION in the config)
+        6. Set the start page to be game/home
 
     :param app: Which app to configure
     """
@@ -30,6 +34,11 @@ def set_basic_configuration_and_views(app):
     from app.game.views import mod as game_module
     app.register_blueprint(game_module)
 
+    from app.game.api import mod as game_api_module
+    app.register_blueprint(game_api_module)
+
+    add_instrumentation(app)
+
     @app.route("/")
     def index():
         return redirect(url_for("game.home"))
@@ -37,19 +46,33 @@ def set_basic_configuration_and_views(app):
 
 def add_before_request(mod):
     """
-    Function to pull the current user's profile from the database before the request is treated.
+    Function to pull the current user's identity (a UserRecord, see app/users/identity.py) before the request
+    is treated. It is only loaded from the database, if it is not cached.
     It is added as a before_request function to the given blueprint module.
     """
     def before_request():
         g.user = None
         if 'user_id' in session:
-            # Do only import the User here, otherwise we will end up with cyclic dependencies.
-            from app.users.models import User
-            g.user = User.query.get(session['user_id'])
+            # Do only import the identity functions here, otherwise we will end up with cyclic dependencies.
+            from app.users.identity import get_session_user
+            g.user = get_session_user(session)
 
     mod.before_request(before_request)
 
 
+def add_instrumentation(app):
+    """
+    Function to measure every request of the app (SQL statements, template rendering and cached values) and to
+    add the page with the statistics of the measurements, see app/instrumentation.py.
+    The measurements are only done, if INSTRUMENTATION is set in the config of the app.
+    """
+    from app.instrumentation import mod as instrumentation_module, start_request, finish_request
+
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.register_blueprint(instrumentation_module)
+
+
 def requires_login(f):
     """
     Function decorator to require a logged in user before accessing a wrapped flask route.
@@ -91,10 +114,11 @@ def render_template_with_user(template_path, **kwargs):
     :param kwargs: Which other variables to replace in the template apart from the user and the download ID.
     :return: the rendered template.
     """
-    if g.user:
-        return render_template(template_path, user=g.user, **kwargs)
-    else:
-        return render_template(template_path, **kwargs)
+    with measure_template_rendering():
+        if g.user:
+            return render_template(template_path, user=g.user, **kwargs)
+        else:
+            return render_template(template_path, **kwargs)
 
 
 def is_safe_url(target):
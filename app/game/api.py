@@ -0,0 +1,167 @@
+# JSON API for clients, which render the game themselves (e.g. mobile apps).
+# The state of a game only changes with a new turn, so every response carries a strong ETag built from
+# the game, its turn number and state and the viewing user. If the client sends it back in If-None-Match and
+# the game has not changed, the answer is 304 Not Modified, which is decided from the summary of the game
+# (a single query of two columns) without loading the game.
+# Clients can also follow a game by fetching only the new turns (in the encoding of app/game/encoding.py)
+# and applying them to their own copy of the state.
+from flask import Blueprint
+from flask import Response
+from flask import jsonify
+from flask import request
+from flask import session
+
+from app import db
+from app.database import read_only
+from app.game import constants
+from app.game.encoding import encode_turn, encode_card_string
+from app.game.models import Game, Turn, UsersInGames
+from app.game.notifications import game_channels, create_game_event
+from app.game.repository import GameRepository
+
+mod = Blueprint('game_api', __name__, url_prefix='/api/game')
+
+
+def make_etag(game_id, turn_number, state, viewer_id):
+    return "{game_id}-{turn_number}-{state}-{viewer_id}".format(game_id=game_id, turn_number=turn_number,
+                                                                state=state, viewer_id=viewer_id)
+
+
+def get_card_hints_data(card_hints):
+    return {
+        "value": card_hints.value,
+        "color": card_hints.color,
+        "not_values": card_hints.get_not_values(),
+        "not_colors": card_hints.get_not_colors(),
+    }
+
+
+def get_move_data(move_number, move, hands):
+    """
+    Describe the move by the slots of the cards in the hands, so the own cards of the player are not revealed.
+    """
+    if move.type in [constants.TURN_PUT, constants.TURN_DESTROY]:
+        return {"number": move_number, "type": move.type, "slot": move_number // 2}
+
+    hand = hands[move.hint_player_index]
+    return {"number": move_number, "type": move.type, "hint_type": move.hint_type,
+            "player_index": move.hint_player_index, "slots": [hand.index(card) for card in move.cards]}
+
+
+def get_game_data(game, viewer_id):
+    """
+    Return the state of the game as seen by the user with the given id: the hands (without the own cards),
+    the hints of all cards in the hands, the card status, the counters and the moves the viewer can make.
+    """
+    game_state = game.game_state
+    hints = game_state.hints
+    hands = game_state.get_all_hands()
+
+    players = []
+    viewer_index = None
+    for player_index, (user, hand) in enumerate(zip(game.users, hands)):
+        is_viewer = user.id == viewer_id
+        if is_viewer:
+            viewer_index = player_index
+
+        players.append({
+            "id": user.id,
+            "name": user.name,
+            "cards": [{"color": None if is_viewer else card.color,
+                       "value": None if is_viewer else card.value,
+                       "hints": get_card_hints_data(hints[card])} for card in hand],
+        })
+
+    if viewer_index is not None and game.state == constants.GAME_STARTED:
+        moves = [get_move_data(move_number, move, hands)
+                 for move_number, move in enumerate(game_state.get_moves(viewer_index))]
+    else:
+        moves = []
+
+    return {
+        "game_id": game.id,
+        "turn_number": game.current_turn_number,
+        "state": game.state,
+        "current_player_index": game_state.current_player_index,
+        "number_of_hints": game.current_number_of_hints,
+        "number_of_failures": game.current_number_of_failures,
+        "start_hints": game.start_hints,
+        "start_failures": game.start_failures,
+        "cards_left": len(game_state.start_deck) - min(game_state.card_counter, len(game_state.start_deck)),
+        # The highest played value for every color, in the order of COLORS
+        "card_status": [game.card_status[color] for color in constants.COLORS],
+        "players": players,
+        "moves": moves,
+    }
+
+
+@mod.route('/<int:game_id>/state', methods=['GET'])
+@read_only
+def state(game_id):
+    # The user is only needed by its id, so there is no need to load it.
+    viewer_id = session.get("user_id")
+
+    # The game may have been changed by another process, so the turn number and state are read from the database
+    number_of_turns, game_state = db.session.query(Game.number_of_turns, Game.state).filter_by(id=game_id).one()
+    etag = make_etag(game_id, number_of_turns, game_state, viewer_id)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    game = GameRepository.load_for_view(game_id)
+    # Tell the waiting clients of this process about a turn made by another process
+    game_channels.update(create_game_event(game))
+
+    response = jsonify(get_game_data(game, viewer_id))
+    response.set_etag(make_etag(game_id, game.current_turn_number, game.state, viewer_id))
+    response.headers["Cache-Control"] = "private, no-cache"
+
+    return response.make_conditional(request)
+
+
+@mod.route('/<int:game_id>/turns', methods=['GET'])
+@read_only
+def turns(game_id):
+    """
+    Return the encoded turns of the game with a turn number of at least since (parameter), so the turns a client
+    knowing the first since turns is missing. With since=0 also the encoded start of the game is returned:
+    the start deck, the ids of the players (in the order of their index) and the start counters.
+    """
+    since = max(request.args.get("since", 0, type=int), 0)
+
+    # The turn number of the game is always read from the database, as the turns may be made by another process
+    number_of_turns, start_deck, start_hints, start_failures, start_number_of_cards = db.session.query(
+        Game.number_of_turns, Game._start_deck, Game.start_hints, Game.start_failures, Game.start_number_of_cards) \
+        .filter(Game.id == game_id).one()
+
+    data = {"game_id": game_id, "since": since, "turn_number": number_of_turns}
+
+    if since > 0 and since >= number_of_turns:
+        # Nothing new
+        data["turns"] = []
+        return jsonify(data)
+
+    # The range query uses the index on (game, turn number). Only the turns of the summary are returned,
+    # so the turns and the turn number belong together even if a new turn is stored in the meantime.
+    rows = db.session.query(Turn.type, Turn._card, Turn.hint_type, Turn._hint_user_id,
+                            Turn.last_card_drawn, Turn.put_correct, Turn.hint_restored) \
+        .filter(Turn._game_id == game_id, Turn.turn_number >= since, Turn.turn_number < number_of_turns) \
+        .order_by(Turn.turn_number).all()
+
+    user_ids = None
+    if since == 0 or any(row._hint_user_id is not None for row in rows):
+        user_ids = [user_id for user_id, in db.session.query(UsersInGames._user_id)
+                    .filter(UsersInGames._game_id == game_id).order_by(UsersInGames._user_id)]
+
+    if since == 0:
+        data["start"] = {"deck": encode_card_string(start_deck), "players": user_ids, "hints": start_hints,
+                         "failures": start_failures, "number_of_cards": start_number_of_cards}
+
+    data["turns"] = [encode_turn(row.type, encode_card_string(row._card), row.hint_type,
+                                 None if row._hint_user_id is None else user_ids.index(row._hint_user_id),
+                                 row.last_card_drawn, row.put_correct, row.hint_restored)
+                     for row in rows]
+
+    return jsonify(data)
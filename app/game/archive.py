@@ -0,0 +1,304 @@
+# Columnar archive of finished (won or lost) games for analytics, which scans millions of turns without the ORM.
+# The archive is a directory with one file per column. Every file is a plain little-endian array of fixed width
+# values, so it can be mapped into memory with numpy.memmap:
+#
+#     games.<column>: one value per game (GAME_COLUMNS)
+#     turns.<column>: one value per turn (TURN_COLUMNS), the turns of a game are stored in order of their
+#                     turn numbers and refer to their game by its index in the game columns (game_index)
+#
+# The card of a turn is stored like in the record format (see app/game/records.py): the id of the put or destroyed
+# card, the hinted color or value of a positive hint and NONE_BYTE otherwise. The flags are the bits FLAG_* of
+# app/game/encoding.py. archive.json stores the number of games and turns in the columns. It is replaced only after
+# all columns of a chunk of games are written, so values after these numbers (e.g. of an interrupted run) are ignored
+# and overwritten by the next run.
+# Writing the archive only needs the standard library, reading it needs numpy. Archive games with
+#
+#     python -m app.game.archive --directory archive --delete
+import argparse
+import json
+import os
+import struct
+import tempfile
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from app import db
+from app.game import constants
+from app.game.encoding import encode_flags, FLAG_PUT_CORRECT
+from app.game.models import Game, GameSnapshot, Turn, UsersInGames, CARDS_BY_STRING
+from app.game.records import get_card_byte, iter_game_chunks, NONE_BYTE, EPOCH
+
+ARCHIVE_VERSION = 1
+META_FILE_NAME = "archive.json"
+
+# Name and format (of the struct module, which is understood by numpy as well) of every column
+GAME_COLUMNS = [("game_id", "I"), ("number_of_players", "B"), ("number_of_turns", "H"), ("state", "B"),
+                ("score", "B"), ("start_hints", "h"), ("start_failures", "h"), ("failures_left", "h"),
+                ("started", "d")]
+TURN_COLUMNS = [("game_index", "I"), ("turn_number", "H"), ("type", "B"), ("player", "B"), ("hint_player", "B"),
+                ("card", "B"), ("hint_type", "b"), ("flags", "B")]
+
+
+def get_column_file_name(directory, table, column):
+    return os.path.join(directory, "{table}.{column}".format(table=table, column=column))
+
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, META_FILE_NAME)) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return {"version": ARCHIVE_VERSION, "number_of_games": 0, "number_of_turns": 0}
+
+    if meta["version"] != ARCHIVE_VERSION:
+        raise ValueError("Unknown version of the game archive: " + str(meta["version"]))
+    return meta
+
+
+def write_meta(directory, meta):
+    file_descriptor, temporary_file_name = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with open(file_descriptor, "w") as f:
+        json.dump(meta, f)
+    os.replace(temporary_file_name, os.path.join(directory, META_FILE_NAME))
+
+
+class ColumnWriter:
+    """
+    Appends values to the files of the columns of one table (games or turns).
+    """
+    def __init__(self, directory, table, columns, number_of_rows):
+        self.columns = columns
+        self._files = []
+
+        for column, column_format in columns:
+            f = open(get_column_file_name(directory, table, column), "a+b")
+            # Drop everything written after the last complete chunk
+            f.truncate(number_of_rows * struct.calcsize("<" + column_format))
+            self._files.append(f)
+
+    def write(self, rows):
+        """
+        Append the rows (tuples with one value per column) to the column files.
+        """
+        for f, (column, column_format), values in zip(self._files, self.columns, zip(*rows)):
+            f.write(struct.pack("<{count}{format}".format(count=len(values), format=column_format), *values))
+
+    def flush(self):
+        for f in self._files:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        for f in self._files:
+            f.close()
+
+
+def read_archived_game_ids(directory, number_of_games):
+    try:
+        with open(get_column_file_name(directory, "games", "game_id"), "rb") as f:
+            data = f.read(number_of_games * 4)
+    except FileNotFoundError:
+        return set()
+    return set(struct.unpack("<{count}I".format(count=number_of_games), data))
+
+
+def delete_games(game_ids):
+    """
+    Delete the games with the given ids together with their turns, users and snapshots (without loading them).
+    """
+    for model in [Turn, UsersInGames, GameSnapshot]:
+        db.session.query(model).filter(model._game_id.in_(game_ids)).delete(synchronize_session=False)
+    db.session.query(Game).filter(Game.id.in_(game_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def get_turn_rows(game_index, user_ids, turns):
+    number_of_players = len(user_ids)
+
+    for turn in turns:
+        cards = [CARDS_BY_STRING[card_string] for card_string in turn._card.split(",")] if turn._card else []
+        yield (game_index, turn.turn_number, turn.type, turn.turn_number % number_of_players,
+               NONE_BYTE if turn._hint_user_id is None else user_ids.index(turn._hint_user_id),
+               get_card_byte(turn.type, cards, turn.hint_type), turn.hint_type,
+               encode_flags(turn.last_card_drawn, turn.put_correct, turn.hint_restored))
+
+
+def archive_games(directory, query=None, chunk_size=1000, delete=False):
+    """
+    Append the finished games of the query to the archive in the directory (which is created if needed).
+    Games, which are already in the archive, are not added again.
+
+    :param directory: The directory of the archive.
+    :param query: A query for Games. Defaults to all won or lost games.
+    :param chunk_size: The number of games to read at once.
+    :param delete: Delete the archived games from the database, so they are moved into the archive.
+    :return: The number of newly archived games.
+    """
+    if query is None:
+        query = Game.query.filter(Game.state.in_([constants.GAME_WON, constants.GAME_LOST]))
+
+    os.makedirs(directory, exist_ok=True)
+    meta = read_meta(directory)
+    archived_game_ids = read_archived_game_ids(directory, meta["number_of_games"])
+
+    game_writer = ColumnWriter(directory, "games", GAME_COLUMNS, meta["number_of_games"])
+    turn_writer = ColumnWriter(directory, "turns", TURN_COLUMNS, meta["number_of_turns"])
+    number_of_archived_games = 0
+
+    try:
+        # The query is read in chunks by increasing game ids, so deleting the archived games does not disturb it
+        for games, user_ids_by_game_id, turns_by_game_id in iter_game_chunks(query, chunk_size):
+            game_rows, turn_rows = [], []
+
+            for game in games:
+                if game.id in archived_game_ids:
+                    continue
+
+                user_ids = user_ids_by_game_id[game.id]
+                turns = turns_by_game_id[game.id]
+                game_index = meta["number_of_games"] + len(game_rows)
+
+                game_rows.append((game.id, len(user_ids), len(turns), game.state, game.score, game.start_hints,
+                                  game.start_failures, game.failures_left, (game.started - EPOCH).total_seconds()))
+                turn_rows.extend(get_turn_rows(game_index, user_ids, turns))
+
+            if game_rows:
+                game_writer.write(game_rows)
+                turn_writer.write(turn_rows)
+                game_writer.flush()
+                turn_writer.flush()
+
+                meta["number_of_games"] += len(game_rows)
+                meta["number_of_turns"] += len(turn_rows)
+                write_meta(directory, meta)
+
+                archived_game_ids.update(row[0] for row in game_rows)
+                number_of_archived_games += len(game_rows)
+
+            if delete:
+                delete_games([game.id for game in games])
+    finally:
+        game_writer.close()
+        turn_writer.close()
+
+    return number_of_archived_games
+
+
+class GameArchive:
+    """
+    Read only view on an archive, with its columns mapped into memory as numpy arrays (in games and turns,
+    by their column names). All statistics take an optional boolean mask of the games to use (see get_game_mask).
+    """
+    def __init__(self, directory):
+        if numpy is None:
+            raise RuntimeError("Reading the game archive needs numpy.")
+
+        meta = read_meta(directory)
+        self.number_of_games = meta["number_of_games"]
+        self.number_of_turns = meta["number_of_turns"]
+
+        self.games = {column: self._map_column(directory, "games", column, column_format, self.number_of_games)
+                      for column, column_format in GAME_COLUMNS}
+        self.turns = {column: self._map_column(directory, "turns", column, column_format, self.number_of_turns)
+                      for column, column_format in TURN_COLUMNS}
+
+    @staticmethod
+    def _map_column(directory, table, column, column_format, length):
+        dtype = numpy.dtype("<" + column_format)
+        # Empty files can not be mapped
+        if length == 0:
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.memmap(get_column_file_name(directory, table, column), dtype=dtype, mode="r", shape=(length, ))
+
+    def get_game_mask(self, state=None, number_of_players=None):
+        """
+        Return the boolean mask of the games with the given state and number of players (None for all).
+        """
+        mask = numpy.ones(self.number_of_games, dtype=bool)
+        if state is not None:
+            mask &= self.games["state"] == state
+        if number_of_players is not None:
+            mask &= self.games["number_of_players"] == number_of_players
+        return mask
+
+    def get_turn_mask(self, game_mask=None, turn_type=None):
+        """
+        Return the boolean mask of the turns of the games in the game mask with the given type (None for all).
+        """
+        if game_mask is None:
+            mask = numpy.ones(self.number_of_turns, dtype=bool)
+        else:
+            mask = game_mask[self.turns["game_index"]]
+
+        if turn_type is not None:
+            mask &= self.turns["type"] == turn_type
+        return mask
+
+    def get_turn_type_counts(self, game_mask=None):
+        """
+        Return the number of turns by their type.
+        """
+        counts = numpy.bincount(self.turns["type"][self.get_turn_mask(game_mask)], minlength=3)
+        return {turn_type: int(counts[turn_type])
+                for turn_type in [constants.TURN_PUT, constants.TURN_DESTROY, constants.TURN_HINT]}
+
+    def get_hint_usage(self, game_mask=None):
+        """
+        Return the share of the hints of all turns.
+        """
+        number_of_turns = numpy.count_nonzero(self.get_turn_mask(game_mask))
+        if number_of_turns == 0:
+            return 0.0
+        return numpy.count_nonzero(self.get_turn_mask(game_mask, constants.TURN_HINT)) / number_of_turns
+
+    def get_number_of_failures(self, game_mask=None):
+        """
+        Return the number of put cards, which were not correct (so start_failures - Game.current_number_of_failures
+        summed over the games).
+        """
+        put_mask = self.get_turn_mask(game_mask, constants.TURN_PUT)
+        return int(numpy.count_nonzero(put_mask & (self.turns["flags"] & FLAG_PUT_CORRECT == 0)))
+
+    def get_failure_rate(self, game_mask=None):
+        """
+        Return the share of the put cards, which were not correct.
+        """
+        number_of_puts = numpy.count_nonzero(self.get_turn_mask(game_mask, constants.TURN_PUT))
+        if number_of_puts == 0:
+            return 0.0
+        return self.get_number_of_failures(game_mask) / number_of_puts
+
+    def get_score_distribution(self, game_mask=None):
+        """
+        Return the number of games by their score.
+        """
+        scores = self.games["score"] if game_mask is None else self.games["score"][game_mask]
+        counts = numpy.bincount(scores)
+        return {score: int(count) for score, count in enumerate(counts) if count}
+
+    def get_mean_score(self, game_mask=None):
+        scores = self.games["score"] if game_mask is None else self.games["score"][game_mask]
+        if len(scores) == 0:
+            return 0.0
+        return float(scores.mean())
+
+
+def main():
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Move finished games into the columnar game archive.")
+    parser.add_argument("--directory", required=True, help="Directory of the archive.")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Number of games to read at once.")
+    parser.add_argument("--delete", action="store_true", help="Delete the archived games from the database.")
+    args = parser.parse_args()
+
+    with app.app_context():
+        number_of_games = archive_games(args.directory, chunk_size=args.chunk_size, delete=args.delete)
+    print("Archived {number} games.".format(number=number_of_games))
+
+
+if __name__ == '__main__':
+    main()
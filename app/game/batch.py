@@ -0,0 +1,145 @@
+# Run large numbers of simulated games (see app.game.simulation) in parallel on a pool of processes.
+# Every game gets its own seed, which only depends on the master seed and the number of the game,
+# so the results are reproducible for a given master seed, no matter how many processes are used.
+# Only the aggregated results of each shard of games are sent back from the worker processes.
+# Run it from the command line with
+#
+#     python -m app.game.batch --games 100000 --workers 8 --seed 42
+import argparse
+import hashlib
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app.game.simulation import BOTS, play_game
+
+
+def get_game_seed(master_seed, game_number):
+    """
+    Return the seed of the game with the given number.
+    """
+    seed_string = "{master_seed}:{game_number}".format(master_seed=master_seed, game_number=game_number)
+    return int.from_bytes(hashlib.sha256(seed_string.encode()).digest()[:8], "big")
+
+
+class SimulationResults:
+    """
+    Aggregated results of a number of simulated games: the distributions of the scores, the loss reasons
+    and the number of turns. Results of different shards can be merged.
+    """
+    def __init__(self):
+        self.number_of_games = 0
+        self.scores = Counter()
+        self.loss_reasons = Counter()
+        self.turns = Counter()
+
+    def add_game(self, simulated_game):
+        self.number_of_games += 1
+        self.scores[simulated_game.score] += 1
+        self.turns[simulated_game.game_state.turn_number] += 1
+        if simulated_game.loss_reason:
+            self.loss_reasons[simulated_game.loss_reason] += 1
+
+    def merge(self, other):
+        self.number_of_games += other.number_of_games
+        self.scores.update(other.scores)
+        self.loss_reasons.update(other.loss_reasons)
+        self.turns.update(other.turns)
+
+    @property
+    def mean_score(self):
+        return sum(score * count for score, count in self.scores.items()) / self.number_of_games
+
+    @property
+    def mean_turns(self):
+        return sum(turns * count for turns, count in self.turns.items()) / self.number_of_games
+
+    def __eq__(self, other):
+        return (isinstance(other, SimulationResults) and self.number_of_games == other.number_of_games and
+                self.scores == other.scores and self.loss_reasons == other.loss_reasons and
+                self.turns == other.turns)
+
+
+def run_shard(bot_name, number_of_players, master_seed, first_game_number, last_game_number):
+    """
+    Play the games with the numbers first_game_number to last_game_number (exclusive) and return
+    their aggregated results. This is the function executed in the worker processes.
+    """
+    bot_class = BOTS[bot_name]
+    results = SimulationResults()
+
+    for game_number in range(first_game_number, last_game_number):
+        random_generator = random.Random(get_game_seed(master_seed, game_number))
+        results.add_game(play_game(bot_class, number_of_players, random_generator))
+
+    return results
+
+
+def iter_shard_results(number_of_games, bot_name="cautious", number_of_players=2, master_seed=0,
+                       workers=None, shard_size=1000):
+    """
+    Distribute the games in shards over a pool of processes and yield the results of every shard
+    as soon as it is finished (in no particular order).
+
+    :param number_of_games: The number of games to play.
+    :param bot_name: The name of the bot (see app.game.simulation.BOTS) playing all players.
+    :param number_of_players: The number of players in every game.
+    :param master_seed: The seed all game seeds are derived from.
+    :param workers: The number of processes. Defaults to the number of CPUs.
+    :param shard_size: The number of games played by a process in one go.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_shard, bot_name, number_of_players, master_seed,
+                                   first_game_number, min(first_game_number + shard_size, number_of_games))
+                   for first_game_number in range(0, number_of_games, shard_size)]
+
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def run_games(number_of_games, **kwargs):
+    """
+    Play the games in parallel (see iter_shard_results for the arguments) and return the merged results.
+    """
+    results = SimulationResults()
+
+    for shard_results in iter_shard_results(number_of_games, **kwargs):
+        results.merge(shard_results)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play simulated games in parallel.")
+    parser.add_argument("--games", type=int, default=10000, help="Number of games to play.")
+    parser.add_argument("--players", type=int, default=2, choices=[2, 3, 4], help="Number of players per game.")
+    parser.add_argument("--bot", default="cautious", choices=sorted(BOTS), help="The bot playing all players.")
+    parser.add_argument("--seed", type=int, default=0, help="Master seed of all games.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of processes.")
+    parser.add_argument("--shard-size", type=int, default=1000, help="Number of games per shard.")
+    args = parser.parse_args()
+
+    results = SimulationResults()
+
+    start_time = time.perf_counter()
+    for shard_results in iter_shard_results(args.games, bot_name=args.bot, number_of_players=args.players,
+                                            master_seed=args.seed, workers=args.workers,
+                                            shard_size=args.shard_size):
+        results.merge(shard_results)
+
+        duration = time.perf_counter() - start_time
+        print("{done}/{total} games, {rate:.1f} games/s, mean score {score:.2f}".format(
+            done=results.number_of_games, total=args.games, rate=results.number_of_games / duration,
+            score=results.mean_score))
+
+    print("Scores: " + ", ".join("{}: {}".format(score, count) for score, count in sorted(results.scores.items())))
+    print("Losses: " + ", ".join("{}: {}".format(reason, count)
+                                 for reason, count in sorted(results.loss_reasons.items())))
+    print("Turns per game: mean {mean:.1f}, min {min}, max {max}".format(
+        mean=results.mean_turns, min=min(results.turns), max=max(results.turns)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Compact encoding of games, which lets clients (or other tools) rebuild the state of a game themselves.
+# Cards are encoded by their ids (see Card.get_id), the start deck as the list of the ids of its cards
+# and every turn as the list
+#
+#     [type, [card ids], hint type, index of the player receiving the hint (or -1), flags]
+#
+# where the flags are the bits FLAG_*. The player making a turn is not stored, as it is always the player with
+# the index turn number % number of players. Applying the turns in order of their turn numbers to a GameState
+# built from the start deck gives the state of the game.
+from collections import namedtuple
+
+from app.game.models import Card, CARDS_BY_STRING
+from app.game.state import GameState
+
+FLAG_LAST_CARD_DRAWN = 1
+FLAG_PUT_CORRECT = 2
+FLAG_HINT_RESTORED = 4
+
+NO_PLAYER = -1
+
+# A decoded turn, which can be applied to a game state.
+DecodedTurn = namedtuple("DecodedTurn", ["type", "cards", "hint_type", "hint_player_index",
+                                         "last_card_drawn", "put_correct", "hint_restored"])
+
+
+def encode_flags(last_card_drawn, put_correct, hint_restored):
+    return ((FLAG_LAST_CARD_DRAWN if last_card_drawn else 0) |
+            (FLAG_PUT_CORRECT if put_correct else 0) |
+            (FLAG_HINT_RESTORED if hint_restored else 0))
+
+
+def encode_card_string(card_string):
+    """
+    Encode the comma separated cards of the _card column (as stored for Turns) into the list of their ids.
+    """
+    if not card_string:
+        return []
+    return [CARDS_BY_STRING[single_card_string].id for single_card_string in card_string.split(",")]
+
+
+def encode_start_deck(start_deck):
+    return [card.id for card in start_deck]
+
+
+def decode_start_deck(card_ids):
+    return [Card.from_id(card_id) for card_id in card_ids]
+
+
+def encode_turn(turn_type, card_ids, hint_type, hint_player_index, last_card_drawn, put_correct, hint_restored):
+    """
+    Encode a turn into a list (see above).
+
+    :param card_ids: The ids of the cards of the turn.
+    :param hint_player_index: The index of the player receiving the hint or None.
+    """
+    return [turn_type, list(card_ids), hint_type, NO_PLAYER if hint_player_index is None else hint_player_index,
+            encode_flags(last_card_drawn, put_correct, hint_restored)]
+
+
+def decode_turn(encoded_turn):
+    turn_type, card_ids, hint_type, hint_player_index, flags = encoded_turn
+
+    return DecodedTurn(turn_type, [Card.from_id(card_id) for card_id in card_ids], hint_type,
+                       None if hint_player_index == NO_PLAYER else hint_player_index,
+                       bool(flags & FLAG_LAST_CARD_DRAWN), bool(flags & FLAG_PUT_CORRECT),
+                       bool(flags & FLAG_HINT_RESTORED))
+
+
+def apply_encoded_turns(game_state, encoded_turns):
+    """
+    Apply the encoded turns, which must follow directly after the turns already applied to the game state.
+    """
+    for encoded_turn in encoded_turns:
+        turn = decode_turn(encoded_turn)
+        game_state.apply(turn.type, game_state.current_player_index, turn.cards,
+                         put_correct=turn.put_correct, hint_restored=turn.hint_restored,
+                         last_card_drawn=turn.last_card_drawn, hint_type=turn.hint_type)
+
+
+def build_game_state(encoded_start, encoded_turns):
+    """
+    Build the game state out of the encoded start of a game (see the turns API) and its encoded turns.
+    """
+    game_state = GameState(decode_start_deck(encoded_start["deck"]), len(encoded_start["players"]),
+                           encoded_start["number_of_cards"], encoded_start["hints"], encoded_start["failures"])
+    apply_encoded_turns(game_state, encoded_turns)
+
+    return game_state
@@ -1,51 +1,218 @@
+import time
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize"])
+
+# Separates the positional from the keyword arguments in a cache key.
+KWARGS_MARK = object()
+
+# Function called with (qualified name of the decorated function, duration in seconds) after every computation
+# of a cached value, see set_computation_observer.
+_computation_observer = None
+
+
+def set_computation_observer(observer):
+    """
+    Set the function, which is told about the duration of every computation of a value of a CachedClassFunction
+    or CachedClassProperty (cache hits are not reported). The duration includes the computations of other cached
+    values needed for it. Use None to remove it.
+    """
+    global _computation_observer
+    _computation_observer = observer
+
+
+class IdentityKey:
+    """
+    Cache key for arguments, that can not be hashed: they are compared by their identity.
+    The key holds a reference to the argument, so its id can not be reused while it is cached.
+    """
+    __slots__ = ("_obj",)
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __hash__(self):
+        return id(self._obj)
+
+    def __eq__(self, other):
+        return isinstance(other, IdentityKey) and self._obj is other._obj
+
+
+class InstanceCache:
+    """
+    The cached values of one decorated function for one instance,
+    together with the version stamp they were calculated for.
+    """
+    __slots__ = ("values", "version")
+
+    def __init__(self, maxsize):
+        self.values = OrderedDict() if maxsize else {}
+        self.version = None
+
+
+def get_instance_caches(instance):
+    """
+    Return the dictionary function name -> InstanceCache stored on the instance.
+    It is stored in the attribute _memo, so classes using __slots__ need to have a slot with this name.
+    """
+    try:
+        return instance._memo
+    except AttributeError:
+        caches = {}
+        # Use object.__setattr__ to also work for immutable classes.
+        object.__setattr__(instance, "_memo", caches)
+        return caches
+
+
+def make_key(args, kwargs):
+    """
+    Build the cache key out of the arguments: hashable arguments are compared by their hash and equality,
+    all others by their identity. No argument is ever converted into a string.
+    """
+    if kwargs:
+        args += (KWARGS_MARK,)
+        for name in sorted(kwargs):
+            args += (name, kwargs[name])
+
+    try:
+        hash(args)
+        return args
+    except TypeError:
+        return tuple(arg if _is_hashable(arg) else IdentityKey(arg) for arg in args)
+
+
+def _is_hashable(obj):
+    try:
+        hash(obj)
+        return True
+    except TypeError:
+        return False
+
+
 class CachedClassFunction:
-    def __init__(self, variable_name=None):
-        self._variable_value = None
+    """
+    Decorator to memoize a method per instance. Use it with
+
+        class Game:
+            @CachedClassFunction("current_turn_number", maxsize=4)
+            def get_possible_turns(self, user):
+                ...
+
+    The cached values are stored on the instance itself (see get_instance_caches), so they are never
+    shared between two instances.
+
+    :param variable_name: Name of an attribute of the instance, which is used as a version stamp.
+        Whenever its value changes, all values cached for this instance are dropped.
+    :param maxsize: If given, at most this number of values is cached per instance and the least recently
+        used ones are dropped first.
+    """
+    def __init__(self, variable_name=None, maxsize=None):
         self._variable_name = variable_name
+        self._maxsize = maxsize
+
+        self.hits = 0
+        self.misses = 0
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self._maxsize)
 
     def invalidate_cache(self, instance):
-        instance._cache = {}
-        self._variable_value = None
+        get_instance_caches(instance).pop(self.f.__name__, None)
 
-    def __call__(self, f):
-        self.f = f
+    def set_cache(self, instance, value, *args, **kwargs):
+        """
+        Store the value for the given arguments of the instance, e.g. because it was already loaded elsewhere.
+        """
+        self.get_cache(instance).values[make_key(args, kwargs)] = value
 
-        def wrapped_f(instance, *args, **kwargs):
+    def is_cached(self, instance, *args, **kwargs):
+        """
+        Return whether there is a cached value for the given arguments of the instance.
+        """
+        return make_key(args, kwargs) in self.get_cache(instance).values
 
-            args_string = str(args)
-            kwargs_string = str(kwargs)
+    def get_cache(self, instance):
+        caches = get_instance_caches(instance)
+        name = self.f.__name__
 
-            if self._variable_name:
-                current_variable_value = getattr(instance, self._variable_name)
-                if self._variable_value and current_variable_value != self._variable_value:
-                    self.invalidate_cache(instance)
+        try:
+            cache = caches[name]
+        except KeyError:
+            cache = caches[name] = InstanceCache(self._maxsize)
 
-                self._variable_value = current_variable_value
+        if self._variable_name:
+            current_variable_value = getattr(instance, self._variable_name)
+            if current_variable_value != cache.version:
+                cache.values.clear()
+                cache.version = current_variable_value
 
-            try:
-                cache = getattr(instance, "_cache_" + f.__name__)
-            except AttributeError:
-                setattr(instance, "_cache_" + f.__name__, {})
-                cache = getattr(instance, "_cache_" + f.__name__)
+        return cache
+
+    def __call__(self, f):
+        self.f = f
+
+        def wrapped_f(instance, *args, **kwargs):
+            values = self.get_cache(instance).values
+            key = make_key(args, kwargs)
 
             try:
-                value = cache[(args_string, kwargs_string)]
+                value = values[key]
             except KeyError:
-                value = f(instance, *args, **kwargs)
-                cache[(args_string, kwargs_string)] = value
+                self.misses += 1
+
+                observer = _computation_observer
+                if observer is None:
+                    value = f(instance, *args, **kwargs)
+                else:
+                    start_time = time.perf_counter()
+                    value = f(instance, *args, **kwargs)
+                    observer(f.__qualname__, time.perf_counter() - start_time)
+
+                values[key] = value
+                if self._maxsize and len(values) > self._maxsize:
+                    values.popitem(last=False)
+            else:
+                self.hits += 1
+                if self._maxsize:
+                    values.move_to_end(key)
+
             return value
 
         wrapped_f.__name__ = f.__name__
         wrapped_f.__doc__ = f.__doc__
         wrapped_f.__module__ = f.__module__
 
+        wrapped_f.cache_info = self.cache_info
+        wrapped_f.invalidate_cache = self.invalidate_cache
+        wrapped_f.set_cache = self.set_cache
+        wrapped_f.is_cached = self.is_cached
+
         return wrapped_f
 
 
 class CachedClassProperty(CachedClassFunction):
+    """
+    Decorator to memoize a property per instance. See CachedClassFunction for the parameters.
+    """
+    _fset = None
+
     def __call__(self, f):
         self._wrapped_f = CachedClassFunction.__call__(self, f)
+        self.__doc__ = f.__doc__
+        return self
+
+    def setter(self, fset):
+        self._fset = fset
         return self
 
     def __get__(self, inst, owner):
+        if inst is None:
+            return self
+
         return self._wrapped_f(inst)
+
+    def __set__(self, inst, value):
+        if self._fset is None:
+            raise AttributeError("can't set attribute")
+
+        self._fset(inst, value)
@@ -5,10 +5,22 @@ from datetime import datetime
 from app import db
 import app.game.constants as constants
 from app.game.functions import CachedClassProperty, CachedClassFunction
+from app.game.state import GameState, card_can_generate_hint
 from app.users.models import User
 
 
 class Card:
+    """
+    A single card of the game. There are exactly 50 different cards, each one with a unique id from 0 to 49.
+    All cards are created once as immutable singletons in the table CARDS, so creating, parsing
+    and comparing cards does neither allocate new objects nor compare more than a single integer.
+    """
+    __slots__ = ("_id", "_color", "_value", "_uniqueness_value", "_string", "_memo")
+
+    # The ids are ordered by color, value and uniqueness value: every color has 10 cards.
+    CARDS_PER_COLOR = 10
+    FIRST_ID_OF_VALUE = {1: 0, 2: 3, 3: 5, 4: 7, 5: 9}
+
     @staticmethod
     def how_many_cards_per_value(value):
         if value == 1:
@@ -33,24 +45,60 @@ class Card:
         else:
             raise KeyError(color)
 
+    @staticmethod
+    def get_id(color, value, uniqueness_value):
+        return color * Card.CARDS_PER_COLOR + Card.FIRST_ID_OF_VALUE[value] + uniqueness_value
+
+    @staticmethod
+    def from_id(card_id):
+        return CARDS[card_id]
+
     @staticmethod
     def from_string(card_string):
-        color = int(card_string[0])
-        value = int(card_string[1])
-        uniqueness_value = int(card_string[2])
-        new_card = Card(color, value, uniqueness_value)
+        try:
+            return CARDS_BY_STRING[card_string]
+        except KeyError:
+            # Not a valid card string: let the constructor tell what is wrong with it.
+            color = int(card_string[0])
+            value = int(card_string[1])
+            uniqueness_value = int(card_string[2])
+            return Card(color, value, uniqueness_value)
+
+    def __new__(cls, color, value, uniqueness_value):
+        color = int(color)
+        value = int(value)
+        uniqueness_value = int(uniqueness_value)
+
+        assert color in constants.COLORS
+        assert value in constants.VALUES
+
+        assert uniqueness_value in range(Card.how_many_cards_per_value(value))
+
+        return CARDS[Card.get_id(color, value, uniqueness_value)]
+
+    @classmethod
+    def _create(cls, color, value, uniqueness_value):
+        new_card = object.__new__(cls)
+
+        object.__setattr__(new_card, "_id", Card.get_id(color, value, uniqueness_value))
+        object.__setattr__(new_card, "_color", color)
+        object.__setattr__(new_card, "_value", value)
+        object.__setattr__(new_card, "_uniqueness_value", uniqueness_value)
+        object.__setattr__(new_card, "_string", "{color}{value}{uniqueness_value}".format(
+            color=color, value=value, uniqueness_value=uniqueness_value))
 
         return new_card
 
-    def __init__(self, color, value, uniqueness_value):
-        self._color = int(color)
-        self._value = int(value)
-        self._uniqueness_value = int(uniqueness_value)
+    def __setattr__(self, key, value):
+        raise AttributeError("Cards are immutable.")
 
-        assert self._color in constants.COLORS
-        assert self._value in constants.VALUES
+    def __reduce__(self):
+        # Keep the cards singletons also when they are pickled or copied.
+        return Card.from_id, (self._id,)
 
-        assert self._uniqueness_value in range(Card.how_many_cards_per_value(self._value))
+    @property
+    def id(self):
+        return self._id
 
     @property
     def color(self):
@@ -66,25 +114,62 @@ class Card:
 
     @CachedClassProperty()
     def color_string(self):
-        return self.color_to_string(self.color)
+        return self.color_to_string(self._color)
 
-    @CachedClassFunction()
     def __str__(self):
-        return "{self.color}{self.value}{self.uniqueness_value}".format(self=self)
+        return self._string
 
-    @CachedClassFunction()
     def __repr__(self):
-        return str(self)
+        return self._string
+
+    def __hash__(self):
+        return self._id
 
     def __eq__(self, other):
         if isinstance(other, Card):
-            return (self.value == other.value and self.color == other.color and
-                    self.uniqueness_value == other.uniqueness_value)
+            return self._id == other._id
         else:
             return self == Card.from_string(str(other))
 
     def __lt__(self, other):
-        return str(self) <= str(other)
+        if isinstance(other, Card):
+            return self._id < other._id
+        else:
+            return self < Card.from_string(str(other))
+
+
+# All 50 cards of the game, indexed by their id.
+CARDS = tuple(sorted((Card._create(color, value, uniqueness_value)
+                      for color in constants.COLORS
+                      for value in constants.VALUES
+                      for uniqueness_value in range(Card.how_many_cards_per_value(value))),
+                     key=lambda card: card.id))
+CARDS_BY_STRING = {str(card): card for card in CARDS}
+
+# Store a snapshot of the game state after every this number of turns
+SNAPSHOT_INTERVAL = 20
+
+# Number of turns fetched from the database at once, when they are streamed for a replay
+TURN_BATCH_SIZE = 500
+
+
+def replay_turn_rows(game_state, turn_rows, player_index_by_user_id, on_turn=None):
+    """
+    Apply the turns given as rows of plain columns (with at least type, _user_id, _card, hint_type,
+    last_card_drawn, put_correct and hint_restored) in their order to the game state. The rows are only
+    iterated once, so they can be streamed from the database.
+
+    :param player_index_by_user_id: The index of every user in the game.
+    :param on_turn: If given, it is called with the game state after every turn.
+    """
+    for turn in turn_rows:
+        cards = [CARDS_BY_STRING[card_string] for card_string in turn._card.split(",")] if turn._card else []
+        game_state.apply(turn.type, player_index_by_user_id[turn._user_id], cards,
+                         put_correct=turn.put_correct, hint_restored=turn.hint_restored,
+                         last_card_drawn=turn.last_card_drawn, hint_type=turn.hint_type)
+
+        if on_turn is not None:
+            on_turn(game_state)
 
 
 class Game(db.Model):
@@ -98,13 +183,29 @@ class Game(db.Model):
     start_number_of_cards = db.Column(db.Integer, nullable=False)
 
     _start_player_id = db.Column(db.Integer, db.ForeignKey(User.id), nullable=False)
-    start_player = db.relationship(User, backref=db.backref("games_started", uselist=True, cascade='delete,all'))
+    start_player = db.relationship(User, backref=db.backref("games_started", uselist=True, cascade='delete,all'),
+                                   foreign_keys=[_start_player_id])
 
     state = db.Column(db.Integer(), nullable=False, default=constants.GAME_CREATED)
 
+    # Summary of the current game state, updated together with every new turn (see update_summary),
+    # so listings of games do not need to look into the turns.
+    number_of_turns = db.Column(db.Integer, nullable=False, default=0)
+    hints_left = db.Column(db.Integer, nullable=True)
+    failures_left = db.Column(db.Integer, nullable=True)
+    score = db.Column(db.Integer, nullable=False, default=0)
+    _current_player_id = db.Column(db.Integer, db.ForeignKey(User.id), nullable=True)
+    current_player = db.relationship(User, foreign_keys=[_current_player_id])
+    last_activity = db.Column(db.DateTime, nullable=True)
+
+    # Incremented with every update of the game. An update only succeeds, if the version is still the one the game
+    # was loaded with (otherwise a StaleDataError is raised), so two concurrent turns can not both be stored.
+    version = db.Column(db.Integer, nullable=False, default=1)
+    __mapper_args__ = {"version_id_col": version}
+
     @staticmethod
     def card_can_generate_hint(card):
-        return card.value == 5
+        return card_can_generate_hint(card)
 
     @staticmethod
     def get_start_number_of_cards_for_players(player_number):
@@ -119,15 +220,15 @@ class Game(db.Model):
             raise AttributeError("Invalid number of players.")
 
     @staticmethod
-    def get_random_start_deck():
-        all_cards = []
+    def get_random_start_deck(random_generator=random):
+        """
+        Return all cards in a random order.
 
-        for color in constants.COLORS:
-            for value in constants.VALUES:
-                for uniqueness_value in range(Card.how_many_cards_per_value(value)):
-                    all_cards.append(Card(color, value, uniqueness_value))
+        :param random_generator: The random.Random instance (or module) to shuffle the cards with.
+        """
+        all_cards = list(CARDS)
 
-        random.shuffle(all_cards)
+        random_generator.shuffle(all_cards)
 
         return all_cards
 
@@ -138,13 +239,28 @@ class Game(db.Model):
         self.start_number_of_cards = start_number_of_cards
 
         for user in users:
-            self.to_users.append(UsersInGames(self, user))
+            # The relation is added to self.to_users by its backref
+            UsersInGames(self, user)
 
         self._start_deck = ",".join(map(str, start_deck))
 
-    @CachedClassProperty()
+        # A new game does not have any turns, so there is no need to look for them.
+        Game.played_turns.set_cache(self, [])
+
+        # Without any turns, the summary is known without the game state. The current player is the first user
+        # by id, so it is only known if all users are stored already. Otherwise it is set by update_summary,
+        # when the game is started.
+        self.number_of_turns = 0
+        self.hints_left = start_hints
+        self.failures_left = start_failures
+        self.score = 0
+        if users and all(user.id is not None for user in users):
+            self.current_player = min(users, key=lambda user: user.id)
+        self.last_activity = datetime.now()
+
+    @property
     def current_turn_number(self):
-        return Turn.query.filter_by(game=self).count()
+        return self.game_state.turn_number
 
     @property
     def state_string(self):
@@ -161,230 +277,271 @@ class Game(db.Model):
 
     @CachedClassProperty()
     def users(self):
-        return [relation.user for relation in self.to_users]
+        # Ordered by their id, the same way the relation is loaded from the database
+        return sorted((relation.user for relation in self.to_users), key=lambda user: user.id)
 
     @CachedClassProperty()
     def start_deck(self):
-        return [Card.from_string(card_string) for card_string in self._start_deck.split(",")]
+        return [CARDS_BY_STRING[card_string] for card_string in self._start_deck.split(",")]
 
     @CachedClassProperty()
     def played_turns(self):
-        return Turn.query.filter_by(game=self).all()
+        return Turn.query.filter_by(game=self).order_by(Turn.turn_number, Turn.id).all()
 
     @CachedClassProperty()
-    def current_user(self):
-        users = self.users
-        return users[self.current_turn_number % len(users)]
+    def game_state(self):
+        """
+        The state of the game after all played turns. If the turns are already loaded, it is built in a single
+        pass over them, otherwise from the last snapshot and the turns after it (see load_game_state).
+        Use add_turn to advance it instead of rebuilding it.
+        """
+        if self.id is not None and not Game.played_turns.is_cached(self):
+            return self.load_game_state()
 
-    @CachedClassProperty()
-    def current_number_of_failures(self):
-        number_of_failures = self.start_failures
-        number_of_failures -= Turn.query.filter_by(game=self, type=constants.TURN_PUT, put_correct=False).count()
+        users = self.users
+        player_index_by_user_id = {user.id: index for index, user in enumerate(users)}
 
-        return number_of_failures
+        game_state = GameState(self.start_deck, len(users), self.start_number_of_cards,
+                               self.start_hints, self.start_failures)
 
-    @CachedClassProperty()
-    def current_number_of_hints(self):
-        number_of_hints = self.start_hints
-        number_of_hints += Turn.query.filter_by(game=self, hint_restored=True).count()
-        number_of_hints -= Turn.query.filter_by(game=self, type=constants.TURN_HINT).count()
+        for turn in self.played_turns:
+            game_state.apply_turn(turn, player_index_by_user_id[turn._user_id])
 
-        return number_of_hints
+        return game_state
 
-    @CachedClassProperty()
-    def next_card(self):
-        # Startup: everyone needs cards...
-        card_counter = len(self.users) * self.start_number_of_cards
+    def load_game_state(self, turn_number=None):
+        """
+        Build the state of the game after the given number of turns (defaults to all) from the database:
+        start with the last snapshot before and only replay the turns after it.
+        """
+        snapshot_query = GameSnapshot.query.filter(GameSnapshot._game_id == self.id)
+        if turn_number is not None:
+            snapshot_query = snapshot_query.filter(GameSnapshot.turn_number <= turn_number)
 
-        # Every put or destroy leads to a new card...
-        turns = filter(lambda turn: turn.type in [constants.TURN_PUT, constants.TURN_DESTROY], self.played_turns)
-        card_counter += len(list(turns))
+        snapshot = snapshot_query.order_by(GameSnapshot.turn_number.desc()).first()
 
-        if card_counter > len(self.start_deck) - 1:
-            return None
+        if snapshot:
+            game_state = GameState.from_bytes(snapshot.data, self.start_deck)
         else:
-            return self.start_deck[card_counter]
+            game_state = GameState(self.start_deck, len(self.users), self.start_number_of_cards,
+                                   self.start_hints, self.start_failures)
 
-    @CachedClassProperty()
+        player_index_by_user_id = {user.id: index for index, user in enumerate(self.users)}
+        replay_turn_rows(game_state, self.iter_turn_rows(game_state.turn_number, turn_number),
+                         player_index_by_user_id)
+
+        return game_state
+
+    def iter_turn_rows(self, from_turn_number=0, to_turn_number=None, batch_size=TURN_BATCH_SIZE):
+        """
+        Stream the turns of the game with from_turn_number <= turn number < to_turn_number (None for all after)
+        ordered by their turn number as rows of plain columns (see replay_turn_rows), without creating Turns.
+        Only batch_size rows are fetched at once.
+        """
+        turn_query = db.session.query(Turn.turn_number, Turn.type, Turn._user_id, Turn._card, Turn.hint_type,
+                                      Turn._hint_user_id, Turn.last_card_drawn, Turn.put_correct,
+                                      Turn.hint_restored) \
+            .filter(Turn._game_id == self.id, Turn.turn_number >= from_turn_number)
+
+        if to_turn_number is not None:
+            turn_query = turn_query.filter(Turn.turn_number < to_turn_number)
+
+        return turn_query.order_by(Turn.turn_number).yield_per(batch_size)
+
+    def add_turn(self, turn):
+        """
+        Record a new turn of this game: advance the game state by it instead of recomputing it.
+        Every SNAPSHOT_INTERVAL turns, a snapshot of the new state is stored together with the game.
+        The turn still needs to be added to the session (and flushed before the played turns are loaded).
+        """
+        game_state = self.game_state
+        if Game.played_turns.is_cached(self):
+            self.played_turns.append(turn)
+        game_state.apply_turn(turn, self.users.index(turn.user))
+
+        if game_state.turn_number % SNAPSHOT_INTERVAL == 0:
+            GameSnapshot(self, game_state)
+
+    @property
+    def current_user(self):
+        return self.users[self.game_state.current_player_index]
+
+    @property
+    def current_number_of_failures(self):
+        return self.game_state.number_of_failures
+
+    @property
+    def current_number_of_hints(self):
+        return self.game_state.number_of_hints
+
+    @property
+    def next_card(self):
+        return self.game_state.next_card
+
+    @property
     def card_status(self):
         """
         Return the current status of the played card as a dictionary
-        color -> last played value. Does only look into the turns,
-        that are already on the database.
+        color -> last played value.
         """
-        card_status = {color: 0 for color in constants.COLORS}
+        return self.game_state.card_status
 
-        for turn in self.played_turns:
-            if turn.put_correct:
-                played_card = turn.cards[0]
-                card_status[played_card.color] = played_card.value
+    def update_summary(self, last_activity=None):
+        """
+        Copy the current game state into the summary columns of the game.
 
-        return card_status
+        :param last_activity: The time of the last turn. Defaults to now.
+        """
+        game_state = self.game_state
 
-    def update_game_status(self):
-        # the users have lost when they made too many mistakes
-        if self.current_number_of_failures < 1:
-            self.state = constants.GAME_LOST
-            return True
+        self.number_of_turns = game_state.turn_number
+        self.hints_left = game_state.number_of_hints
+        self.failures_left = game_state.number_of_failures
+        self.score = sum(game_state.card_status.values())
+        self.current_player = self.current_user
+        self.last_activity = last_activity or datetime.now()
 
-        not_finished_cards = filter(lambda value: value != 5, self.card_status.values())
-        if not not_finished_cards:
-            self.state = constants.GAME_WON
-            return True
+    def update_game_status(self):
+        game_status = self.game_state.get_status()
 
-        turns_after_last_card = Turn.query.filter_by(game=self, last_card_drawn=True).count()
-        if turns_after_last_card > len(self.users):
-            self.state = constants.GAME_LOST
+        if game_status != constants.GAME_STARTED:
+            self.state = game_status
             return True
 
         return False
 
     def card_fits_good(self, card):
-        card_status = self.card_status
+        return self.game_state.card_fits_good(card)
 
-        return card_status[card.color] == card.value - 1
+    @property
+    def hints_by_card(self):
+        """
+        The HintIndex with all hints given in this game.
+        """
+        return self.game_state.hints
 
     def get_hints_for_card(self, card):
-        all_hints = Turn.query.filter_by(game=self, type=constants.TURN_HINT).all()
+        card_hints = self.hints_by_card[card]
 
         # Exactly 4 slots: Hint for value, hint for color, hint for not value, hint for not color
         return_hints = ["", "", "", ""]
 
-        filtered_hints = list(filter(lambda h: card in h.cards, all_hints))
-        for hint in filtered_hints:
-            if hint.hint_type == constants.HINT_VALUE:
-                return_hints[0] = "Value is " + str(hint.hint_value)
-            elif hint.hint_type == constants.HINT_COLOR:
-                return_hints[1] = "Color is " + Card.color_to_string(hint.hint_color)
-            elif hint.hint_type in constants.HINT_NOT_VALUE.values():
-                if not return_hints[3]:
-                    return_hints[2] = "Value is not "
-                else:
-                    return_hints[2] += " or "
-                return_hints[2] += str(hint.hint_value)
-            elif hint.hint_type in constants.HINT_NOT_COLOR.values():
-                if not return_hints[3]:
-                    return_hints[3] = "Color is not "
-                else:
-                    return_hints[3] += " or "
-
-                return_hints[3] += Card.color_to_string(hint.hint_color)
+        if card_hints.value is not None:
+            return_hints[0] = "Value is " + str(card_hints.value)
+        if card_hints.color is not None:
+            return_hints[1] = "Color is " + Card.color_to_string(card_hints.color)
+        if card_hints.not_values:
+            return_hints[2] = "Value is not " + " or ".join(map(str, card_hints.get_not_values()))
+        if card_hints.not_colors:
+            return_hints[3] = "Color is not " + " or ".join(map(Card.color_to_string, card_hints.get_not_colors()))
 
         return return_hints
 
-    @CachedClassFunction()
     def get_cards_of_user(self, user):
-        start_deck = self.start_deck
-        card_counter = 0
-
-        cards_of_user = []
-
-        # First, give the start cards to the user
-        user_index = self.users.index(user)
-        for counter in range(self.start_number_of_cards):
-            cards_of_user.append(start_deck[len(self.users) * counter + user_index])
+        return self.game_state.get_hand(self.users.index(user))
 
-        card_counter += self.start_number_of_cards * len(self.users)
-
-        # Then check every other turns: if it is a put or destroy term, the given card is deleted from the user and
-        # he will get the next one. If the user is not involved, remember to still keep on counting cards.
-        turns = list(filter(lambda turn: turn.type in [constants.TURN_PUT, constants.TURN_DESTROY], self.played_turns))
-
-        for turn in turns:
-            if turn.user == user:
-                assert len(turn.cards) == 1
-
-                del cards_of_user[cards_of_user.index(turn.cards[0])]
-
-                # here we allow the users to go on playing even if there are no more cards (which is possible)
-                if card_counter < len(start_deck):
-                    cards_of_user.append(start_deck[card_counter])
-
-            card_counter += 1
-
-        return cards_of_user
+    def get_all_hands(self):
+        """
+        Return the cards of all users of the game, in the order of the users.
+        """
+        return self.game_state.get_all_hands()
 
-    @CachedClassFunction()
+    @CachedClassFunction("current_turn_number", maxsize=4)
     def get_possible_turns(self, user):
-        possible_turns = []
-
-        current_turn_number = self.current_turn_number
-
+        """
+        Return the PossibleTurns of the user in the current state, indexed by their possibility number.
+        """
         # Making turns downs only make sense if the game is running
         if self.state != constants.GAME_STARTED:
-            return possible_turns
+            return PossibleTurns(self, user, None, 0)
 
         # Comment: we do not test for the current user as it may be needed to show the hints also for other players.
+        player_index = self.users.index(user)
+        # The user may only be a UserRecord (see app/users/identity.py), but the turns need the User of the game
+        return PossibleTurns(self, self.users[player_index], player_index,
+                             self.game_state.get_number_of_moves(player_index))
+
+
+class GameSnapshot(db.Model):
+    """
+    The state of a game after a number of turns (see GameState.to_bytes), so the state of long games can be
+    built from the last snapshot and the turns after it instead of replaying all turns.
+    """
+    __tablename__ = "game_snapshots"
+    __table_args__ = (
+        db.Index("ix_game_snapshots_game_turn_number", "_game_id", "turn_number", unique=True),
+    )
 
-        # Putting down cards is only possible for the cards the user owns
-        # Destroying a card is only possible for the cards the user owns
-        for card in self.get_cards_of_user(user):
-            put_turn = PossibleTurn(self, user, constants.TURN_PUT, current_turn_number, len(possible_turns))
-            put_turn.cards = card
-
-            possible_turns.append(put_turn)
+    id = db.Column(db.Integer, primary_key=True)
 
-            destroy_turn = PossibleTurn(self, user, constants.TURN_DESTROY, current_turn_number, len(possible_turns))
-            destroy_turn.cards = card
+    _game_id = db.Column(db.Integer, db.ForeignKey(Game.id), nullable=False)
+    game = db.relationship(Game, backref=db.backref("snapshots", lazy="dynamic", cascade='delete,all'))
+    turn_number = db.Column(db.Integer, nullable=False)
 
-            possible_turns.append(destroy_turn)
+    data = db.Column(db.LargeBinary, nullable=False)
 
-        # A hint can only be given if there are hint left
-        if self.current_number_of_hints > 0:
+    def __init__(self, game, game_state):
+        self.game = game
+        self.turn_number = game_state.turn_number
+        self.data = game_state.to_bytes()
 
-            # Giving a hint is only possible to all other users
-            for other_user in self.users:
-                if other_user == user:
-                    continue
 
-                # There are four hint types
-                # (a) A color hint, (b) A not-color hint
-                other_users_cards = self.get_cards_of_user(other_user)
-                for color in constants.COLORS:
-                    cards_with_this_color = list(
-                        filter(lambda card: card.color == color, other_users_cards))
+class PossibleTurns:
+    """
+    The possible turns of a user in one state of a game. The game state only enumerates the moves by their
+    numbers, the PossibleTurn objects are only created for the turns, which are really accessed.
+    """
+    def __init__(self, game, user, player_index, number_of_moves):
+        self.game = game
+        self.user = user
+        self.player_index = player_index
+        self.turn_number = game.current_turn_number
 
-                    turn = PossibleTurn(self, user, constants.TURN_HINT, current_turn_number, len(possible_turns))
-                    turn.hint_user = other_user
+        self._number_of_moves = number_of_moves
+        self._turns = {}
 
-                    if cards_with_this_color:
-                        turn.cards = cards_with_this_color
-                        turn.hint_type = constants.HINT_COLOR
-                    else:
-                        turn.cards = other_users_cards
-                        turn.hint_type = constants.HINT_NOT_COLOR[color]
+    def __len__(self):
+        return self._number_of_moves
 
-                    possible_turns.append(turn)
+    def __getitem__(self, possibility_number):
+        if not 0 <= possibility_number < self._number_of_moves:
+            raise IndexError("Turn is not possible.")
 
-                # (c) A value hint, (d) A not-value hint
-                for value in constants.VALUES:
-                    cards_with_this_value = list(filter(lambda card: card.value == value,
-                                                        other_users_cards))
+        try:
+            return self._turns[possibility_number]
+        except KeyError:
+            pass
 
-                    turn = PossibleTurn(self, user, constants.TURN_HINT, current_turn_number, len(possible_turns))
-                    turn.hint_user = other_user
+        game_state = self.game.game_state
+        if game_state.turn_number != self.turn_number:
+            raise RuntimeError("The game has changed since the possible turns were created.")
 
-                    if cards_with_this_value:
-                        turn.cards = cards_with_this_value
-                        turn.hint_type = constants.HINT_VALUE
-                    else:
-                        turn.cards = other_users_cards
-                        turn.hint_type = constants.HINT_NOT_VALUE[value]
+        move = game_state.get_move(self.player_index, possibility_number)
+        turn = self._turns[possibility_number] = PossibleTurn.from_move(self.game, self.user, self.turn_number,
+                                                                        possibility_number, move)
+        return turn
 
-                    possible_turns.append(turn)
+    def __iter__(self):
+        for possibility_number in range(self._number_of_moves):
+            yield self[possibility_number]
 
-        for turn in possible_turns:
-            turn.set_turn_properties()
+    def for_card(self, card):
+        """
+        Return the possible turns including the given card, e.g. to show them next to the card.
+        """
+        if not self._number_of_moves:
+            return []
 
-        return possible_turns
+        return [self[possibility_number]
+                for possibility_number in self.game.game_state.get_move_numbers_for_card(self.player_index, card)]
 
 
 class TurnBaseObject:
-    @property
+    @CachedClassProperty("_card")
     def cards(self):
         if self._card is None or self._card == "":
             return []
-        return [Card.from_string(card) for card in self._card.split(",")]
+        return [CARDS_BY_STRING[card] for card in self._card.split(",")]
 
     @cards.setter
     def cards(self, card_or_cards):
@@ -461,6 +618,11 @@ class TurnBaseObject:
 
 class Turn(db.Model, TurnBaseObject):
     __tablename__ = "turns"
+    __table_args__ = (
+        # Every game is replayed by its turn numbers, which must be unique
+        db.Index("ix_turns_game_turn_number", "_game_id", "turn_number", unique=True),
+        db.Index("ix_turns_game_type", "_game_id", "type"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.Integer, nullable=False)
@@ -470,7 +632,8 @@ class Turn(db.Model, TurnBaseObject):
                            foreign_keys=[_user_id])
 
     _game_id = db.Column(db.Integer, db.ForeignKey(Game.id), nullable=False)
-    game = db.relationship(Game, backref=db.backref("turns_in_game", uselist=True, cascade='delete,all'))
+    game = db.relationship(Game, backref=db.backref("turns_in_game", uselist=True, cascade='delete,all',
+                                                    order_by="[Turn.turn_number, Turn.id]"))
     turn_number = db.Column(db.Integer, nullable=False)
 
     _card = db.Column(db.String(100), nullable=False, default="")
@@ -520,6 +683,26 @@ class PossibleTurn(TurnBaseObject):
 
         self.hint_user = None
 
+    @staticmethod
+    def from_move(game, user, turn_number, possibility_number, move):
+        """
+        Create the possible turn for a Move of the game state (see GameState.get_move).
+        """
+        turn = PossibleTurn(game, user, move.type, turn_number, possibility_number)
+
+        turn._card = ",".join(map(str, move.cards))
+        # The cards are already known, so there is no need to parse them back from the string
+        TurnBaseObject.cards.set_cache(turn, list(move.cards))
+
+        turn.hint_type = move.hint_type
+        if move.hint_player_index is not None:
+            turn.hint_user = game.users[move.hint_player_index]
+
+        turn.last_card_drawn, turn.put_correct, turn.hint_restored = \
+            game.game_state.get_turn_properties(move.type, move.cards)
+
+        return turn
+
     @CachedClassProperty()
     def turn_string(self):
         if self.type == constants.TURN_DESTROY:
@@ -543,27 +726,21 @@ class PossibleTurn(TurnBaseObject):
             raise ValueError("Invalid turn type.")
 
     def set_turn_properties(self):
-        game = self.game
-
-        if game.next_card is None:
-            self.last_card_drawn = True
-
-        if self.type == constants.TURN_DESTROY:
-            if game.current_number_of_hints < game.start_hints:
-                self.hint_restored = True
-        elif self.type == constants.TURN_PUT:
-            if game.card_fits_good(self.cards[0]):
-                self.put_correct = True
-                if game.card_can_generate_hint(self.cards[0]):
-                    self.hint_restored = True
+        self.last_card_drawn, self.put_correct, self.hint_restored = \
+            self.game.game_state.get_turn_properties(self.type, self.cards)
 
 
 class UsersInGames(db.Model):
     __tablename__ = "users_to_games"
+    __table_args__ = (
+        # The primary key starts with the game, so we need a separate index for the games of a user
+        db.Index("ix_users_to_games_user", "_user_id"),
+    )
     _game_id = db.Column(db.Integer, db.ForeignKey(Game.id), primary_key=True)
     _user_id = db.Column(db.Integer, db.ForeignKey(User.id), primary_key=True)
 
-    game = db.relationship(Game, backref=db.backref("to_users", uselist=True, cascade="delete,all"))
+    game = db.relationship(Game, backref=db.backref("to_users", uselist=True, cascade="delete,all",
+                                                    order_by=_user_id))
     user = db.relationship(User, backref=db.backref("to_games", uselist=True, cascade="delete,all"))
 
     def __init__(self, game, user):
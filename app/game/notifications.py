@@ -0,0 +1,105 @@
+# In-process publish/subscribe for game events, so waiting players are told about new turns
+# instead of reloading the game page over and over again.
+# Every game has its own channel, which only stores the last published event. Waiting is done with a
+# threading.Condition, so when the server runs under gevent (see run.py) every idle connection only
+# needs a greenlet instead of a thread. Events are only delivered to clients of the same process, so turns made
+# by other processes are only found by reading the summary of the game from the database again (see update).
+import threading
+from collections import namedtuple
+
+# The summary of a game sent to the clients.
+GameEvent = namedtuple("GameEvent", ["game_id", "turn_number", "state", "current_player_id", "current_player"])
+
+
+def create_game_event(game):
+    """
+    Create the event for the current state of the given game.
+    """
+    current_user = game.current_user
+    return GameEvent(game.id, game.current_turn_number, game.state,
+                     current_user.id if current_user else None, current_user.name if current_user else None)
+
+
+class GameChannel:
+    """
+    The channel of a single game: the last event and a condition to wait for the next one.
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.event = None
+
+
+class GameChannels:
+    """
+    Registry of the channels of all games.
+    """
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def _get_channel(self, game_id):
+        with self._lock:
+            try:
+                return self._channels[game_id]
+            except KeyError:
+                channel = self._channels[game_id] = GameChannel()
+                return channel
+
+    def get_event(self, game_id):
+        """
+        Return the last event of the game or None, if there was none in this process.
+        """
+        return self._get_channel(game_id).event
+
+    def set_initial_event(self, event):
+        """
+        Store the event (e.g. loaded from the database) for its game, if nothing was published for it so far.
+        Nobody is notified. Returns the event of the channel afterwards.
+        """
+        channel = self._get_channel(event.game_id)
+
+        with channel.condition:
+            if channel.event is None:
+                channel.event = event
+            return channel.event
+
+    def update(self, event):
+        """
+        Publish the event (e.g. loaded from the database, where it may have been stored by another process),
+        if it differs from the last event of its game. Returns the event of the channel afterwards.
+        """
+        channel = self._get_channel(event.game_id)
+
+        with channel.condition:
+            if channel.event != event:
+                channel.event = event
+                channel.condition.notify_all()
+            return channel.event
+
+    def publish(self, event):
+        """
+        Store the event for its game and wake up everyone waiting for it.
+        """
+        channel = self._get_channel(event.game_id)
+
+        with channel.condition:
+            channel.event = event
+            channel.condition.notify_all()
+
+    def wait_for_change(self, game_id, known_event, timeout):
+        """
+        Wait until an event other than known_event is published for the game or until the timeout (in seconds)
+        is over, and return the last event of the game then (which is known_event after a timeout).
+        """
+        channel = self._get_channel(game_id)
+
+        with channel.condition:
+            channel.condition.wait_for(lambda: channel.event is not known_event, timeout)
+            return channel.event
+
+    def clear(self):
+        with self._lock:
+            self._channels.clear()
+
+
+game_channels = GameChannels()
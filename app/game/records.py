@@ -0,0 +1,312 @@
+# Binary record format to archive games and to export/import many of them at once.
+# A file starts with a header (FILE_HEADER_FORMAT: magic bytes and version) and then contains one record per game:
+#
+#     game header (GAME_HEADER_FORMAT), the user ids of the players (4 bytes each, ordered like Game.users),
+#     the start deck (one byte per card id) and 4 bytes per turn (TURN_FORMAT).
+#
+# A turn consists of the type and flags (type + flags << 2, with the flags of app/game/encoding.py), the hint type,
+# the index of the player receiving the hint and one byte for the card: the id of the put or destroyed card or
+# the hinted color or value of a positive hint. The player making the turn and the cards of a hint are not stored,
+# as they follow from replaying the game.
+# Both export_games and import_games work in chunks of games, so their memory usage does not depend on the number
+# of games. Only plain columns are read and written, no ORM objects.
+import struct
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from app import db
+from app.game import constants
+from app.game.encoding import DecodedTurn, encode_flags, FLAG_LAST_CARD_DRAWN, FLAG_PUT_CORRECT, \
+    FLAG_HINT_RESTORED
+from app.game.models import Game, GameSnapshot, Turn, UsersInGames, Card, CARDS_BY_STRING, SNAPSHOT_INTERVAL
+from app.game.state import GameState
+
+RECORD_FORMAT_MAGIC = b"HNBR"
+RECORD_FORMAT_VERSION = 2
+
+FILE_HEADER_FORMAT = struct.Struct("<4sB")
+# Number of players, start number of cards, start hints, start failures, game state, start time (seconds since
+# the epoch), length of the start deck, number of turns, index of the start player in the user ids
+GAME_HEADER_FORMAT = struct.Struct("<BBhhBdBHB")
+# Version 1 did not store the start player, so it is the first user of those games
+GAME_HEADER_FORMAT_V1 = struct.Struct("<BBhhBdBH")
+USER_ID_FORMAT = struct.Struct("<I")
+TURN_FORMAT = struct.Struct("<BbBB")
+
+NONE_BYTE = 255
+
+EPOCH = datetime(1970, 1, 1)
+
+# A game read from a record file. The turns are the packed bytes of TURN_FORMAT.
+GameRecord = namedtuple("GameRecord", ["user_ids", "start_deck", "start_number_of_cards", "start_hints",
+                                       "start_failures", "state", "started", "turns", "start_player_index"])
+
+
+class RecordFormatError(ValueError):
+    pass
+
+
+def get_card_byte(turn_type, cards, hint_type):
+    """
+    Return the byte describing the cards of a turn: the card id for put and destroy turns, the hinted color or value
+    for positive hints and NONE_BYTE for negative hints.
+    """
+    if turn_type in [constants.TURN_PUT, constants.TURN_DESTROY]:
+        return cards[0].id
+    elif hint_type == constants.HINT_COLOR:
+        return cards[0].color
+    elif hint_type == constants.HINT_VALUE:
+        return cards[0].value
+    else:
+        return NONE_BYTE
+
+
+def encode_turn_record(turn_type, cards, hint_type, hint_player_index, last_card_drawn, put_correct, hint_restored):
+    return TURN_FORMAT.pack(turn_type | (encode_flags(last_card_drawn, put_correct, hint_restored) << 2), hint_type,
+                            NONE_BYTE if hint_player_index is None else hint_player_index,
+                            get_card_byte(turn_type, cards, hint_type))
+
+
+def decode_turn_record(game_state, turn_bytes):
+    """
+    Decode the packed turn, which is the next one in the given game state (needed to find the cards of hints).
+    """
+    type_and_flags, hint_type, hint_player_index, card_byte = TURN_FORMAT.unpack(turn_bytes)
+    turn_type, flags = type_and_flags & 3, type_and_flags >> 2
+
+    if turn_type in [constants.TURN_PUT, constants.TURN_DESTROY]:
+        cards = [Card.from_id(card_byte)]
+    else:
+        hint_players_cards = game_state.get_hand(hint_player_index)
+        if hint_type == constants.HINT_COLOR:
+            cards = [card for card in hint_players_cards if card.color == card_byte]
+        elif hint_type == constants.HINT_VALUE:
+            cards = [card for card in hint_players_cards if card.value == card_byte]
+        else:
+            cards = hint_players_cards
+
+    return DecodedTurn(turn_type, cards, hint_type, None if hint_player_index == NONE_BYTE else hint_player_index,
+                       bool(flags & FLAG_LAST_CARD_DRAWN), bool(flags & FLAG_PUT_CORRECT),
+                       bool(flags & FLAG_HINT_RESTORED))
+
+
+def iter_replayed_turns(game_record):
+    """
+    Replay the game of the record and yield (player index, decoded turn, game state after the turn)
+    for every turn. The game state is always the same object.
+    """
+    game_state = GameState(game_record.start_deck, len(game_record.user_ids), game_record.start_number_of_cards,
+                           game_record.start_hints, game_record.start_failures)
+
+    for offset in range(0, len(game_record.turns), TURN_FORMAT.size):
+        turn = decode_turn_record(game_state, game_record.turns[offset:offset + TURN_FORMAT.size])
+        player_index = game_state.current_player_index
+
+        game_state.apply(turn.type, player_index, turn.cards, put_correct=turn.put_correct,
+                         hint_restored=turn.hint_restored, last_card_drawn=turn.last_card_drawn,
+                         hint_type=turn.hint_type)
+
+        yield player_index, turn, game_state
+
+
+def write_game_record(fileobj, game_record):
+    fileobj.write(GAME_HEADER_FORMAT.pack(len(game_record.user_ids), game_record.start_number_of_cards,
+                                          game_record.start_hints, game_record.start_failures, game_record.state,
+                                          (game_record.started - EPOCH).total_seconds(),
+                                          len(game_record.start_deck), len(game_record.turns) // TURN_FORMAT.size,
+                                          game_record.start_player_index))
+    fileobj.write(b"".join(USER_ID_FORMAT.pack(user_id) for user_id in game_record.user_ids))
+    fileobj.write(bytes(card.id for card in game_record.start_deck))
+    fileobj.write(game_record.turns)
+
+
+def _read_exactly(fileobj, size):
+    data = fileobj.read(size)
+    if len(data) != size:
+        raise RecordFormatError("Unexpected end of the record file.")
+    return data
+
+
+def iter_game_records(fileobj):
+    """
+    Read the header of the record file and yield the GameRecords in it one by one.
+    """
+    magic, version = FILE_HEADER_FORMAT.unpack(_read_exactly(fileobj, FILE_HEADER_FORMAT.size))
+    if magic != RECORD_FORMAT_MAGIC:
+        raise RecordFormatError("Not a game record file.")
+    if version not in [1, RECORD_FORMAT_VERSION]:
+        raise RecordFormatError("Unknown version of the game record format: " + str(version))
+    game_header_format = GAME_HEADER_FORMAT_V1 if version == 1 else GAME_HEADER_FORMAT
+
+    while True:
+        header = fileobj.read(game_header_format.size)
+        if not header:
+            return
+        if len(header) != game_header_format.size:
+            raise RecordFormatError("Unexpected end of the record file.")
+
+        header_values = game_header_format.unpack(header)
+        (number_of_players, start_number_of_cards, start_hints, start_failures, state, started, deck_size,
+         number_of_turns) = header_values[:8]
+        start_player_index = header_values[8] if version > 1 else 0
+
+        user_ids = [user_id for user_id, in USER_ID_FORMAT.iter_unpack(
+            _read_exactly(fileobj, number_of_players * USER_ID_FORMAT.size))]
+        start_deck = [Card.from_id(card_id) for card_id in _read_exactly(fileobj, deck_size)]
+        turns = _read_exactly(fileobj, number_of_turns * TURN_FORMAT.size)
+
+        yield GameRecord(user_ids, start_deck, start_number_of_cards, start_hints, start_failures, state,
+                         EPOCH + timedelta(seconds=started), turns, start_player_index)
+
+
+def iter_game_chunks(query, chunk_size):
+    """
+    Read the games of the query in chunks (ordered by their id) using only plain columns, and yield for every
+    chunk (game rows, user ids by game id, turn rows by game id). The user ids are ordered like Game.users and
+    the turns by their turn number.
+    """
+    query = query.with_entities(Game.id, Game._start_deck, Game.start_number_of_cards, Game.start_hints,
+                                Game.start_failures, Game.state, Game.started, Game.score, Game.failures_left,
+                                Game._start_player_id) \
+        .order_by(None).order_by(Game.id)
+    last_game_id = None
+
+    while True:
+        chunk_query = query if last_game_id is None else query.filter(Game.id > last_game_id)
+        games = chunk_query.limit(chunk_size).all()
+        if not games:
+            return
+
+        game_ids = [game.id for game in games]
+
+        user_ids_by_game_id = {game_id: [] for game_id in game_ids}
+        for game_id, user_id in db.session.query(UsersInGames._game_id, UsersInGames._user_id) \
+                .filter(UsersInGames._game_id.in_(game_ids)).order_by(UsersInGames._user_id):
+            user_ids_by_game_id[game_id].append(user_id)
+
+        turns_by_game_id = {game_id: [] for game_id in game_ids}
+        for turn in db.session.query(Turn._game_id, Turn.turn_number, Turn.type, Turn._card, Turn._user_id,
+                                     Turn.hint_type, Turn._hint_user_id, Turn.last_card_drawn, Turn.put_correct,
+                                     Turn.hint_restored) \
+                .filter(Turn._game_id.in_(game_ids)).order_by(Turn._game_id, Turn.turn_number):
+            turns_by_game_id[turn._game_id].append(turn)
+
+        yield games, user_ids_by_game_id, turns_by_game_id
+        last_game_id = games[-1].id
+
+
+def export_games(query, fileobj, chunk_size=1000):
+    """
+    Write the games of the given query (e.g. Game.query.filter(...)) into the file object in the record format.
+
+    :param query: A query for Games. It is read in chunks ordered by the game ids.
+    :param fileobj: The binary file object to write to.
+    :param chunk_size: The number of games to read at once.
+    :return: The number of exported games.
+    """
+    fileobj.write(FILE_HEADER_FORMAT.pack(RECORD_FORMAT_MAGIC, RECORD_FORMAT_VERSION))
+    number_of_games = 0
+
+    for games, user_ids_by_game_id, turns_by_game_id in iter_game_chunks(query, chunk_size):
+        for game in games:
+            user_ids = user_ids_by_game_id[game.id]
+            turns = []
+
+            for turn in turns_by_game_id[game.id]:
+                cards = [CARDS_BY_STRING[card_string] for card_string in turn._card.split(",")] if turn._card else []
+                turns.append(encode_turn_record(
+                    turn.type, cards, turn.hint_type,
+                    None if turn._hint_user_id is None else user_ids.index(turn._hint_user_id),
+                    turn.last_card_drawn, turn.put_correct, turn.hint_restored))
+
+            start_deck = [CARDS_BY_STRING[card_string] for card_string in game._start_deck.split(",")]
+            write_game_record(fileobj, GameRecord(user_ids, start_deck, game.start_number_of_cards, game.start_hints,
+                                                  game.start_failures, game.state, game.started, b"".join(turns),
+                                                  user_ids.index(game._start_player_id)))
+
+        number_of_games += len(games)
+
+    return number_of_games
+
+
+def _insert_chunk(connection, game_records):
+    """
+    Insert the games of the records with all their turns, users and snapshots, using one executemany per table
+    (apart from the games themselves, as their new ids are needed).
+    """
+    turn_rows, user_rows, snapshot_rows = [], [], []
+
+    for game_record in game_records:
+        user_ids = game_record.user_ids
+
+        game_state = None
+        turns_of_game, snapshots_of_game = [], []
+        for turn_number, (player_index, turn, game_state) in enumerate(iter_replayed_turns(game_record)):
+            turns_of_game.append({
+                "turn_number": turn_number, "type": turn.type, "_user_id": user_ids[player_index],
+                "_card": ",".join(map(str, turn.cards)), "hint_type": turn.hint_type,
+                "_hint_user_id": None if turn.hint_player_index is None else user_ids[turn.hint_player_index],
+                "last_card_drawn": turn.last_card_drawn, "put_correct": turn.put_correct,
+                "hint_restored": turn.hint_restored,
+            })
+            if game_state.turn_number % SNAPSHOT_INTERVAL == 0:
+                snapshots_of_game.append({"turn_number": game_state.turn_number, "data": game_state.to_bytes()})
+
+        if game_state is None:
+            game_state = GameState(game_record.start_deck, len(user_ids), game_record.start_number_of_cards,
+                                   game_record.start_hints, game_record.start_failures)
+
+        game_id = connection.execute(Game.__table__.insert().values(
+            _start_deck=",".join(map(str, game_record.start_deck)), started=game_record.started,
+            start_failures=game_record.start_failures, start_hints=game_record.start_hints,
+            start_number_of_cards=game_record.start_number_of_cards,
+            _start_player_id=user_ids[game_record.start_player_index],
+            state=game_record.state, number_of_turns=game_state.turn_number,
+            hints_left=game_state.number_of_hints, failures_left=game_state.number_of_failures,
+            score=sum(game_state.card_status.values()),
+            _current_player_id=user_ids[game_state.current_player_index],
+            last_activity=game_record.started)).inserted_primary_key[0]
+
+        for row in turns_of_game + snapshots_of_game:
+            row["_game_id"] = game_id
+
+        turn_rows.extend(turns_of_game)
+        snapshot_rows.extend(snapshots_of_game)
+        user_rows.extend({"_game_id": game_id, "_user_id": user_id} for user_id in user_ids)
+
+    if turn_rows:
+        connection.execute(Turn.__table__.insert(), turn_rows)
+    if user_rows:
+        connection.execute(UsersInGames.__table__.insert(), user_rows)
+    if snapshot_rows:
+        connection.execute(GameSnapshot.__table__.insert(), snapshot_rows)
+
+
+def import_games(fileobj, chunk_size=1000):
+    """
+    Read the games from the record file and insert them as new games (with new ids) into the database.
+    The users of the games must already exist with the same ids. Every chunk of games is inserted in its own
+    transaction.
+
+    :param fileobj: The binary file object to read from.
+    :param chunk_size: The number of games to insert at once.
+    :return: The number of imported games.
+    """
+    number_of_games = 0
+    chunk = []
+
+    for game_record in iter_game_records(fileobj):
+        chunk.append(game_record)
+
+        if len(chunk) >= chunk_size:
+            with db.engine.begin() as connection:
+                _insert_chunk(connection, chunk)
+            number_of_games += len(chunk)
+            chunk = []
+
+    if chunk:
+        with db.engine.begin() as connection:
+            _insert_chunk(connection, chunk)
+        number_of_games += len(chunk)
+
+    return number_of_games
@@ -0,0 +1,246 @@
+# Cache for the rendered content of the game page.
+# The page of a game only changes with a new turn (or when the game is started), but it is requested over and
+# over again by all players waiting for their turn. So the rendered content is stored under the key
+# (game id, turn number, game state, id of the viewing user) and served from the cache until the next turn.
+# The backend is chosen in the config with RENDER_CACHE_BACKEND:
+#
+#     "memory": in the memory of the process (default)
+#     "file":   one file per page in the directory RENDER_CACHE_PATH
+#     "sqlite": in the SQLite database RENDER_CACHE_PATH (separate from the main database)
+#     None:     no caching at all
+#
+# All backends drop the least recently used pages, if there are more than RENDER_CACHE_SIZE. The sqlite backend
+# only stores the time of the last use again, if the stored one is older than RENDER_CACHE_REFRESH_INTERVAL
+# seconds, so most cache hits do not need to write (and wait for the write lock of the database).
+import glob
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+
+from flask import current_app
+
+
+def make_key(game_id, turn_number, state, viewer_id):
+    return game_id, turn_number, state, viewer_id
+
+
+class NullRenderCache:
+    """
+    Render cache, which does not cache anything.
+    """
+    def get(self, key):
+        return None
+
+    def set(self, key, content):
+        pass
+
+    def invalidate_game(self, game_id):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryRenderCache:
+    """
+    Render cache in the memory of the current process.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+
+        self._contents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._contents.move_to_end(key)
+            except KeyError:
+                return None
+
+            return self._contents[key]
+
+    def set(self, key, content):
+        with self._lock:
+            self._contents[key] = content
+            self._contents.move_to_end(key)
+
+            while len(self._contents) > self.maxsize:
+                self._contents.popitem(last=False)
+
+    def invalidate_game(self, game_id):
+        with self._lock:
+            for key in [key for key in self._contents if key[0] == game_id]:
+                del self._contents[key]
+
+    def clear(self):
+        with self._lock:
+            self._contents.clear()
+
+    def __len__(self):
+        return len(self._contents)
+
+
+class FileRenderCache:
+    """
+    Render cache with one file per page in a local directory, which can be shared between processes.
+    The modification time of the files is used to find the least recently used ones.
+    """
+    def __init__(self, directory, maxsize):
+        self.directory = directory
+        self.maxsize = maxsize
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _get_file_name(self, key):
+        return os.path.join(self.directory, "_".join(map(str, key)) + ".html")
+
+    def _get_all_file_names(self):
+        return glob.glob(os.path.join(self.directory, "*.html"))
+
+    def get(self, key):
+        file_name = self._get_file_name(key)
+
+        try:
+            with open(file_name, encoding="utf-8") as f:
+                content = f.read()
+            os.utime(file_name)
+        except FileNotFoundError:
+            return None
+
+        return content
+
+    def set(self, key, content):
+        # Write into a temporary file first, so no other process reads a half written page
+        file_descriptor, temporary_file_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with open(file_descriptor, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temporary_file_name, self._get_file_name(key))
+
+        file_names = self._get_all_file_names()
+        if len(file_names) > self.maxsize:
+            file_names.sort(key=self._get_modification_time)
+            for file_name in file_names[:len(file_names) - self.maxsize]:
+                self._remove(file_name)
+
+    def invalidate_game(self, game_id):
+        for file_name in glob.glob(os.path.join(self.directory, "{game_id}_*.html".format(game_id=game_id))):
+            self._remove(file_name)
+
+    def clear(self):
+        for file_name in self._get_all_file_names():
+            self._remove(file_name)
+
+    @staticmethod
+    def _get_modification_time(file_name):
+        try:
+            return os.path.getmtime(file_name)
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _remove(file_name):
+        # Another process may have removed the file already
+        try:
+            os.remove(file_name)
+        except FileNotFoundError:
+            pass
+
+
+class SqliteRenderCache:
+    """
+    Render cache in a local SQLite database, which can be shared between processes.
+    The time of the last use of a page is only updated, if it is older than refresh_interval seconds.
+    """
+    def __init__(self, path, maxsize, refresh_interval=60):
+        self.path = path
+        self.maxsize = maxsize
+        self.refresh_interval = refresh_interval
+
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS render_cache (cache_key TEXT PRIMARY KEY, "
+                               "game_id INTEGER NOT NULL, content TEXT NOT NULL, last_used REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_render_cache_game_id ON render_cache (game_id)")
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_render_cache_last_used ON render_cache (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        """
+        Open a new connection, which commits on leaving the context (or rolls back on errors) and is closed then.
+        """
+        with closing(sqlite3.connect(self.path, timeout=10)) as connection:
+            with connection:
+                yield connection
+
+    @staticmethod
+    def _get_cache_key(key):
+        return "_".join(map(str, key))
+
+    def get(self, key):
+        cache_key = self._get_cache_key(key)
+
+        with self._connect() as connection:
+            row = connection.execute("SELECT content, last_used FROM render_cache WHERE cache_key = ?",
+                                     (cache_key, )).fetchone()
+            if row is None:
+                return None
+
+            content, last_used = row
+            now = time.time()
+            if now - last_used >= self.refresh_interval:
+                connection.execute("UPDATE render_cache SET last_used = ? WHERE cache_key = ?", (now, cache_key))
+
+        return content
+
+    def set(self, key, content):
+        with self._connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO render_cache (cache_key, game_id, content, last_used) "
+                               "VALUES (?, ?, ?, ?)", (self._get_cache_key(key), key[0], content, time.time()))
+            connection.execute("DELETE FROM render_cache WHERE cache_key NOT IN "
+                               "(SELECT cache_key FROM render_cache ORDER BY last_used DESC LIMIT ?)",
+                               (self.maxsize, ))
+
+    def invalidate_game(self, game_id):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM render_cache WHERE game_id = ?", (game_id, ))
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM render_cache")
+
+
+def create_render_cache(config):
+    """
+    Create the render cache described by the RENDER_CACHE_* options of the given config.
+    """
+    backend = config.get("RENDER_CACHE_BACKEND", "memory")
+    maxsize = config.get("RENDER_CACHE_SIZE", 1024)
+    path = config.get("RENDER_CACHE_PATH")
+
+    if backend is None:
+        return NullRenderCache()
+    elif backend == "memory":
+        return MemoryRenderCache(maxsize)
+    elif backend == "file":
+        return FileRenderCache(path, maxsize)
+    elif backend == "sqlite":
+        return SqliteRenderCache(path, maxsize, config.get("RENDER_CACHE_REFRESH_INTERVAL", 60))
+    else:
+        raise ValueError("Invalid render cache backend: " + str(backend))
+
+
+def get_render_cache(app=None):
+    """
+    Return the render cache of the given (or the current) app. It is created on first use.
+    """
+    app = app or current_app
+
+    try:
+        return app.extensions["render_cache"]
+    except KeyError:
+        render_cache = app.extensions["render_cache"] = create_render_cache(app.config)
+        return render_cache
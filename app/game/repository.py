@@ -0,0 +1,36 @@
+from sqlalchemy.orm import joinedload, subqueryload
+
+from app import db
+from app.game.models import Game, Turn, UsersInGames
+
+
+class GameRepository:
+    """
+    Load games together with everything a view needs in a constant number of statements,
+    instead of loading every relationship lazily on first access.
+    """
+    @staticmethod
+    def load_for_view(game_id):
+        """
+        Load the game with the given id together with its start player, its users and all played turns
+        (with the users making and receiving them) in two statements.
+
+        The game is returned as a read-only snapshot: it is removed from the session,
+        so nothing can be loaded lazily or written back anymore.
+
+        :param game_id: The id of the game to load.
+        :return: The hydrated game. Raises NoResultFound if there is no game with this id.
+        """
+        game = Game.query.options(
+            joinedload(Game.start_player),
+            joinedload(Game.to_users).joinedload(UsersInGames.user),
+            subqueryload(Game.turns_in_game).joinedload(Turn.user),
+            subqueryload(Game.turns_in_game).joinedload(Turn.hint_user),
+        ).filter_by(id=game_id).one()
+
+        # The turns are already loaded (and ordered like in played_turns), so no need to query them again.
+        Game.played_turns.set_cache(game, list(game.turns_in_game))
+
+        db.session.expunge(game)
+
+        return game
@@ -0,0 +1,268 @@
+# In-memory engine to play complete games without the database, e.g. to evaluate strategies or
+# to generate load. The games follow the same rules as the web service (both use GameState) and
+# can be stored in the database afterwards with persist_game.
+# Run simulations from the command line with
+#
+#     python -m app.game.simulation --games 1000 --players 2 --bot cautious --seed 42
+import argparse
+import random
+from abc import ABC, abstractmethod
+import time
+from collections import Counter
+
+from app import db
+import app.game.constants as constants
+from app.game.models import Game, Turn
+from app.game.state import GameState
+from app.users.models import User
+
+LOSS_BY_FAILURES = "failures"
+LOSS_BY_EMPTY_DECK = "empty deck"
+LOSS_BY_NO_MOVES = "no moves"
+
+
+class SimulatedGame:
+    """
+    A game played completely in memory: it only consists of a GameState and the list of made moves.
+    """
+    def __init__(self, start_deck, number_of_players, start_hints=10, start_failures=3, start_number_of_cards=None):
+        if start_number_of_cards is None:
+            start_number_of_cards = Game.get_start_number_of_cards_for_players(number_of_players)
+
+        self.start_deck = start_deck
+        self.start_hints = start_hints
+        self.start_failures = start_failures
+        self.start_number_of_cards = start_number_of_cards
+
+        self.game_state = GameState(start_deck, number_of_players, start_number_of_cards, start_hints, start_failures)
+        self.status = constants.GAME_STARTED
+        self.loss_reason = None
+
+        # List of (player index, move, (last_card_drawn, put_correct, hint_restored))
+        self.history = []
+
+    @property
+    def finished(self):
+        return self.status != constants.GAME_STARTED
+
+    @property
+    def score(self):
+        return sum(self.game_state.card_status.values())
+
+    def get_moves(self):
+        """
+        Return the moves the current player can make (none if the game is finished).
+        """
+        if self.finished:
+            return []
+
+        return self.game_state.get_moves(self.game_state.current_player_index)
+
+    def make_move(self, move):
+        """
+        Let the current player make the given move and update the game status.
+        """
+        if self.finished:
+            raise RuntimeError("Turn is not possible.")
+
+        player_index = self.game_state.current_player_index
+        properties = self.game_state.apply_move(player_index, move)
+        self.history.append((player_index, move, properties))
+
+        self.status = self.game_state.get_status()
+
+        if self.status == constants.GAME_LOST:
+            if self.game_state.number_of_failures < 1:
+                self.loss_reason = LOSS_BY_FAILURES
+            else:
+                self.loss_reason = LOSS_BY_EMPTY_DECK
+
+    def play(self, bots):
+        """
+        Play the game until it is finished, letting the bot with the same index as the current player choose
+        the moves.
+        """
+        while not self.finished:
+            moves = self.get_moves()
+
+            if not moves:
+                self.status = constants.GAME_LOST
+                self.loss_reason = LOSS_BY_NO_MOVES
+                break
+
+            player_index = self.game_state.current_player_index
+            self.make_move(bots[player_index].choose_move(self.game_state, player_index, moves))
+
+        return self
+
+
+class Bot(ABC):
+    """
+    Base class for all bots. A bot only chooses the next move, the game itself is handled by SimulatedGame.
+    Bots should play fair and not look into their own hand in the game state, only at the hints of their cards.
+    """
+    def __init__(self, random_generator=None):
+        self.random = random_generator or random.Random()
+
+    @abstractmethod
+    def choose_move(self, game_state, player_index, moves):
+        """
+        Return one of the given possible moves for the player with the given index.
+        """
+
+
+class RandomBot(Bot):
+    """
+    Bot choosing each move at random.
+    """
+    def choose_move(self, game_state, player_index, moves):
+        return self.random.choice(moves)
+
+
+class CautiousBot(Bot):
+    """
+    Bot, which only puts down cards it knows to fit (by their hints), gives hints about fitting cards of the
+    other players and otherwise destroys the oldest card without any hint.
+    """
+    def choose_move(self, game_state, player_index, moves):
+        hints = game_state.hints
+        card_status = game_state.card_status
+
+        # Put down a card if the hints tell, it fits (also if only the value is known, but it fits on every color)
+        for move in moves:
+            if move.type == constants.TURN_PUT:
+                card_hints = hints[move.cards[0]]
+                if card_hints.value is None:
+                    continue
+
+                if card_hints.color is not None:
+                    possible_colors = [card_hints.color]
+                else:
+                    possible_colors = constants.COLORS
+
+                if all(card_status[color] == card_hints.value - 1 for color in possible_colors):
+                    return move
+
+        # Tell the others about their fitting cards: first the value, then the color
+        for move in moves:
+            if move.type == constants.TURN_HINT and move.hint_type == constants.HINT_VALUE:
+                if any(game_state.card_fits_good(card) and hints[card].value is None for card in move.cards):
+                    return move
+
+        for move in moves:
+            if move.type == constants.TURN_HINT and move.hint_type == constants.HINT_COLOR:
+                if any(game_state.card_fits_good(card) and hints[card].color is None for card in move.cards):
+                    return move
+
+        # Destroy the oldest card nobody gave a hint for (only if this gives back a hint)
+        if game_state.number_of_hints < game_state.start_hints:
+            for move in moves:
+                if move.type == constants.TURN_DESTROY and move.cards[0] not in hints:
+                    return move
+
+        return self.random.choice(moves)
+
+
+BOTS = {
+    "random": RandomBot,
+    "cautious": CautiousBot,
+}
+
+
+def play_game(bot_class, number_of_players, random_generator, **kwargs):
+    """
+    Play a single game with a random start deck, where all players are bots of the given class.
+    """
+    start_deck = Game.get_random_start_deck(random_generator)
+    bots = [bot_class(random_generator) for _ in range(number_of_players)]
+
+    return SimulatedGame(start_deck, number_of_players, **kwargs).play(bots)
+
+
+def persist_game(simulated_game, users):
+    """
+    Store a simulated game in the database as a Game with all its Turns and add it to the session.
+    The caller is responsible for committing.
+
+    :param simulated_game: The (finished) SimulatedGame to store.
+    :param users: The users playing the game, one for each player. The players are assigned to them in the
+        order of their ids, as this is the order of the users of a Game.
+    :return: The new Game.
+    """
+    users = sorted(users, key=lambda user: user.id)
+
+    game = Game(start_deck=simulated_game.start_deck, users=users, start_player=users[0],
+                start_failures=simulated_game.start_failures, start_hints=simulated_game.start_hints,
+                start_number_of_cards=simulated_game.start_number_of_cards)
+
+    for turn_number, (player_index, move, properties) in enumerate(simulated_game.history):
+        turn = Turn()
+        turn.game = game
+        turn.turn_number = turn_number
+        turn.type = move.type
+        turn.user = users[player_index]
+        turn.cards = move.cards
+        turn.hint_type = move.hint_type
+        if move.hint_player_index is not None:
+            turn.hint_user = users[move.hint_player_index]
+        turn.last_card_drawn, turn.put_correct, turn.hint_restored = properties
+
+        game.add_turn(turn)
+
+    game.state = simulated_game.status
+    game.update_summary()
+
+    db.session.add(game)
+
+    return game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play simulated games with bots.")
+    parser.add_argument("--games", type=int, default=1000, help="Number of games to play.")
+    parser.add_argument("--players", type=int, default=2, choices=[2, 3, 4], help="Number of players per game.")
+    parser.add_argument("--bot", default="cautious", choices=sorted(BOTS), help="The bot playing all players.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible games.")
+    parser.add_argument("--persist", type=int, default=0, metavar="N",
+                        help="Store the first N games in the database, played by the first users.")
+    args = parser.parse_args()
+
+    random_generator = random.Random(args.seed)
+    bot_class = BOTS[args.bot]
+
+    scores = Counter()
+    loss_reasons = Counter()
+    persisted_games = []
+
+    start_time = time.perf_counter()
+    for game_number in range(args.games):
+        simulated_game = play_game(bot_class, args.players, random_generator)
+
+        scores[simulated_game.score] += 1
+        if simulated_game.loss_reason:
+            loss_reasons[simulated_game.loss_reason] += 1
+
+        if game_number < args.persist:
+            persisted_games.append(simulated_game)
+    duration = time.perf_counter() - start_time
+
+    print("Played {games} games in {duration:.2f} s ({rate:.1f} games/s)".format(
+        games=args.games, duration=duration, rate=args.games / duration))
+    print("Mean score: {score:.2f}".format(score=sum(score * count for score, count in scores.items()) / args.games))
+    print("Scores: " + ", ".join("{}: {}".format(score, count) for score, count in sorted(scores.items())))
+    print("Losses: " + ", ".join("{}: {}".format(reason, count) for reason, count in sorted(loss_reasons.items())))
+
+    if persisted_games:
+        users = User.query.order_by(User.id).limit(args.players).all()
+        if len(users) < args.players:
+            raise RuntimeError("There are not enough users in the database to store the games.")
+
+        for simulated_game in persisted_games:
+            persist_game(simulated_game, users)
+        db.session.commit()
+
+        print("Stored {number} games in the database.".format(number=len(persisted_games)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,503 @@
+import struct
+from array import array
+from collections import namedtuple
+
+import app.game.constants as constants
+
+COLOR_OF_NOT_COLOR_HINT = {hint_type: color for color, hint_type in constants.HINT_NOT_COLOR.items()}
+VALUE_OF_NOT_VALUE_HINT = {hint_type: value for value, hint_type in constants.HINT_NOT_VALUE.items()}
+
+
+# A move a player can make: the turn type, the cards of the turn (the played card or the cards of a hint),
+# the HINT_* constant and the index of the player receiving the hint (only for hints).
+Move = namedtuple("Move", ["type", "cards", "hint_type", "hint_player_index"])
+
+# Every player can get one hint for each color and each value (positive or negative) from every other player.
+HINT_MOVES_PER_PLAYER = len(constants.COLORS) + len(constants.VALUES)
+COLOR_INDEX = {color: index for index, color in enumerate(constants.COLORS)}
+
+# Binary format of a game state (see GameState.to_bytes): the header
+# (version, turn number, number of players, number of slots per hand, start hints, hints, failures,
+# turns after the last card, card counter, number of cards with hints), followed by the card status
+# (one byte per color in the order of COLORS), the card ids of the hands (one signed byte per slot),
+# the sizes of the hands (one byte per player) and the hints of the cards (see CARD_HINTS_FORMAT).
+STATE_FORMAT_VERSION = 1
+STATE_HEADER_FORMAT = struct.Struct("<BHBBhhhBBB")
+# Card id, hinted value (0 for none), hinted color + 1 (0 for none), bit masks of the not values and not colors
+CARD_HINTS_FORMAT = struct.Struct("<BBBBB")
+
+
+def card_can_generate_hint(card):
+    return card.value == 5
+
+
+class CardHints:
+    """
+    The hints a single card has got: the hinted value and color (or None)
+    and bit masks of the values (bit value - 1) and colors (bit color), the card does not have.
+    """
+    __slots__ = ("value", "color", "not_values", "not_colors")
+
+    def __init__(self):
+        self.value = None
+        self.color = None
+        self.not_values = 0
+        self.not_colors = 0
+
+    def get_not_values(self):
+        return [value for value in constants.VALUES if self.not_values & (1 << (value - 1))]
+
+    def get_not_colors(self):
+        return [color for color in sorted(constants.COLORS) if self.not_colors & (1 << color)]
+
+
+class HintIndex:
+    """
+    All hints given in a game, indexed by the id of the card they were given for.
+    It is built together with the game state and updated with every new hint turn.
+    """
+    # Returned for all cards without any hint. Must not be changed.
+    NO_HINTS = CardHints()
+
+    def __init__(self):
+        self._hints_by_card_id = {}
+
+    def __getitem__(self, card):
+        return self._hints_by_card_id.get(card.id, self.NO_HINTS)
+
+    def __contains__(self, card):
+        return card.id in self._hints_by_card_id
+
+    def __len__(self):
+        return len(self._hints_by_card_id)
+
+    def _get_or_create(self, card):
+        try:
+            return self._hints_by_card_id[card.id]
+        except KeyError:
+            card_hints = self._hints_by_card_id[card.id] = CardHints()
+            return card_hints
+
+    def add_hint(self, hint_type, cards):
+        """
+        Add a hint of the given type (one of the HINT_* constants) for the given cards.
+        Positive hints are given for the cards having the hinted value or color,
+        negative hints for all cards of the player.
+        """
+        if hint_type == constants.HINT_VALUE:
+            value = cards[0].value
+            for card in cards:
+                self._get_or_create(card).value = value
+        elif hint_type == constants.HINT_COLOR:
+            color = cards[0].color
+            for card in cards:
+                self._get_or_create(card).color = color
+        elif hint_type in VALUE_OF_NOT_VALUE_HINT:
+            value_bit = 1 << (VALUE_OF_NOT_VALUE_HINT[hint_type] - 1)
+            for card in cards:
+                self._get_or_create(card).not_values |= value_bit
+        elif hint_type in COLOR_OF_NOT_COLOR_HINT:
+            color_bit = 1 << COLOR_OF_NOT_COLOR_HINT[hint_type]
+            for card in cards:
+                self._get_or_create(card).not_colors |= color_bit
+        else:
+            raise ValueError("Invalid hint type.")
+
+
+class Hands:
+    """
+    The hands of all players of a game, stored as one flat array of card ids with a fixed number of slots
+    per player (players x slots). The cards of a player are kept in the order they were drawn.
+    """
+    EMPTY = -1
+
+    def __init__(self, number_of_players, number_of_slots):
+        self.number_of_players = number_of_players
+        self.number_of_slots = number_of_slots
+
+        self.card_ids = array("b", [Hands.EMPTY]) * (number_of_players * number_of_slots)
+        self.sizes = array("b", [0]) * number_of_players
+
+    def add(self, player_index, card_id):
+        size = self.sizes[player_index]
+        if size >= self.number_of_slots:
+            raise ValueError("The hand of the player is already full.")
+
+        self.card_ids[player_index * self.number_of_slots + size] = card_id
+        self.sizes[player_index] = size + 1
+
+    def remove(self, player_index, card_id):
+        start = player_index * self.number_of_slots
+        end = start + self.sizes[player_index]
+
+        # Raises a ValueError if the player does not have the card.
+        position = start + self.card_ids[start:end].index(card_id)
+
+        # Move all following cards one slot to the front
+        self.card_ids[position:end - 1] = self.card_ids[position + 1:end]
+        self.card_ids[end - 1] = Hands.EMPTY
+        self.sizes[player_index] -= 1
+
+    def get_card_ids(self, player_index):
+        start = player_index * self.number_of_slots
+        return self.card_ids[start:start + self.sizes[player_index]].tolist()
+
+    def __eq__(self, other):
+        return isinstance(other, Hands) and self.card_ids == other.card_ids and self.sizes == other.sizes
+
+
+class GameState:
+    """
+    The derived state of a game (hands, counters, card status, position in the deck)
+    after a number of turns.
+
+    The state is built once from the start deck and then advanced turn by turn with apply,
+    so every turn only costs a constant amount of work instead of a replay of the whole turn log.
+    Players are referenced by their index in the list of users of the game.
+    """
+    def __init__(self, start_deck, number_of_players, start_number_of_cards, start_hints, start_failures):
+        self.start_deck = start_deck
+        self.number_of_players = number_of_players
+        self.start_hints = start_hints
+
+        self.turn_number = 0
+        self.number_of_hints = start_hints
+        self.number_of_failures = start_failures
+        self.turns_after_last_card = 0
+        self.card_status = {color: 0 for color in constants.COLORS}
+        self.hints = HintIndex()
+
+        self.cards_by_id = {card.id: card for card in start_deck}
+
+        # Startup: everyone needs cards...
+        self.card_counter = number_of_players * start_number_of_cards
+        self.hands = Hands(number_of_players, start_number_of_cards)
+        for counter in range(start_number_of_cards):
+            for player_index in range(number_of_players):
+                self.hands.add(player_index, start_deck[number_of_players * counter + player_index].id)
+
+    @property
+    def current_player_index(self):
+        return self.turn_number % self.number_of_players
+
+    def get_hand(self, player_index):
+        """
+        Return the cards of the player with the given index.
+        """
+        cards_by_id = self.cards_by_id
+        return [cards_by_id[card_id] for card_id in self.hands.get_card_ids(player_index)]
+
+    def get_all_hands(self):
+        """
+        Return the cards of all players, ordered by their index.
+        """
+        return [self.get_hand(player_index) for player_index in range(self.number_of_players)]
+
+    @property
+    def next_card(self):
+        if self.card_counter > len(self.start_deck) - 1:
+            return None
+        else:
+            return self.start_deck[self.card_counter]
+
+    def card_fits_good(self, card):
+        return self.card_status[card.color] == card.value - 1
+
+    def get_number_of_moves(self, player_index):
+        """
+        Return the number of moves the player with the given index can make in this state.
+        The moves are numbered from 0 to this number - 1 (see get_move).
+        """
+        number_of_moves = 2 * self.hands.sizes[player_index]
+
+        # A hint can only be given if there are hint left
+        if self.number_of_hints > 0:
+            number_of_moves += (self.number_of_players - 1) * HINT_MOVES_PER_PLAYER
+
+        return number_of_moves
+
+    def get_hand_masks(self, player_index):
+        """
+        Return the bit masks of the hand of the player with the given index: one for every color
+        (in the order of COLORS) and one for every value, where bit i is set if the card in slot i
+        has this color or value.
+        """
+        color_masks = [0] * len(constants.COLORS)
+        value_masks = [0] * len(constants.VALUES)
+
+        cards_by_id = self.cards_by_id
+        for slot, card_id in enumerate(self.hands.get_card_ids(player_index)):
+            card = cards_by_id[card_id]
+            color_masks[COLOR_INDEX[card.color]] |= 1 << slot
+            value_masks[card.value - 1] |= 1 << slot
+
+        return color_masks + value_masks
+
+    def get_move(self, player_index, move_number):
+        """
+        Return the move with the given number of the player with the given index.
+        The moves are numbered in this order:
+
+        * putting down and destroying every own card (two numbers per card, in the order of the hand),
+        * if there are hints left, for every other player (in the order of their index) a hint for every color
+          (in the order of COLORS) and then for every value. If the player does not have a card of this
+          color or value, the hint is the negative hint for all of their cards.
+
+        These numbers are the possibility numbers of the turns (see Game.get_possible_turns).
+        Whether the game is still running has to be checked by the caller.
+        """
+        if not 0 <= move_number < self.get_number_of_moves(player_index):
+            raise IndexError("Move is not possible.")
+
+        number_of_hand_moves = 2 * self.hands.sizes[player_index]
+        if move_number < number_of_hand_moves:
+            slot, is_destroy = divmod(move_number, 2)
+            card = self.cards_by_id[self.hands.card_ids[player_index * self.hands.number_of_slots + slot]]
+            return Move(constants.TURN_DESTROY if is_destroy else constants.TURN_PUT, (card,), -1, None)
+
+        other_player_offset, hint_number = divmod(move_number - number_of_hand_moves, HINT_MOVES_PER_PLAYER)
+        other_player_index = other_player_offset if other_player_offset < player_index else other_player_offset + 1
+
+        return self._get_hint_move(other_player_index, hint_number, tuple(self.get_hand(other_player_index)),
+                                   self.get_hand_masks(other_player_index))
+
+    def _get_hint_move(self, other_player_index, hint_number, other_players_cards, masks):
+        mask = masks[hint_number]
+
+        # There are four hint types
+        # (a) A color hint, (b) A not-color hint, (c) A value hint, (d) A not-value hint
+        if hint_number < len(constants.COLORS):
+            color = constants.COLORS[hint_number]
+            hint_type = constants.HINT_COLOR if mask else constants.HINT_NOT_COLOR[color]
+        else:
+            value = constants.VALUES[hint_number - len(constants.COLORS)]
+            hint_type = constants.HINT_VALUE if mask else constants.HINT_NOT_VALUE[value]
+
+        if mask:
+            cards = tuple(card for slot, card in enumerate(other_players_cards) if mask & (1 << slot))
+        else:
+            cards = other_players_cards
+
+        return Move(constants.TURN_HINT, cards, hint_type, other_player_index)
+
+    def get_moves(self, player_index):
+        """
+        Return all moves the player with the given index can make in this state, ordered by their number
+        (see get_move). Whether the game is still running has to be checked by the caller.
+        """
+        moves = []
+
+        # Putting down cards is only possible for the cards the user owns
+        # Destroying a card is only possible for the cards the user owns
+        for card in self.get_hand(player_index):
+            moves.append(Move(constants.TURN_PUT, (card,), -1, None))
+            moves.append(Move(constants.TURN_DESTROY, (card,), -1, None))
+
+        # A hint can only be given if there are hint left
+        if self.number_of_hints > 0:
+
+            # Giving a hint is only possible to all other users
+            for other_player_index in range(self.number_of_players):
+                if other_player_index == player_index:
+                    continue
+
+                other_players_cards = tuple(self.get_hand(other_player_index))
+                masks = self.get_hand_masks(other_player_index)
+                for hint_number in range(HINT_MOVES_PER_PLAYER):
+                    moves.append(self._get_hint_move(other_player_index, hint_number, other_players_cards, masks))
+
+        return moves
+
+    def get_move_numbers_for_card(self, player_index, card):
+        """
+        Return the numbers of all moves of the player with the given index, which include the given card:
+        putting it down and destroying it for an own card, or all hints including it for a card of another player.
+        """
+        for owner_index in range(self.number_of_players):
+            card_ids = self.hands.get_card_ids(owner_index)
+            if card.id in card_ids:
+                slot = card_ids.index(card.id)
+                break
+        else:
+            return []
+
+        if owner_index == player_index:
+            return [2 * slot, 2 * slot + 1]
+
+        if self.number_of_hints <= 0:
+            return []
+
+        other_player_offset = owner_index if owner_index < player_index else owner_index - 1
+        first_move_number = 2 * self.hands.sizes[player_index] + other_player_offset * HINT_MOVES_PER_PLAYER
+
+        # The card is part of the hints for its color and value and of all negative hints
+        return [first_move_number + hint_number
+                for hint_number, mask in enumerate(self.get_hand_masks(owner_index))
+                if not mask or mask & (1 << slot)]
+
+    def get_turn_properties(self, turn_type, cards):
+        """
+        Return the properties (last_card_drawn, put_correct, hint_restored) a turn of the given type
+        with the given cards has in this state.
+        """
+        last_card_drawn = self.next_card is None
+        put_correct = False
+        hint_restored = False
+
+        if turn_type == constants.TURN_DESTROY:
+            if self.number_of_hints < self.start_hints:
+                hint_restored = True
+        elif turn_type == constants.TURN_PUT:
+            if self.card_fits_good(cards[0]):
+                put_correct = True
+                if card_can_generate_hint(cards[0]):
+                    hint_restored = True
+
+        return last_card_drawn, put_correct, hint_restored
+
+    def apply_move(self, player_index, move):
+        """
+        Advance the state by the given move of the player with the given index.
+
+        :return: The properties (last_card_drawn, put_correct, hint_restored) of the move.
+        """
+        last_card_drawn, put_correct, hint_restored = self.get_turn_properties(move.type, move.cards)
+        self.apply(move.type, player_index, move.cards, put_correct=put_correct, hint_restored=hint_restored,
+                   last_card_drawn=last_card_drawn, hint_type=move.hint_type)
+
+        return last_card_drawn, put_correct, hint_restored
+
+    def apply(self, turn_type, player_index, cards, put_correct=False, hint_restored=False, last_card_drawn=False,
+              hint_type=-1):
+        """
+        Advance the state by one turn.
+
+        :param turn_type: One of the TURN_* constants.
+        :param player_index: The index of the player making the turn.
+        :param cards: The cards of the turn (the played card or the cards of a hint).
+        :param put_correct: Whether a put card did fit on the already played cards.
+        :param hint_restored: Whether the turn gave back a hint.
+        :param last_card_drawn: Whether the turn was made after the last card was drawn.
+        :param hint_type: The HINT_* constant of a hint turn.
+        """
+        self.turn_number += 1
+
+        if turn_type == constants.TURN_HINT:
+            self.number_of_hints -= 1
+            self.hints.add_hint(hint_type, cards)
+        if hint_restored:
+            self.number_of_hints += 1
+
+        if turn_type == constants.TURN_PUT and not put_correct:
+            self.number_of_failures -= 1
+        if put_correct:
+            played_card = cards[0]
+            self.card_status[played_card.color] = played_card.value
+
+        if last_card_drawn:
+            self.turns_after_last_card += 1
+
+        # Every put or destroy removes the card from the player and leads to a new card.
+        if turn_type in [constants.TURN_PUT, constants.TURN_DESTROY]:
+            assert len(cards) == 1
+
+            self.hands.remove(player_index, cards[0].id)
+
+            # here we allow the users to go on playing even if there are no more cards (which is possible)
+            if self.card_counter < len(self.start_deck):
+                self.hands.add(player_index, self.start_deck[self.card_counter].id)
+
+            self.card_counter += 1
+
+    def apply_turn(self, turn, player_index):
+        """
+        Advance the state by the given turn (a Turn or PossibleTurn) made by the player with the given index.
+        """
+        self.apply(turn.type, player_index, turn.cards,
+                   put_correct=turn.put_correct, hint_restored=turn.hint_restored,
+                   last_card_drawn=turn.last_card_drawn, hint_type=turn.hint_type)
+
+    def to_bytes(self):
+        """
+        Return the state in a compact binary format (see STATE_HEADER_FORMAT), without the start deck.
+        Equal states give the same bytes.
+        """
+        hints_by_card_id = self.hints._hints_by_card_id
+
+        data = [STATE_HEADER_FORMAT.pack(STATE_FORMAT_VERSION, self.turn_number, self.number_of_players,
+                                         self.hands.number_of_slots, self.start_hints, self.number_of_hints,
+                                         self.number_of_failures, self.turns_after_last_card, self.card_counter,
+                                         len(hints_by_card_id)),
+                bytes(self.card_status[color] for color in constants.COLORS),
+                self.hands.card_ids.tobytes(),
+                self.hands.sizes.tobytes()]
+
+        for card_id in sorted(hints_by_card_id):
+            card_hints = hints_by_card_id[card_id]
+            data.append(CARD_HINTS_FORMAT.pack(card_id, card_hints.value or 0,
+                                               0 if card_hints.color is None else card_hints.color + 1,
+                                               card_hints.not_values, card_hints.not_colors))
+
+        return b"".join(data)
+
+    @staticmethod
+    def from_bytes(data, start_deck):
+        """
+        Create the game state stored with to_bytes.
+
+        :param data: The bytes returned by to_bytes.
+        :param start_deck: The start deck of the game.
+        """
+        (version, turn_number, number_of_players, number_of_slots, start_hints, number_of_hints, number_of_failures,
+         turns_after_last_card, card_counter, number_of_card_hints) = STATE_HEADER_FORMAT.unpack_from(data)
+
+        if version != STATE_FORMAT_VERSION:
+            raise ValueError("Unknown version of the game state format: " + str(version))
+
+        game_state = GameState.__new__(GameState)
+        game_state.start_deck = start_deck
+        game_state.number_of_players = number_of_players
+        game_state.start_hints = start_hints
+        game_state.turn_number = turn_number
+        game_state.number_of_hints = number_of_hints
+        game_state.number_of_failures = number_of_failures
+        game_state.turns_after_last_card = turns_after_last_card
+        game_state.card_counter = card_counter
+        game_state.cards_by_id = {card.id: card for card in start_deck}
+
+        offset = STATE_HEADER_FORMAT.size
+        game_state.card_status = dict(zip(constants.COLORS, data[offset:offset + len(constants.COLORS)]))
+        offset += len(constants.COLORS)
+
+        game_state.hands = Hands(number_of_players, number_of_slots)
+        game_state.hands.card_ids = array("b", data[offset:offset + number_of_players * number_of_slots])
+        offset += number_of_players * number_of_slots
+        game_state.hands.sizes = array("b", data[offset:offset + number_of_players])
+        offset += number_of_players
+
+        game_state.hints = HintIndex()
+        for card_id, value, color, not_values, not_colors in CARD_HINTS_FORMAT.iter_unpack(
+                data[offset:offset + number_of_card_hints * CARD_HINTS_FORMAT.size]):
+            card_hints = game_state.hints._hints_by_card_id[card_id] = CardHints()
+            card_hints.value = value or None
+            card_hints.color = color - 1 if color else None
+            card_hints.not_values = not_values
+            card_hints.not_colors = not_colors
+
+        return game_state
+
+    def get_status(self):
+        """
+        Return the game state (one of the GAME_* constants) a running game has in this state.
+        """
+        # the users have lost when they made too many mistakes
+        if self.number_of_failures < 1:
+            return constants.GAME_LOST
+
+        if all(value == 5 for value in self.card_status.values()):
+            return constants.GAME_WON
+
+        if self.turns_after_last_card > self.number_of_players:
+            return constants.GAME_LOST
+
+        return constants.GAME_STARTED
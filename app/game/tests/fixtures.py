@@ -1,8 +1,13 @@
 from unittest import TestCase
 
-from app import db
+from app import app, db
 from app.game import constants as constants
-from app.game.models import User, Game
+from app.game.models import User, Game, Card
+from app.game.notifications import game_channels
+from app.game.render_cache import get_render_cache
+from app.game.state import GameState
+from app.game.turns import apply_turn
+from app.users.identity import get_user_cache
 
 
 class DatabaseTest(TestCase):
@@ -24,4 +29,88 @@ class DatabaseTest(TestCase):
 
     def tearDown(self):
         db.session.remove()
-        db.drop_all()
\ No newline at end of file
+        db.drop_all()
+
+
+def get_sorted_start_deck():
+    """
+    Return all cards of the game in a fixed order (instead of a random one),
+    so the tests know which card is where.
+    """
+    return [Card(color, value, uniqueness_value)
+            for color in constants.COLORS
+            for value in constants.VALUES
+            for uniqueness_value in range(Card.how_many_cards_per_value(value))]
+
+
+def get_replayed_states(simulated_game):
+    """
+    Replay the moves of the simulated game and return the states after every number of turns (as bytes).
+    """
+    game_state = GameState(simulated_game.start_deck, simulated_game.game_state.number_of_players,
+                           simulated_game.start_number_of_cards, simulated_game.start_hints,
+                           simulated_game.start_failures)
+    states = [game_state.to_bytes()]
+
+    for player_index, move, properties in simulated_game.history:
+        game_state.apply_move(player_index, move)
+        states.append(game_state.to_bytes())
+
+    return states
+
+
+class StartedGameTest(TestCase):
+    """
+    Fixture with a started two player game using a sorted start deck.
+    """
+    def setUp(self):
+        # Start with an empty database, even if another test did not clean up behind itself
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        # The ids of the games and users start again, so the pages and events of the games and the users
+        # of older tests must not be used
+        get_render_cache(app).clear()
+        game_channels.clear()
+        get_user_cache(app).clear()
+
+        self.user = User("test_1")
+        db.session.add(self.user)
+        self.user_2 = User("test_2")
+        db.session.add(self.user_2)
+        db.session.flush()
+
+        self.start_deck = get_sorted_start_deck()
+        self.game = Game(start_deck=self.start_deck, users=[self.user, self.user_2], start_player=self.user,
+                         start_failures=3, start_hints=10, start_number_of_cards=5)
+        self.game.state = constants.GAME_STARTED
+
+        db.session.add(self.game)
+        db.session.commit()
+
+        self.game_id, self.user_id, self.user_2_id = self.game.id, self.user.id, self.user_2.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+
+    def reload(self):
+        """
+        Start with a new session and load the game and the users again, like a new request would do.
+        """
+        db.session.remove()
+
+        self.game = Game.query.get(self.game_id)
+        self.user = User.query.get(self.user_id)
+        self.user_2 = User.query.get(self.user_2_id)
+
+    def make_turn(self, turn_id):
+        """
+        Make the possible turn with the given number for the current user of the game,
+        the same way the make_turn view does, and reload the game afterwards.
+        """
+        possible_turn = self.game.get_possible_turns(self.game.current_user)[turn_id]
+        apply_turn(self.game, possible_turn)
+        db.session.commit()
+
+        self.reload()
@@ -0,0 +1,177 @@
+import json
+
+from sqlalchemy import event
+
+from app import app, db
+from app.game import constants, encoding
+from app.game.notifications import game_channels, create_game_event
+from app.game.tests.fixtures import StartedGameTest
+
+
+class TestGameApi(StartedGameTest):
+    def get_state(self, user_id, etag=None, statements=None):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = user_id
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statements is not None:
+                statements.append(statement)
+
+        headers = {"If-None-Match": '"{etag}"'.format(etag=etag)} if etag else {}
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            return client.get("/api/game/{game_id}/state".format(game_id=self.game_id), headers=headers)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    def test_state(self):
+        response = self.get_state(self.user_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_etag(), ("{game_id}-0-{state}-{user_id}".format(
+            game_id=self.game_id, state=constants.GAME_STARTED, user_id=self.user_id), False))
+
+        data = json.loads(response.data.decode())
+        self.assertEqual(data["turn_number"], 0)
+        self.assertEqual(data["number_of_hints"], 10)
+        self.assertEqual(data["number_of_failures"], 3)
+        self.assertEqual(data["cards_left"], 40)
+        self.assertEqual(data["card_status"], [0] * 5)
+
+        # The own cards are hidden, the others are not
+        own_cards, other_cards = data["players"][0]["cards"], data["players"][1]["cards"]
+        self.assertEqual([(card["color"], card["value"]) for card in own_cards], [(None, None)] * 5)
+        self.assertEqual([(card["color"], card["value"]) for card in other_cards],
+                         [(card.color, card.value) for card in self.start_deck[1:10:2]])
+
+        self.assertEqual(len(data["moves"]), 20)
+        self.assertEqual(data["moves"][3], {"number": 3, "type": constants.TURN_DESTROY, "slot": 1})
+        # Hint for green
+        self.assertEqual(data["moves"][10], {"number": 10, "type": constants.TURN_HINT,
+                                             "hint_type": constants.HINT_COLOR, "player_index": 1,
+                                             "slots": [0, 1, 2, 3, 4]})
+
+    def test_hints(self):
+        # green hint to user 2
+        self.make_turn(10)
+
+        data = json.loads(self.get_state(self.user_2_id).data.decode())
+        self.assertEqual(data["players"][1]["cards"][0]["hints"],
+                         {"value": None, "color": constants.COLOR_GREEN, "not_values": [], "not_colors": []})
+        self.assertEqual(data["players"][0]["cards"][0]["hints"],
+                         {"value": None, "color": None, "not_values": [], "not_colors": []})
+
+    def test_not_modified(self):
+        etag, _ = self.get_state(self.user_id).get_etag()
+
+        statements = []
+        response = self.get_state(self.user_id, etag, statements)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+        # Only the summary of the game is read
+        self.assertEqual(len(statements), 1)
+        self.assertIn("games.number_of_turns", statements[0])
+
+        # Another user gets another representation
+        self.assertEqual(self.get_state(self.user_2_id, etag).status_code, 200)
+
+        # After a turn, the state is sent again
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = self.user_id
+        client.get("/game/make_turn/{game_id}/0".format(game_id=self.game_id))
+
+        response = self.get_state(self.user_id, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data.decode())["turn_number"], 1)
+
+    def test_not_modified_other_process(self):
+        etag, _ = self.get_state(self.user_id).get_etag()
+
+        # A turn stored without publishing it in this process, e.g. by another worker
+        self.reload()
+        self.make_turn(0)
+
+        response = self.get_state(self.user_id, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data.decode())["turn_number"], 1)
+        # The event of the game is updated
+        self.assertEqual(game_channels.get_event(self.game_id).turn_number, 1)
+
+    def get_turns(self, since, statements=None):
+        client = app.test_client()
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statements is not None:
+                statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = client.get("/api/game/{game_id}/turns?since={since}".format(game_id=self.game_id, since=since))
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data.decode())
+
+    def test_turns(self):
+        # put green 1, green hint to user 1, destroy green 2, value 1 hint to user 2
+        for turn_id in [0, 10, 3, 15]:
+            self.make_turn(turn_id)
+
+        data = self.get_turns(0)
+        self.assertEqual(data["turn_number"], 4)
+        self.assertEqual(data["start"], {"deck": [card.id for card in self.start_deck],
+                                         "players": [self.user_id, self.user_2_id],
+                                         "hints": 10, "failures": 3, "number_of_cards": 5})
+        self.assertEqual(data["turns"][0], [constants.TURN_PUT, [self.start_deck[0].id], -1, -1,
+                                            encoding.FLAG_PUT_CORRECT])
+        self.assertEqual(data["turns"][1][2:4], [constants.HINT_COLOR, 0])
+
+        # The client can rebuild the state
+        self.reload()
+        game_state = encoding.build_game_state(data["start"], data["turns"])
+        self.assertEqual(game_state.hands, self.game.game_state.hands)
+        self.assertEqual(game_state.card_status, self.game.card_status)
+        self.assertEqual(game_state.number_of_hints, self.game.current_number_of_hints)
+        self.assertEqual(game_state.hints[self.start_deck[2]].color, constants.COLOR_GREEN)
+
+        # Only the missing turns
+        statements = []
+        data = self.get_turns(2, statements)
+        self.assertNotIn("start", data)
+        self.assertEqual(data["turn_number"], 4)
+        self.assertEqual([turn[0] for turn in data["turns"]], [constants.TURN_DESTROY, constants.TURN_HINT])
+        self.assertTrue(any("turns.turn_number >= ?" in statement for statement in statements))
+
+    def test_no_new_turns(self):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = self.user_id
+        client.get("/game/make_turn/{game_id}/0".format(game_id=self.game_id))
+
+        # The turn number is known from the summary of the game, so the turns are not queried
+        statements = []
+        data = self.get_turns(1, statements)
+        self.assertEqual(data["turns"], [])
+        self.assertEqual(data["turn_number"], 1)
+        self.assertEqual(len(statements), 1)
+
+        # Past the end of the game
+        data = self.get_turns(5)
+        self.assertEqual(data["turns"], [])
+        self.assertEqual(data["turn_number"], 1)
+
+    def test_new_turns_other_process(self):
+        # The event of this process is at turn 0
+        game_channels.publish(create_game_event(self.game))
+        # A turn stored without publishing it in this process, e.g. by another worker
+        self.make_turn(0)
+
+        data = self.get_turns(0)
+        self.assertEqual(data["turn_number"], 1)
+        self.assertEqual(len(data["turns"]), 1)
+
+        data = self.get_turns(1)
+        self.assertEqual(data["turn_number"], 1)
+        self.assertEqual(data["turns"], [])
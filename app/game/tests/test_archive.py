@@ -0,0 +1,101 @@
+import random
+import shutil
+import tempfile
+
+from app import db
+from app.game import constants
+from app.game.archive import archive_games, GameArchive, read_meta
+from app.game.models import Game, Turn, GameSnapshot
+from app.game.simulation import CautiousBot, RandomBot, play_game, persist_game
+from app.game.tests.fixtures import StartedGameTest
+
+
+class TestArchive(StartedGameTest):
+    def setUp(self):
+        StartedGameTest.setUp(self)
+
+        self.directory = tempfile.mkdtemp()
+
+        random_generator = random.Random(11)
+        for bot_class in [CautiousBot, RandomBot, CautiousBot, RandomBot]:
+            persist_game(play_game(bot_class, 2, random_generator), [self.user, self.user_2])
+        db.session.commit()
+
+        self.finished_games = Game.query.filter(Game.state.in_([constants.GAME_WON, constants.GAME_LOST])) \
+            .order_by(Game.id).all()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        StartedGameTest.tearDown(self)
+
+    def test_archive(self):
+        self.assertEqual(archive_games(self.directory, chunk_size=3), 4)
+
+        archive = GameArchive(self.directory)
+        self.assertEqual(archive.number_of_games, 4)
+        self.assertEqual(list(archive.games["game_id"]), [game.id for game in self.finished_games])
+        self.assertEqual(list(archive.games["score"]), [game.score for game in self.finished_games])
+
+        turns = [turn for game in self.finished_games for turn in game.played_turns]
+        self.assertEqual(archive.number_of_turns, len(turns))
+        self.assertEqual(list(archive.turns["type"]), [turn.type for turn in turns])
+        self.assertEqual([self.finished_games[game_index].id for game_index in archive.turns["game_index"]],
+                         [turn._game_id for turn in turns])
+        self.assertEqual(list(archive.turns["player"]),
+                         [[self.user.id, self.user_2.id].index(turn._user_id) for turn in turns])
+
+        # The running game of the fixture is not archived
+        self.assertNotIn(self.game.id, archive.games["game_id"])
+
+    def test_archive_twice(self):
+        archive_games(self.directory)
+        self.assertEqual(archive_games(self.directory), 0)
+
+        meta = read_meta(self.directory)
+        self.assertEqual(meta["number_of_games"], 4)
+        self.assertEqual(GameArchive(self.directory).number_of_games, 4)
+
+    def test_statistics(self):
+        archive_games(self.directory)
+        archive = GameArchive(self.directory)
+
+        turns = [turn for game in self.finished_games for turn in game.played_turns]
+        puts = [turn for turn in turns if turn.type == constants.TURN_PUT]
+        hints = [turn for turn in turns if turn.type == constants.TURN_HINT]
+
+        turn_type_counts = archive.get_turn_type_counts()
+        self.assertEqual(turn_type_counts[constants.TURN_PUT], len(puts))
+        self.assertEqual(turn_type_counts[constants.TURN_HINT], len(hints))
+        self.assertEqual(sum(turn_type_counts.values()), len(turns))
+
+        self.assertAlmostEqual(archive.get_hint_usage(), len(hints) / len(turns))
+        self.assertEqual(archive.get_number_of_failures(),
+                         sum(game.start_failures - game.current_number_of_failures for game in self.finished_games))
+        self.assertAlmostEqual(archive.get_failure_rate(),
+                               len([turn for turn in puts if not turn.put_correct]) / len(puts))
+
+        scores = [game.score for game in self.finished_games]
+        self.assertAlmostEqual(archive.get_mean_score(), sum(scores) / len(scores))
+        self.assertEqual(sum(archive.get_score_distribution().values()), len(scores))
+
+        # Only the first game
+        game_mask = archive.games["game_id"] == self.finished_games[0].id
+        self.assertEqual(archive.get_number_of_failures(game_mask),
+                         self.finished_games[0].start_failures - self.finished_games[0].current_number_of_failures)
+        self.assertEqual(sum(archive.get_turn_type_counts(game_mask).values()),
+                         self.finished_games[0].number_of_turns)
+
+        lost_mask = archive.get_game_mask(state=constants.GAME_LOST)
+        self.assertEqual(int(lost_mask.sum()),
+                         len([game for game in self.finished_games if game.state == constants.GAME_LOST]))
+
+    def test_delete(self):
+        game_ids = [game.id for game in self.finished_games]
+        self.assertEqual(archive_games(self.directory, delete=True), 4)
+
+        self.assertEqual(Game.query.filter(Game.id.in_(game_ids)).count(), 0)
+        self.assertEqual(Turn.query.filter(Turn._game_id.in_(game_ids)).count(), 0)
+        self.assertEqual(GameSnapshot.query.filter(GameSnapshot._game_id.in_(game_ids)).count(), 0)
+        self.assertEqual(Game.query.count(), 1)
+
+        self.assertEqual(GameArchive(self.directory).number_of_games, 4)
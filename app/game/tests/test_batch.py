@@ -0,0 +1,32 @@
+import random
+from unittest import TestCase
+
+from app.game.batch import get_game_seed, run_games, run_shard, SimulationResults
+from app.game.simulation import CautiousBot, play_game
+
+
+class TestBatch(TestCase):
+    def test_game_seed(self):
+        self.assertEqual(get_game_seed(42, 3), get_game_seed(42, 3))
+        self.assertNotEqual(get_game_seed(42, 3), get_game_seed(42, 4))
+        self.assertNotEqual(get_game_seed(42, 3), get_game_seed(43, 3))
+
+    def test_run_shard(self):
+        results = run_shard("cautious", 2, 42, 0, 3)
+
+        expected_results = SimulationResults()
+        for game_number in range(3):
+            expected_results.add_game(play_game(CautiousBot, 2, random.Random(get_game_seed(42, game_number))))
+
+        self.assertEqual(results, expected_results)
+        self.assertEqual(results.number_of_games, 3)
+        self.assertEqual(sum(results.scores.values()), 3)
+        self.assertEqual(sum(results.turns.values()), 3)
+
+    def test_reproducible(self):
+        # The results do not depend on the number of processes or the size of the shards
+        results = run_games(12, master_seed=1, workers=1, shard_size=12)
+        other_results = run_games(12, master_seed=1, workers=2, shard_size=5)
+
+        self.assertEqual(results, other_results)
+        self.assertEqual(other_results.number_of_games, 12)
@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from benchmarks.hot_paths import compare_results
+
+
+def get_result(median_ms, statements):
+    return {"median_ms": median_ms, "p95_ms": median_ms * 2, "statements": statements, "repetitions": 10}
+
+
+class TestCompareResults(TestCase):
+    def setUp(self):
+        self.baseline = {"get_possible_turns": get_result(1.0, 2), "make_turn": get_result(5.0, 6)}
+
+    def test_no_regressions(self):
+        # Slower, but within the threshold, and faster with fewer statements
+        results = {"get_possible_turns": get_result(1.19, 2), "make_turn": get_result(3.0, 4)}
+        self.assertEqual(compare_results(results, self.baseline, 0.2), [])
+
+    def test_slower(self):
+        results = {"get_possible_turns": get_result(1.21, 2), "make_turn": get_result(5.0, 6)}
+
+        regressions = compare_results(results, self.baseline, 0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("get_possible_turns: median 1.210 ms"))
+
+        # A larger threshold allows it
+        self.assertEqual(compare_results(results, self.baseline, 0.5), [])
+
+    def test_more_statements(self):
+        # Every additional statement is a regression, independent of the threshold and the latency
+        results = {"get_possible_turns": get_result(0.5, 3), "make_turn": get_result(5.0, 6)}
+
+        regressions = compare_results(results, self.baseline, 10)
+        self.assertEqual(regressions, ["get_possible_turns: 3 SQL statements instead of 2"])
+
+    def test_new_operations(self):
+        # Operations, which are not in the baseline, can not regress
+        results = {"get_possible_turns": get_result(1.0, 2), "game.html (render)": get_result(100.0, 50)}
+        self.assertEqual(compare_results(results, self.baseline, 0.2), [])
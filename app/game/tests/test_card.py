@@ -1,6 +1,8 @@
+import pickle
 from unittest import TestCase
 
-from app.game.models import Card
+from app.game import constants
+from app.game.models import Card, CARDS
 
 
 class TestCard(TestCase):
@@ -37,3 +39,32 @@ class TestCard(TestCase):
 
         self.assertEqual(str(card), "C1#3#1")
 
+    def test_id(self):
+        self.assertEqual(len(CARDS), 50)
+
+        for card_id, card in enumerate(CARDS):
+            self.assertEqual(card.id, card_id)
+            self.assertIs(Card.from_id(card_id), card)
+            self.assertIs(Card(card.color, card.value, card.uniqueness_value), card)
+            self.assertIs(Card.from_string(str(card)), card)
+
+        self.assertEqual(Card(constants.COLOR_GREEN, 1, 0).id, 0)
+        self.assertEqual(Card(constants.COLOR_GREEN, 5, 0).id, 9)
+        self.assertEqual(Card(constants.COLOR_BLUE, 2, 1).id, 14)
+
+    def test_compare(self):
+        card = Card(constants.COLOR_BLUE, 2, 1)
+
+        self.assertEqual(card, Card.from_id(14))
+        self.assertEqual(card, "121")
+        self.assertNotEqual(card, Card.from_id(15))
+        self.assertLess(Card.from_id(3), card)
+        self.assertEqual(sorted([Card.from_id(20), card, Card.from_id(0)]),
+                         [Card.from_id(0), card, Card.from_id(20)])
+        self.assertEqual({card: 1}[Card.from_id(14)], 1)
+
+    def test_immutable(self):
+        card = Card.from_id(0)
+
+        self.assertRaises(AttributeError, setattr, card, "_value", 2)
+        self.assertIs(pickle.loads(pickle.dumps(card)), card)
@@ -0,0 +1,120 @@
+import threading
+
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import app, db
+from app.game import constants, turns
+from app.game.models import Game, Turn
+from app.game.tests.fixtures import StartedGameTest
+from app.users.identity import UserRecord
+
+
+class TestConcurrency(StartedGameTest):
+    def get_client(self, user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = user_id
+        return client
+
+    def get_make_turn_url(self, turn_id, turn_number=None):
+        url = "/game/make_turn/{game_id}/{turn_id}".format(game_id=self.game_id, turn_id=turn_id)
+        if turn_number is not None:
+            url += "?turn_number={turn_number}".format(turn_number=turn_number)
+        return url
+
+    def test_version(self):
+        self.assertEqual(self.game.version, 1)
+
+        self.make_turn(1)
+        self.assertEqual(self.game.version, 2)
+
+    def test_stale_update(self):
+        # The game is loaded by another process, which stores a turn first
+        other_session = db.create_scoped_session()
+        try:
+            other_game = other_session.query(Game).get(self.game_id)
+            other_game.number_of_turns = 1
+            other_session.commit()
+        finally:
+            other_session.remove()
+
+        self.game.number_of_turns = 1
+        self.assertRaises(StaleDataError, db.session.commit)
+        db.session.rollback()
+
+    def test_expected_turn_number(self):
+        client = self.get_client(self.user_id)
+
+        response = client.get(self.get_make_turn_url(1, turn_number=0))
+        self.assertEqual(response.status_code, 302)
+
+        # A second click on the same link
+        response = client.get(self.get_make_turn_url(1, turn_number=0))
+        self.assertEqual(response.status_code, 409)
+
+        self.reload()
+        self.assertEqual(self.game.number_of_turns, 1)
+        self.assertEqual(Turn.query.filter_by(game=self.game).count(), 1)
+        self.assertEqual(self.game.current_user, self.user_2)
+
+        response = self.get_client(self.user_2_id).get(self.get_make_turn_url(1, turn_number=1))
+        self.assertEqual(response.status_code, 302)
+
+        self.reload()
+        self.assertEqual(self.game.number_of_turns, 2)
+        self.assertEqual(self.game.version, 3)
+
+    def test_retry(self):
+        client = self.get_client(self.user_id)
+
+        # The game is changed by another process while the turn is made, so only the second try succeeds
+        tries = []
+
+        def change_game(session, flush_context, instances):
+            tries.append(True)
+            if len(tries) == 1:
+                db.engine.execute(Game.__table__.update().where(Game.id == self.game_id)
+                                  .values(version=Game.version + 1))
+
+        db.event.listen(db.session, "before_flush", change_game)
+        try:
+            response = client.get(self.get_make_turn_url(1, turn_number=0))
+        finally:
+            db.event.remove(db.session, "before_flush", change_game)
+
+        self.assertEqual(len(tries), 2)
+        self.assertEqual(response.status_code, 302)
+
+        self.reload()
+        self.assertEqual(self.game.number_of_turns, 1)
+        self.assertEqual(self.game.version, 3)
+        self.assertEqual(self.game.state, constants.GAME_STARTED)
+
+    def test_double_submit(self):
+        # The same turn (without a turn number) is submitted twice at the same time: the other request stores it,
+        # while this one is between loading the game and storing the turn
+        client = self.get_client(self.user_id)
+        other_requests = []
+
+        def submit_in_other_request():
+            with app.test_request_context():
+                turns.make_turn(self.game_id, UserRecord(self.user_id, "test_1"), 1)
+
+        def before_flush(session, flush_context, instances):
+            if not other_requests:
+                other_requests.append(threading.Thread(target=submit_in_other_request))
+                other_requests[0].start()
+                other_requests[0].join()
+
+        db.event.listen(db.session, "before_flush", before_flush)
+        try:
+            response = client.get(self.get_make_turn_url(1))
+        finally:
+            db.event.remove(db.session, "before_flush", before_flush)
+
+        # The turn is not possible anymore, which is a conflict and not an error
+        self.assertEqual(response.status_code, 409)
+
+        self.reload()
+        self.assertEqual(self.game.number_of_turns, 1)
+        self.assertEqual(Turn.query.filter_by(game=self.game).count(), 1)
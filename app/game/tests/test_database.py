@@ -0,0 +1,49 @@
+from flask import g
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+
+from app import app, db
+from app.game.models import Game
+from app.game.tests.fixtures import StartedGameTest
+
+
+class TestDatabase(StartedGameTest):
+    def test_pragmas(self):
+        with db.engine.connect() as connection:
+            self.assertEqual(connection.execute("PRAGMA journal_mode").scalar(), "wal")
+            # NORMAL
+            self.assertEqual(connection.execute("PRAGMA synchronous").scalar(), 1)
+            self.assertEqual(connection.execute("PRAGMA busy_timeout").scalar(),
+                             app.config["SQLITE_PRAGMAS"]["busy_timeout"])
+
+    def test_pool(self):
+        self.assertIsInstance(db.engine.pool, QueuePool)
+        self.assertEqual(db.engine.pool.size(), app.config["DATABASE_POOL_SIZE"])
+
+    def test_read_only_engine(self):
+        app.config["DATABASE_READ_ONLY"] = True
+        try:
+            with app.test_request_context():
+                g.read_only_database = True
+                db.session.remove()
+
+                self.assertIs(db.session.get_bind(), db.get_read_only_engine())
+                self.assertEqual(Game.query.get(self.game_id).id, self.game_id)
+
+                self.assertRaises(OperationalError, db.session.execute,
+                                  "UPDATE games SET score = 1 WHERE id = :game_id", {"game_id": self.game_id})
+                db.session.remove()
+
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session["user_id"] = self.user_id
+            self.assertEqual(client.get("/game/game/{game_id}".format(game_id=self.game_id)).status_code, 200)
+            # Writing views still use the normal engine
+            self.assertEqual(client.get("/game/make_turn/{game_id}/0".format(game_id=self.game_id)).status_code,
+                             302)
+        finally:
+            app.config["DATABASE_READ_ONLY"] = False
+            db.session.remove()
+
+        self.reload()
+        self.assertEqual(self.game.number_of_turns, 1)
@@ -0,0 +1,130 @@
+from unittest import TestCase
+
+from app.game.functions import CachedClassFunction, CachedClassProperty, set_computation_observer
+
+
+class Counter:
+    def __init__(self):
+        self.version = 0
+        self.calls = 0
+
+    @CachedClassFunction("version")
+    def get(self, value):
+        self.calls += 1
+        return value, self.version
+
+    @CachedClassFunction(maxsize=2)
+    def get_bounded(self, value):
+        self.calls += 1
+        return value
+
+    @CachedClassProperty()
+    def property(self):
+        self.calls += 1
+        return self.calls
+
+
+class SlottedCounter:
+    __slots__ = ("calls", "_memo")
+
+    def __init__(self):
+        self.calls = 0
+
+    @CachedClassProperty()
+    def property(self):
+        self.calls += 1
+        return self.calls
+
+
+class TestCachedClassFunction(TestCase):
+    def test_per_instance(self):
+        counter = Counter()
+        other_counter = Counter()
+        other_counter.version = 1
+
+        self.assertEqual(counter.get(1), (1, 0))
+        self.assertEqual(other_counter.get(1), (1, 1))
+        self.assertEqual(counter.get(1), (1, 0))
+
+        self.assertEqual(counter.calls, 1)
+        self.assertEqual(other_counter.calls, 1)
+
+    def test_version(self):
+        counter = Counter()
+
+        self.assertEqual(counter.get(1), (1, 0))
+        self.assertEqual(counter.get(1), (1, 0))
+        self.assertEqual(counter.calls, 1)
+
+        counter.version = 1
+
+        self.assertEqual(counter.get(1), (1, 1))
+        self.assertEqual(counter.calls, 2)
+
+    def test_keys(self):
+        counter = Counter()
+
+        # Unhashable arguments are compared by identity
+        argument = []
+        self.assertEqual(counter.get(argument), (argument, 0))
+        self.assertEqual(counter.get(argument), (argument, 0))
+        self.assertEqual(counter.calls, 1)
+
+        counter.get([])
+        self.assertEqual(counter.calls, 2)
+
+        # Equal hashable arguments share their value
+        counter.get(value=(1, 2))
+        counter.get(value=(1, 2))
+        self.assertEqual(counter.calls, 3)
+
+    def test_maxsize(self):
+        counter = Counter()
+
+        counter.get_bounded(1)
+        counter.get_bounded(2)
+        counter.get_bounded(1)
+        counter.get_bounded(3)
+        self.assertEqual(counter.calls, 3)
+
+        # 2 was the least recently used value
+        counter.get_bounded(1)
+        self.assertEqual(counter.calls, 3)
+        counter.get_bounded(2)
+        self.assertEqual(counter.calls, 4)
+
+    def test_cache_info(self):
+        counter = Counter()
+        hits, misses, maxsize = Counter.get_bounded.cache_info()
+
+        counter.get_bounded(1)
+        counter.get_bounded(1)
+
+        self.assertEqual(Counter.get_bounded.cache_info(), (hits + 1, misses + 1, 2))
+
+    def test_property(self):
+        counter = Counter()
+
+        self.assertEqual(counter.property, 1)
+        self.assertEqual(counter.property, 1)
+
+        slotted_counter = SlottedCounter()
+
+        self.assertEqual(slotted_counter.property, 1)
+        self.assertEqual(slotted_counter.property, 1)
+
+    def test_computation_observer(self):
+        computations = []
+        set_computation_observer(lambda name, duration: computations.append(name))
+
+        try:
+            counter = Counter()
+            counter.get(1)
+            counter.get(1)
+            counter.property
+            counter.property
+        finally:
+            set_computation_observer(None)
+
+        # Only the computations, no cache hits
+        self.assertEqual(computations, ["Counter.get", "Counter.property"])
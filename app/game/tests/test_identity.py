@@ -0,0 +1,110 @@
+import time
+
+from sqlalchemy import event
+
+from app import app, db
+from app.users.identity import UserRecord, UserCache, get_user_cache
+from app.users.models import User
+from app.game.tests.fixtures import StartedGameTest
+
+
+class TestUserCache(StartedGameTest):
+    def test_user_record(self):
+        record = UserRecord.from_user(self.user)
+
+        self.assertEqual(record, self.user)
+        self.assertEqual(self.user, record)
+        self.assertNotEqual(record, self.user_2)
+        self.assertNotEqual(self.user_2, record)
+        self.assertEqual(self.game.users.index(record), 0)
+        self.assertEqual(self.game.get_cards_of_user(record), self.game.get_cards_of_user(self.user))
+        self.assertRaises(AttributeError, setattr, record, "name", "other")
+
+        # The turns use the User of the game
+        possible_turns = self.game.get_possible_turns(record)
+        self.assertIs(possible_turns[0].user, self.user)
+
+    def test_user_record_hash(self):
+        record = UserRecord.from_user(self.user)
+
+        # Equal objects have the same hash, so records and users can be mixed in sets and as keys
+        self.assertEqual(hash(record), hash(self.user))
+        self.assertEqual({record, self.user, self.user_2}, {self.user, self.user_2})
+        self.assertEqual({self.user: "first"}[record], "first")
+        self.assertIn(self.user, {record})
+        self.assertNotIn(self.user_2, {record})
+
+        # Users, which are not stored yet, are only equal to themselves
+        new_user, other_new_user = User("test_3"), User("test_4")
+        self.assertEqual(new_user, new_user)
+        self.assertNotEqual(new_user, other_new_user)
+        self.assertNotEqual(new_user, self.user)
+
+    def test_lru_and_ttl(self):
+        user_cache = UserCache(maxsize=2, ttl=60)
+        for user_id in [1, 2, 3]:
+            user_cache.set(UserRecord(user_id, str(user_id)))
+
+        self.assertIsNone(user_cache.get(1))
+        self.assertEqual(user_cache.get(3).name, "3")
+
+        user_cache.invalidate(3)
+        self.assertIsNone(user_cache.get(3))
+
+        user_cache = UserCache(maxsize=2, ttl=0.01)
+        user_cache.set(UserRecord(1, "1"))
+        time.sleep(0.02)
+        self.assertIsNone(user_cache.get(1))
+
+    def get_client(self):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = self.user_id
+        return client
+
+    def count_user_queries(self, client):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            self.assertEqual(client.get("/game/home/").status_code, 200)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+        # The games of the home page are loaded together with their users, which does not count
+        return len([statement for statement in statements
+                    if statement.startswith("SELECT {table}.".format(table=User.__tablename__))])
+
+    def test_cached_between_requests(self):
+        client = self.get_client()
+
+        self.assertEqual(self.count_user_queries(client), 1)
+        self.assertEqual(self.count_user_queries(client), 0)
+
+        get_user_cache(app).invalidate(self.user_id)
+        self.assertEqual(self.count_user_queries(client), 1)
+
+    def test_session_record(self):
+        app.config["USER_SESSION_RECORD"] = True
+        try:
+            client = self.get_client()
+            with client.session_transaction() as session:
+                session["user_record"] = [self.user_id, "test_1"]
+
+            self.assertEqual(self.count_user_queries(client), 0)
+            self.assertEqual(len(get_user_cache(app)), 0)
+        finally:
+            app.config["USER_SESSION_RECORD"] = False
+
+    def test_logout(self):
+        client = self.get_client()
+        self.count_user_queries(client)
+
+        client.get("/users/logout/")
+
+        self.assertEqual(len(get_user_cache(app)), 0)
+        with client.session_transaction() as session:
+            self.assertNotIn("user_id", session)
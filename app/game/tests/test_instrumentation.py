@@ -0,0 +1,65 @@
+from unittest import TestCase
+
+from app import app
+from app.instrumentation import get_percentiles, get_statistics
+from app.game.tests.fixtures import StartedGameTest
+
+
+class TestPercentiles(TestCase):
+    def test_percentiles(self):
+        self.assertEqual(get_percentiles(range(1, 101)), {"p50": 50, "p90": 90, "p99": 99})
+        self.assertEqual(get_percentiles([3, 1, 2]), {"p50": 2, "p90": 3, "p99": 3})
+        self.assertEqual(get_percentiles([7]), {"p50": 7, "p90": 7, "p99": 7})
+
+
+class TestInstrumentation(StartedGameTest):
+    def setUp(self):
+        StartedGameTest.setUp(self)
+
+        app.config["INSTRUMENTATION"] = True
+        get_statistics(app).clear()
+
+        self.client = app.test_client()
+        with self.client.session_transaction() as session:
+            session["user_id"] = self.user_id
+
+    def tearDown(self):
+        app.config["INSTRUMENTATION"] = False
+        get_statistics(app).clear()
+
+        StartedGameTest.tearDown(self)
+
+    def get_game_page(self):
+        response = self.client.get("/game/game/{game_id}".format(game_id=self.game_id))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_server_timing(self):
+        server_timing = self.get_game_page().headers["Server-Timing"]
+        metrics = {metric.split(";")[0]: metric for metric in server_timing.split(", ")}
+
+        self.assertIn("sql", metrics)
+        self.assertNotIn('desc="0 statements"', metrics["sql"])
+        self.assertIn("template", metrics)
+        self.assertIn("cache.Game.game_state", metrics)
+        self.assertIn("total", metrics)
+
+    def test_stats(self):
+        self.get_game_page()
+        self.get_game_page()
+
+        response = self.client.get("/instrumentation/stats")
+        self.assertEqual(response.status_code, 200)
+
+        game_stats = response.get_json()["game.game"]
+        self.assertEqual(game_stats["requests"], 2)
+        self.assertEqual(set(game_stats["total_ms"]), {"p50", "p90", "p99"})
+        self.assertGreater(game_stats["statements"]["p99"], 0)
+        self.assertGreater(game_stats["template_ms"]["p99"], 0)
+        self.assertIn("Game.game_state", game_stats["cache_ms"])
+
+    def test_disabled(self):
+        app.config["INSTRUMENTATION"] = False
+
+        self.assertNotIn("Server-Timing", self.get_game_page().headers)
+        self.assertEqual(self.client.get("/instrumentation/stats").status_code, 404)
@@ -0,0 +1,142 @@
+import os
+import random
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+from sqlalchemy import create_engine, inspect
+
+from app import db
+from app.game import constants
+from app.game.models import Game, GameSnapshot, Turn, UsersInGames, SNAPSHOT_INTERVAL
+from app.game.simulation import CautiousBot, play_game
+from app.game.tests.fixtures import get_sorted_start_deck, get_replayed_states
+from app.migrations import upgrade, get_schema_version, MIGRATIONS
+from app.users.models import User
+
+
+class TestMigrations(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine("sqlite:///" + os.path.join(self.directory.name, "old.db"))
+
+        # A database with the old schema: no indexes and no snapshots
+        db.metadata.create_all(self.engine)
+        for table in [Turn.__table__, UsersInGames.__table__]:
+            for index in table.indexes:
+                index.drop(self.engine)
+        GameSnapshot.__table__.drop(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def test_upgrade(self):
+        # Two turns with the same number
+        self.engine.execute(Turn.__table__.insert(), [
+            {"id": 1, "_game_id": 1, "_user_id": 1, "type": 0, "turn_number": 0},
+            {"id": 2, "_game_id": 1, "_user_id": 2, "type": 0, "turn_number": 1},
+            {"id": 3, "_game_id": 1, "_user_id": 2, "type": 0, "turn_number": 1},
+            {"id": 4, "_game_id": 2, "_user_id": 1, "type": 0, "turn_number": 0},
+        ])
+
+        applied_migrations = upgrade(self.engine)
+
+        self.assertEqual(applied_migrations, [migration.__name__ for migration in MIGRATIONS])
+        with self.engine.connect() as connection:
+            self.assertEqual(get_schema_version(connection), len(MIGRATIONS))
+
+        index_names = {index["name"] for index in inspect(self.engine).get_indexes("turns")}
+        self.assertIn("ix_turns_game_turn_number", index_names)
+        self.assertIn("ix_turns_game_type", index_names)
+        index_names = {index["name"] for index in inspect(self.engine).get_indexes("users_to_games")}
+        self.assertIn("ix_users_to_games_user", index_names)
+
+        turn_numbers = self.engine.execute("SELECT id, turn_number FROM turns ORDER BY id").fetchall()
+        self.assertEqual([tuple(row) for row in turn_numbers], [(1, 0), (2, 1), (3, 2), (4, 0)])
+
+        # Nothing left to do
+        self.assertEqual(upgrade(self.engine), [])
+
+    def test_game_summary(self):
+        start_deck = ",".join(map(str, get_sorted_start_deck()))
+        self.engine.execute(User.__table__.insert(), [{"id": 1, "name": "test_1"}, {"id": 2, "name": "test_2"}])
+        self.engine.execute(Game.__table__.insert(), [
+            {"id": 1, "_start_deck": start_deck, "started": datetime(2016, 1, 1), "start_failures": 3,
+             "start_hints": 10, "start_number_of_cards": 5, "_start_player_id": 1, "state": constants.GAME_STARTED},
+        ])
+        self.engine.execute(UsersInGames.__table__.insert(), [{"_game_id": 1, "_user_id": 1},
+                                                              {"_game_id": 1, "_user_id": 2}])
+        # User 1 puts down the green 1
+        self.engine.execute(Turn.__table__.insert(), [
+            {"id": 1, "_game_id": 1, "_user_id": 1, "type": constants.TURN_PUT, "turn_number": 0, "_card": "010",
+             "put_correct": True},
+        ])
+
+        upgrade(self.engine)
+
+        game = self.engine.execute(Game.__table__.select()).fetchone()
+        self.assertEqual(game.number_of_turns, 1)
+        self.assertEqual(game.hints_left, 10)
+        self.assertEqual(game.failures_left, 3)
+        self.assertEqual(game.score, 1)
+        self.assertEqual(game._current_player_id, 2)
+        self.assertEqual(game.last_activity, datetime(2016, 1, 1))
+
+    def test_game_snapshots(self):
+        simulated_game = play_game(CautiousBot, 2, random.Random(1))
+
+        self.engine.execute(User.__table__.insert(), [{"id": 1, "name": "test_1"}, {"id": 2, "name": "test_2"}])
+        self.engine.execute(Game.__table__.insert(), [
+            {"id": 1, "_start_deck": ",".join(map(str, simulated_game.start_deck)), "started": datetime(2016, 1, 1),
+             "start_failures": 3, "start_hints": 10, "start_number_of_cards": 5, "_start_player_id": 1,
+             "state": simulated_game.status},
+        ])
+        self.engine.execute(UsersInGames.__table__.insert(), [{"_game_id": 1, "_user_id": 1},
+                                                              {"_game_id": 1, "_user_id": 2}])
+        self.engine.execute(Turn.__table__.insert(), [
+            {"_game_id": 1, "_user_id": player_index + 1, "type": move.type, "turn_number": turn_number,
+             "_card": ",".join(map(str, move.cards)), "hint_type": move.hint_type,
+             "_hint_user_id": None if move.hint_player_index is None else move.hint_player_index + 1,
+             "last_card_drawn": properties[0], "put_correct": properties[1], "hint_restored": properties[2]}
+            for turn_number, (player_index, move, properties) in enumerate(simulated_game.history)
+        ])
+
+        upgrade(self.engine)
+
+        replayed_states = get_replayed_states(simulated_game)
+        snapshots = self.engine.execute(GameSnapshot.__table__.select()
+                                        .order_by(GameSnapshot.__table__.c.turn_number)).fetchall()
+
+        self.assertEqual([snapshot.turn_number for snapshot in snapshots],
+                         list(range(SNAPSHOT_INTERVAL, len(simulated_game.history) + 1, SNAPSHOT_INTERVAL)))
+        for snapshot in snapshots:
+            self.assertEqual(snapshot.data, replayed_states[snapshot.turn_number])
+
+    def test_game_version(self):
+        start_deck = ",".join(map(str, get_sorted_start_deck()))
+        self.engine.execute(User.__table__.insert(), [{"id": 1, "name": "test_1"}, {"id": 2, "name": "test_2"}])
+        self.engine.execute(Game.__table__.insert(), [
+            {"id": 1, "_start_deck": start_deck, "started": datetime(2016, 1, 1), "start_failures": 3,
+             "start_hints": 10, "start_number_of_cards": 5, "_start_player_id": 1, "state": constants.GAME_STARTED},
+        ])
+        self.engine.execute(UsersInGames.__table__.insert(), [{"_game_id": 1, "_user_id": 1},
+                                                              {"_game_id": 1, "_user_id": 2}])
+        # Games of older versions have no version
+        self.engine.execute("ALTER TABLE games DROP COLUMN version")
+
+        upgrade(self.engine)
+
+        self.assertEqual(self.engine.execute("SELECT version FROM games WHERE id = 1").scalar(), 1)
+
+    def test_upgrade_current_schema(self):
+        # A database created with the current models can be upgraded as well
+        engine = create_engine("sqlite:///" + os.path.join(self.directory.name, "new.db"))
+        db.metadata.create_all(engine)
+
+        upgrade(engine)
+
+        with engine.connect() as connection:
+            self.assertEqual(get_schema_version(connection), len(MIGRATIONS))
+
+        engine.dispose()
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from unittest import TestCase
+
+from app import app, db
+from app.game import constants
+from app.game.models import Game
+from app.game.notifications import GameChannels, GameEvent, game_channels
+from app.game.tests.fixtures import StartedGameTest
+
+
+class TestGameChannels(TestCase):
+    def test_publish_and_wait(self):
+        channels = GameChannels()
+        self.assertIsNone(channels.get_event(1))
+
+        first_event = GameEvent(1, 0, constants.GAME_STARTED, 1, "test_1")
+        self.assertIs(channels.set_initial_event(first_event), first_event)
+
+        # Nothing happens
+        self.assertIs(channels.wait_for_change(1, first_event, 0.01), first_event)
+
+        second_event = GameEvent(1, 1, constants.GAME_STARTED, 2, "test_2")
+        threading.Timer(0.05, channels.publish, [second_event]).start()
+        self.assertIs(channels.wait_for_change(1, first_event, 10), second_event)
+
+        # An initial event never replaces a published one
+        self.assertIs(channels.set_initial_event(first_event), second_event)
+
+        # Other games are not affected
+        self.assertIsNone(channels.get_event(2))
+
+    def test_update(self):
+        channels = GameChannels()
+
+        first_event = GameEvent(1, 0, constants.GAME_STARTED, 1, "test_1")
+        self.assertIs(channels.update(first_event), first_event)
+        # An equal event does not change anything
+        self.assertIs(channels.update(GameEvent(1, 0, constants.GAME_STARTED, 1, "test_1")), first_event)
+
+        second_event = GameEvent(1, 1, constants.GAME_STARTED, 2, "test_2")
+        threading.Timer(0.05, channels.update, [second_event]).start()
+        self.assertIs(channels.wait_for_change(1, first_event, 10), second_event)
+
+
+class TestGameEventViews(StartedGameTest):
+    def get_client(self):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = self.user_id
+        return client
+
+    def poll(self, since, timeout):
+        response = self.get_client().get("/game/poll/{game_id}?since={since}&timeout={timeout}".format(
+            game_id=self.game_id, since=since, timeout=timeout))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data.decode())
+
+    def test_poll(self):
+        # Unknown turn: returns at once with the current state from the database
+        event = self.poll(-1, 10)
+        self.assertEqual(event, {"game_id": self.game_id, "turn_number": 0, "state": constants.GAME_STARTED,
+                                 "current_player_id": self.user_id, "current_player": "test_1"})
+
+        # Nothing happens until the timeout
+        start_time = time.perf_counter()
+        self.assertEqual(self.poll(0, 0.05)["turn_number"], 0)
+        self.assertGreaterEqual(time.perf_counter() - start_time, 0.05)
+
+    def test_poll_new_turn(self):
+        self.poll(-1, 10)
+
+        def make_turn():
+            time.sleep(0.05)
+            response = self.get_client().get("/game/make_turn/{game_id}/0".format(game_id=self.game_id))
+            self.assertEqual(response.status_code, 302)
+
+        thread = threading.Thread(target=make_turn)
+        thread.start()
+        event = self.poll(0, 10)
+        thread.join()
+
+        self.assertEqual(event["turn_number"], 1)
+        self.assertEqual(event["current_player_id"], self.user_2_id)
+        self.assertEqual(event["current_player"], "test_2")
+
+    def store_turn_in_other_process(self):
+        """
+        Store the summary of a turn the way another process would: in the database, but not published here.
+        """
+        db.engine.execute(Game.__table__.update().where(Game.id == self.game_id).values(
+            number_of_turns=1, _current_player_id=self.user_2_id))
+
+    def test_poll_other_process(self):
+        self.poll(-1, 10)
+        self.store_turn_in_other_process()
+
+        event = self.poll(0, 10)
+        self.assertEqual(event["turn_number"], 1)
+        self.assertEqual(event["current_player"], "test_2")
+
+    def test_poll_other_process_while_waiting(self):
+        app.config["NOTIFICATION_REFRESH_INTERVAL"] = 0.05
+        try:
+            self.poll(-1, 10)
+            threading.Timer(0.1, self.store_turn_in_other_process).start()
+
+            start_time = time.perf_counter()
+            event = self.poll(0, 10)
+            self.assertLess(time.perf_counter() - start_time, 5)
+        finally:
+            app.config["NOTIFICATION_REFRESH_INTERVAL"] = 5
+
+        self.assertEqual(event["turn_number"], 1)
+
+    def test_event_stream_other_process(self):
+        app.config["NOTIFICATION_HEARTBEAT"] = 0.05
+        try:
+            response = self.get_client().get("/game/events/{game_id}".format(game_id=self.game_id))
+            events = (event.decode() for event in response.response)
+            self.assertEqual(json.loads(next(events).split("data: ")[1])["turn_number"], 0)
+
+            self.store_turn_in_other_process()
+            # The turn is found after the next heartbeat
+            new_events = [event for event, _ in zip(events, range(2)) if not event.startswith(":")]
+        finally:
+            app.config["NOTIFICATION_HEARTBEAT"] = 15
+
+        self.assertEqual(json.loads(new_events[0].split("data: ")[1])["turn_number"], 1)
+
+    def test_event_stream(self):
+        response = self.get_client().get("/game/events/{game_id}".format(game_id=self.game_id))
+        self.assertEqual(response.mimetype, "text/event-stream")
+
+        events = (event.decode() for event in response.response)
+        first_event = next(events)
+        self.assertTrue(first_event.startswith("id: 0\nevent: game\ndata: "))
+        self.assertEqual(json.loads(first_event.split("data: ")[1])["turn_number"], 0)
+
+        game_channels.publish(GameEvent(self.game_id, 1, constants.GAME_LOST, self.user_2_id, "test_2"))
+        second_event = next(events)
+        self.assertEqual(json.loads(second_event.split("data: ")[1])["state"], constants.GAME_LOST)
+
+        # The game is finished, so is the stream
+        self.assertRaises(StopIteration, next, events)
@@ -0,0 +1,108 @@
+import io
+import random
+
+from app import db
+from app.game import constants
+from app.game.models import Game, GameSnapshot
+from app.game.records import export_games, import_games, iter_game_records, RecordFormatError, TURN_FORMAT, \
+    GAME_HEADER_FORMAT, GAME_HEADER_FORMAT_V1, FILE_HEADER_FORMAT, USER_ID_FORMAT, RECORD_FORMAT_MAGIC
+from app.game.simulation import CautiousBot, RandomBot, play_game, persist_game
+from app.game.tests.fixtures import StartedGameTest
+
+
+class TestRecords(StartedGameTest):
+    def setUp(self):
+        StartedGameTest.setUp(self)
+
+        random_generator = random.Random(7)
+        for bot_class in [CautiousBot, RandomBot, CautiousBot]:
+            persist_game(play_game(bot_class, 2, random_generator), [self.user, self.user_2])
+        # A game without any turns (the one of the fixture) is exported as well
+        db.session.commit()
+
+    def get_games(self):
+        return Game.query.order_by(Game.id).all()
+
+    def test_record_size(self):
+        fileobj = io.BytesIO()
+        self.assertEqual(export_games(Game.query, fileobj), 4)
+
+        number_of_turns = sum(game.number_of_turns for game in self.get_games())
+        self.assertEqual(len(fileobj.getvalue()),
+                         FILE_HEADER_FORMAT.size + 4 * (GAME_HEADER_FORMAT.size + 2 * USER_ID_FORMAT.size + 50) +
+                         number_of_turns * TURN_FORMAT.size)
+        self.assertEqual(TURN_FORMAT.size, 4)
+
+    def test_export_and_import(self):
+        fileobj = io.BytesIO()
+        export_games(Game.query, fileobj, chunk_size=3)
+
+        fileobj.seek(0)
+        self.assertEqual(import_games(fileobj, chunk_size=3), 4)
+
+        games = self.get_games()
+        self.assertEqual(len(games), 8)
+        self.assertGreater(GameSnapshot.query.count(), 0)
+
+        for game, imported_game in zip(games[:4], games[4:]):
+            self.assertEqual(imported_game.start_deck, game.start_deck)
+            self.assertEqual(imported_game.state, game.state)
+            self.assertEqual(imported_game.users, game.users)
+            self.assertEqual(imported_game.started, game.started)
+            self.assertEqual(imported_game.number_of_turns, game.number_of_turns)
+            self.assertEqual(imported_game.score, game.score)
+            self.assertEqual(imported_game.current_player, game.current_player)
+
+            self.assertEqual([str(turn) for turn in imported_game.played_turns],
+                             [str(turn) for turn in game.played_turns])
+            self.assertEqual([turn._card for turn in imported_game.played_turns],
+                             [turn._card for turn in game.played_turns])
+
+            self.assertEqual([(snapshot.turn_number, snapshot.data) for snapshot in imported_game.snapshots],
+                             [(snapshot.turn_number, snapshot.data) for snapshot in game.snapshots])
+            self.assertEqual(imported_game.game_state.to_bytes(), game.game_state.to_bytes())
+
+    def test_start_player(self):
+        # The game of the fixture is started by the second user
+        self.game.start_player = self.user_2
+        db.session.commit()
+
+        fileobj = io.BytesIO()
+        export_games(Game.query.filter(Game.id == self.game_id), fileobj)
+        fileobj.seek(0)
+        import_games(fileobj)
+
+        imported_game = self.get_games()[-1]
+        self.assertNotEqual(imported_game.id, self.game_id)
+        self.assertEqual(imported_game.users[0], self.user)
+        self.assertEqual(imported_game.start_player, self.user_2)
+
+    def test_version_1(self):
+        # Records of version 1 do not store the start player
+        fileobj = io.BytesIO()
+        fileobj.write(FILE_HEADER_FORMAT.pack(RECORD_FORMAT_MAGIC, 1))
+        fileobj.write(GAME_HEADER_FORMAT_V1.pack(2, 5, 10, 3, constants.GAME_STARTED, 0, 50, 0))
+        fileobj.write(USER_ID_FORMAT.pack(self.user_2_id) + USER_ID_FORMAT.pack(self.user_id))
+        fileobj.write(bytes(card.id for card in self.start_deck))
+        fileobj.seek(0)
+
+        game_record, = iter_game_records(fileobj)
+        self.assertEqual(game_record.user_ids, [self.user_2_id, self.user_id])
+        self.assertEqual(game_record.start_player_index, 0)
+
+    def test_export_query(self):
+        fileobj = io.BytesIO()
+        self.assertEqual(export_games(Game.query.filter(Game.number_of_turns > 0), fileobj, chunk_size=1), 3)
+
+        fileobj.seek(0)
+        game_records = list(iter_game_records(fileobj))
+        self.assertEqual(len(game_records), 3)
+        self.assertEqual(game_records[0].user_ids, [self.user_id, self.user_2_id])
+
+    def test_invalid_file(self):
+        self.assertRaises(RecordFormatError, list, iter_game_records(io.BytesIO(b"HNBX\x01")))
+        self.assertRaises(RecordFormatError, list, iter_game_records(io.BytesIO(b"HNBR\x03")))
+
+        fileobj = io.BytesIO()
+        export_games(Game.query, fileobj)
+        self.assertRaises(RecordFormatError, list, iter_game_records(io.BytesIO(fileobj.getvalue()[:-1])))
@@ -0,0 +1,129 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from sqlalchemy import event
+
+from app import app, db
+from app.game import constants
+from app.game.render_cache import MemoryRenderCache, FileRenderCache, SqliteRenderCache, get_render_cache, \
+    make_key
+from app.game.tests.fixtures import StartedGameTest
+
+
+class TestRenderCacheBackends(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def get_render_caches(self):
+        return [MemoryRenderCache(2),
+                FileRenderCache(os.path.join(self.directory.name, "pages"), 2),
+                SqliteRenderCache(os.path.join(self.directory.name, "pages.db"), 2, refresh_interval=0)]
+
+    def test_get_and_set(self):
+        for render_cache in self.get_render_caches():
+            self.assertIsNone(render_cache.get(make_key(1, 0, constants.GAME_STARTED, 1)))
+
+            render_cache.set(make_key(1, 0, constants.GAME_STARTED, 1), "<p>Game 1</p>")
+            render_cache.set(make_key(1, 0, constants.GAME_STARTED, None), "<p>Game 1 for nobody</p>")
+
+            self.assertEqual(render_cache.get(make_key(1, 0, constants.GAME_STARTED, 1)), "<p>Game 1</p>")
+            self.assertEqual(render_cache.get(make_key(1, 0, constants.GAME_STARTED, None)),
+                             "<p>Game 1 for nobody</p>")
+            self.assertIsNone(render_cache.get(make_key(1, 1, constants.GAME_STARTED, 1)))
+
+            render_cache.clear()
+            self.assertIsNone(render_cache.get(make_key(1, 0, constants.GAME_STARTED, 1)))
+
+    def test_least_recently_used(self):
+        for render_cache in self.get_render_caches():
+            render_cache.set(make_key(1, 0, constants.GAME_STARTED, 1), "first")
+            render_cache.set(make_key(2, 0, constants.GAME_STARTED, 1), "second")
+            if isinstance(render_cache, FileRenderCache):
+                # Make sure the modification times differ
+                os.utime(render_cache._get_file_name(make_key(1, 0, constants.GAME_STARTED, 1)), (0, 0))
+                os.utime(render_cache._get_file_name(make_key(2, 0, constants.GAME_STARTED, 1)), (1, 1))
+
+            self.assertEqual(render_cache.get(make_key(1, 0, constants.GAME_STARTED, 1)), "first")
+            render_cache.set(make_key(3, 0, constants.GAME_STARTED, 1), "third")
+
+            self.assertEqual(render_cache.get(make_key(1, 0, constants.GAME_STARTED, 1)), "first")
+            self.assertIsNone(render_cache.get(make_key(2, 0, constants.GAME_STARTED, 1)))
+            self.assertEqual(render_cache.get(make_key(3, 0, constants.GAME_STARTED, 1)), "third")
+
+    def test_sqlite_refresh_interval(self):
+        path = os.path.join(self.directory.name, "pages.db")
+        render_cache = SqliteRenderCache(path, 2, refresh_interval=60)
+        key = make_key(1, 0, constants.GAME_STARTED, 1)
+        render_cache.set(key, "first")
+
+        def get_last_used():
+            with render_cache._connect() as connection:
+                return connection.execute("SELECT last_used FROM render_cache").fetchone()[0]
+
+        # A recent use is not stored again
+        last_used = get_last_used()
+        self.assertEqual(render_cache.get(key), "first")
+        self.assertEqual(get_last_used(), last_used)
+
+        # An old one is
+        with render_cache._connect() as connection:
+            connection.execute("UPDATE render_cache SET last_used = 0")
+        self.assertEqual(render_cache.get(key), "first")
+        self.assertGreater(get_last_used(), 0)
+
+    def test_invalidate_game(self):
+        for render_cache in self.get_render_caches():
+            render_cache.set(make_key(1, 0, constants.GAME_STARTED, 1), "first")
+            render_cache.set(make_key(11, 0, constants.GAME_STARTED, 1), "other game")
+
+            render_cache.invalidate_game(1)
+
+            self.assertIsNone(render_cache.get(make_key(1, 0, constants.GAME_STARTED, 1)))
+            self.assertEqual(render_cache.get(make_key(11, 0, constants.GAME_STARTED, 1)), "other game")
+
+
+class TestGamePageCache(StartedGameTest):
+    def render_game_page(self, user_id, statements=None):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = user_id
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statements is not None:
+                statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = client.get("/game/game/{game_id}".format(game_id=self.game_id))
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cache_hit(self):
+        page = self.render_game_page(self.user_id)
+
+        statements = []
+        self.assertEqual(self.render_game_page(self.user_id, statements), page)
+        # Only the summary of the game is loaded (the user is cached, see app/users/identity.py)
+        self.assertEqual(len(statements), 1)
+
+        # Every user has their own page
+        self.assertNotEqual(self.render_game_page(self.user_2_id), page)
+
+    def test_new_turn(self):
+        page = self.render_game_page(self.user_id)
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = self.user_id
+        self.assertEqual(client.get("/game/make_turn/{game_id}/0".format(game_id=self.game_id)).status_code, 302)
+
+        self.assertNotEqual(self.render_game_page(self.user_id), page)
+        self.assertIn(b"Current turn number:</td>\n        <td>1</td>", self.render_game_page(self.user_id))
+        self.assertEqual(len(get_render_cache(app)), 1)
@@ -0,0 +1,115 @@
+from sqlalchemy import event
+
+from app import app, db
+from app.game.models import Game
+from app.game.repository import GameRepository
+from app.game.tests.fixtures import StartedGameTest
+from app.users.identity import get_user_cache
+from app.users.models import User
+
+
+class TestGameRepository(StartedGameTest):
+    def count_statements(self, function):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            function()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+        return len(statements)
+
+    def render_page(self, url):
+        # Every page loads the user, not only the first one
+        get_user_cache(app).clear()
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = self.user_id
+
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.reload()
+
+        return response
+
+    def render_game_page(self):
+        return self.render_page("/game/game/{game_id}".format(game_id=self.game_id))
+
+    def render_home_page(self):
+        return self.render_page("/game/home/")
+
+    def test_new_users(self):
+        # Users, which are not stored yet, are accepted without using the database
+        users = [User("test_3"), User("test_4")]
+        games = []
+        self.assertEqual(self.count_statements(lambda: games.append(Game(
+            start_deck=self.start_deck, users=users, start_player=users[1], start_failures=3, start_hints=10,
+            start_number_of_cards=5))), 0)
+        game = games[0]
+        self.assertIsNone(game.current_player)
+
+        db.session.add(game)
+        db.session.commit()
+        game_id, user_id = game.id, users[0].id
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = user_id
+        client.get("/game/start_game/{game_id}".format(game_id=game_id))
+
+        db.session.remove()
+        game = Game.query.get(game_id)
+        # The users got their ids in the order they were stored, which is not the order they were given in
+        self.assertEqual([user.id for user in game.users], sorted(user.id for user in game.users))
+        self.assertEqual(game.current_player, game.users[0])
+        self.assertEqual(game.hints_left, 10)
+
+    def test_load_for_view(self):
+        for turn_id in [0, 10, 1]:
+            self.make_turn(turn_id)
+
+        db.session.remove()
+
+        number_of_statements = self.count_statements(lambda: GameRepository.load_for_view(self.game_id))
+        self.assertEqual(number_of_statements, 2)
+
+        game = GameRepository.load_for_view(self.game_id)
+
+        # Everything is already loaded
+        def use_game():
+            self.assertEqual([turn.turn_number for turn in game.played_turns], [0, 1, 2])
+            self.assertEqual([user.name for user in game.users], ["test_1", "test_2"])
+            self.assertEqual(game.current_turn_number, 3)
+            self.assertEqual(game.start_player.name, "test_1")
+            list(map(str, game.played_turns))
+            game.get_possible_turns(game.current_user)
+
+        self.assertEqual(self.count_statements(use_game), 0)
+        self.assertNotIn(game, db.session)
+
+    def test_constant_statements_for_game_page(self):
+        statements_without_turns = self.count_statements(self.render_game_page)
+
+        for turn_id in [0, 10, 1, 10, 3]:
+            self.make_turn(turn_id)
+
+        statements_with_turns = self.count_statements(self.render_game_page)
+
+        self.assertEqual(statements_without_turns, statements_with_turns)
+
+    def test_constant_statements_for_home_page(self):
+        statements_without_turns = self.count_statements(self.render_home_page)
+
+        for turn_id in [0, 10, 1]:
+            self.make_turn(turn_id)
+
+        statements_with_turns = self.count_statements(self.render_home_page)
+
+        self.assertEqual(statements_without_turns, statements_with_turns)
+        self.assertIn(b"(turns: 3)", self.render_home_page().data)
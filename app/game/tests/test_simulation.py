@@ -0,0 +1,65 @@
+import random
+
+import app.game.constants as constants
+from app import db
+from app.game.simulation import SimulatedGame, Bot, RandomBot, CautiousBot, play_game, persist_game
+from app.game.tests.fixtures import StartedGameTest, get_sorted_start_deck
+
+
+class TestSimulation(StartedGameTest):
+    def test_moves_are_possible_turns(self):
+        simulated_game = SimulatedGame(get_sorted_start_deck(), 2, start_number_of_cards=5)
+
+        for turn_id in [0, 10, 1, 15]:
+            moves = simulated_game.get_moves()
+            possible_turns = self.game.get_possible_turns(self.game.current_user)
+
+            self.assertEqual(len(moves), len(possible_turns))
+            for move, possible_turn in zip(moves, possible_turns):
+                self.assertEqual(move.type, possible_turn.type)
+                self.assertEqual(list(move.cards), possible_turn.cards)
+                self.assertEqual(move.hint_type, possible_turn.hint_type)
+
+            simulated_game.make_move(moves[turn_id])
+            self.make_turn(turn_id)
+
+            self.assertEqual(simulated_game.history[-1][2], (self.game.played_turns[-1].last_card_drawn,
+                                                             self.game.played_turns[-1].put_correct,
+                                                             self.game.played_turns[-1].hint_restored))
+
+    def test_play(self):
+        for bot_class in [RandomBot, CautiousBot]:
+            simulated_game = play_game(bot_class, 3, random.Random(42))
+
+            self.assertTrue(simulated_game.finished)
+            self.assertEqual(simulated_game.game_state.turn_number, len(simulated_game.history))
+
+            if simulated_game.status == constants.GAME_LOST:
+                self.assertIsNotNone(simulated_game.loss_reason)
+
+            # Same seed, same game
+            other_simulated_game = play_game(bot_class, 3, random.Random(42))
+            self.assertEqual(simulated_game.history, other_simulated_game.history)
+
+    def test_bot_interface(self):
+        # Bots have to choose their moves
+        self.assertRaises(TypeError, Bot)
+
+    def test_persist_game(self):
+        simulated_game = play_game(CautiousBot, 2, random.Random(1))
+
+        game = persist_game(simulated_game, [self.user_2, self.user])
+        db.session.commit()
+        self.game_id = game.id
+        self.reload()
+
+        self.assertEqual(self.game.state, simulated_game.status)
+        self.assertEqual(self.game.score, simulated_game.score)
+        self.assertEqual(self.game.number_of_turns, len(simulated_game.history))
+
+        game_state, simulated_game_state = self.game.game_state, simulated_game.game_state
+        self.assertEqual(game_state.turn_number, simulated_game_state.turn_number)
+        self.assertEqual(game_state.number_of_hints, simulated_game_state.number_of_hints)
+        self.assertEqual(game_state.number_of_failures, simulated_game_state.number_of_failures)
+        self.assertEqual(game_state.card_status, simulated_game_state.card_status)
+        self.assertEqual(game_state.hands, simulated_game_state.hands)
@@ -0,0 +1,92 @@
+import random
+from unittest import TestCase
+
+from app import db
+from app.game.models import Game, GameSnapshot, Turn, SNAPSHOT_INTERVAL, replay_turn_rows
+from app.game.simulation import SimulatedGame, CautiousBot, play_game, persist_game
+from app.game.state import GameState
+from app.game.tests.fixtures import StartedGameTest, get_replayed_states
+
+
+class TestGameStateBytes(TestCase):
+    def test_round_trip(self):
+        random_generator = random.Random(5)
+        simulated_game = SimulatedGame(Game.get_random_start_deck(random_generator), 3)
+
+        while not simulated_game.finished:
+            game_state = simulated_game.game_state
+            data = game_state.to_bytes()
+            loaded_game_state = GameState.from_bytes(data, simulated_game.start_deck)
+
+            self.assertEqual(loaded_game_state.to_bytes(), data)
+            self.assertEqual(loaded_game_state.turn_number, game_state.turn_number)
+            self.assertEqual(loaded_game_state.number_of_hints, game_state.number_of_hints)
+            self.assertEqual(loaded_game_state.number_of_failures, game_state.number_of_failures)
+            self.assertEqual(loaded_game_state.card_status, game_state.card_status)
+            self.assertEqual(loaded_game_state.hands, game_state.hands)
+            self.assertEqual(loaded_game_state.next_card, game_state.next_card)
+            for player_index in range(3):
+                self.assertEqual(loaded_game_state.get_moves(player_index), game_state.get_moves(player_index))
+
+            simulated_game.make_move(random_generator.choice(simulated_game.get_moves()))
+
+    def test_invalid_version(self):
+        data = bytearray(GameState(Game.get_random_start_deck(), 2, 5, 10, 3).to_bytes())
+        data[0] = 0
+
+        self.assertRaises(ValueError, GameState.from_bytes, bytes(data), Game.get_random_start_deck())
+
+
+class TestGameSnapshots(StartedGameTest):
+    def setUp(self):
+        StartedGameTest.setUp(self)
+
+        self.simulated_game = play_game(CautiousBot, 2, random.Random(1))
+        self.number_of_turns = len(self.simulated_game.history)
+        self.assertGreater(self.number_of_turns, 2 * SNAPSHOT_INTERVAL)
+
+        game = persist_game(self.simulated_game, [self.user, self.user_2])
+        db.session.commit()
+        self.game_id = game.id
+        self.reload()
+
+    def test_snapshots_are_stored(self):
+        turn_numbers = [snapshot.turn_number for snapshot in
+                        GameSnapshot.query.filter_by(_game_id=self.game_id).order_by(GameSnapshot.turn_number)]
+        self.assertEqual(turn_numbers, list(range(SNAPSHOT_INTERVAL, self.number_of_turns + 1, SNAPSHOT_INTERVAL)))
+
+    def test_snapshots_equal_replay(self):
+        replayed_states = get_replayed_states(self.simulated_game)
+
+        # The turns are not loaded, so the state is built from the last snapshot
+        self.assertFalse(Game.played_turns.is_cached(self.game))
+        self.assertEqual(self.game.game_state.to_bytes(), replayed_states[-1])
+
+        for turn_number in range(self.number_of_turns + 1):
+            self.assertEqual(self.game.load_game_state(turn_number).to_bytes(), replayed_states[turn_number])
+
+        # The same as replaying all turns of the game
+        Game.played_turns.invalidate_cache(self.game)
+        Game.game_state.invalidate_cache(self.game)
+        self.game.played_turns
+        self.assertEqual(self.game.game_state.to_bytes(), replayed_states[-1])
+
+    def test_streamed_turn_rows(self):
+        game = Game.query.get(self.game_id)
+
+        turn_rows = list(game.iter_turn_rows(batch_size=7))
+        self.assertEqual([turn_row.turn_number for turn_row in turn_rows], list(range(self.number_of_turns)))
+        self.assertNotIsInstance(turn_rows[0], Turn)
+        self.assertEqual([turn_row.type for turn_row in turn_rows],
+                         [move.type for player_index, move, properties in self.simulated_game.history])
+
+        turn_rows = list(game.iter_turn_rows(SNAPSHOT_INTERVAL, SNAPSHOT_INTERVAL + 3, batch_size=2))
+        self.assertEqual([turn_row.turn_number for turn_row in turn_rows],
+                         [SNAPSHOT_INTERVAL, SNAPSHOT_INTERVAL + 1, SNAPSHOT_INTERVAL + 2])
+
+        # Folding over all streamed turns gives the same state as the snapshots
+        game_state = GameState(game.start_deck, 2, game.start_number_of_cards, game.start_hints, game.start_failures)
+        replay_turn_rows(game_state, game.iter_turn_rows(batch_size=3),
+                         {user.id: index for index, user in enumerate(game.users)})
+        self.assertEqual(game_state.to_bytes(), game.load_game_state().to_bytes())
+        self.assertFalse(Game.played_turns.is_cached(game))
@@ -0,0 +1,224 @@
+import itertools
+import random
+from unittest import TestCase
+
+import app.game.constants as constants
+from app.game.models import Card, Game
+from app.game.simulation import SimulatedGame
+from app.game.state import GameState, Hands, Move
+from app.game.tests.fixtures import StartedGameTest, get_sorted_start_deck
+
+
+class TestGameState(StartedGameTest):
+    def assertStatesEqual(self, state, other_state):
+        self.assertEqual(state.turn_number, other_state.turn_number)
+        self.assertEqual(state.number_of_hints, other_state.number_of_hints)
+        self.assertEqual(state.number_of_failures, other_state.number_of_failures)
+        self.assertEqual(state.turns_after_last_card, other_state.turns_after_last_card)
+        self.assertEqual(state.card_status, other_state.card_status)
+        self.assertEqual(state.card_counter, other_state.card_counter)
+        self.assertEqual(state.hands, other_state.hands)
+
+    def test_start_state(self):
+        game_state = self.game.game_state
+
+        self.assertEqual(game_state.turn_number, 0)
+        self.assertEqual(game_state.number_of_hints, 10)
+        self.assertEqual(game_state.number_of_failures, 3)
+        self.assertEqual(game_state.next_card, self.start_deck[10])
+        self.assertEqual(game_state.get_hand(0), self.start_deck[0:10:2])
+        self.assertEqual(game_state.get_hand(1), self.start_deck[1:10:2])
+        self.assertEqual(game_state.get_status(), constants.GAME_STARTED)
+
+        self.assertEqual(self.game.get_cards_of_user(self.user), self.start_deck[0:10:2])
+        self.assertEqual(self.game.get_all_hands(), [self.start_deck[0:10:2], self.start_deck[1:10:2]])
+        self.assertEqual(self.game.current_user, self.user)
+
+    def test_incremental_state_equals_replay(self):
+        incremental_state = GameState(get_sorted_start_deck(), 2, 5, 10, 3)
+
+        # put green 1, destroy green 2, hint for green, put green 1 again (wrong), hint for value 1
+        for turn_id in [0, 3, 10, 0, 15]:
+            possible_turn = self.game.get_possible_turns(self.game.current_user)[turn_id]
+            incremental_state.apply_turn(possible_turn, self.game.game_state.current_player_index)
+
+            self.make_turn(turn_id)
+
+            self.assertStatesEqual(self.game.game_state, incremental_state)
+
+        self.assertEqual(self.game.current_turn_number, 5)
+        self.assertEqual(self.game.current_number_of_hints, 8)
+        self.assertEqual(self.game.current_number_of_failures, 2)
+        self.assertEqual(self.game.card_status[constants.COLOR_GREEN], 1)
+        self.assertEqual(self.game.next_card, self.start_deck[13])
+        self.assertEqual(self.game.current_user, self.user_2)
+
+    def test_add_turn(self):
+        possible_turn = self.game.get_possible_turns(self.user)[0]
+        self.game.add_turn(possible_turn)
+
+        self.assertEqual(self.game.current_turn_number, 1)
+        self.assertEqual(self.game.current_user, self.user_2)
+        self.assertEqual(self.game.card_status[constants.COLOR_GREEN], 1)
+        self.assertNotIn(possible_turn.cards[0], self.game.get_cards_of_user(self.user))
+        self.assertEqual(self.game.played_turns, [possible_turn])
+
+    def test_status(self):
+        game_state = GameState(get_sorted_start_deck(), 2, 5, 10, 1)
+        game_state.apply(constants.TURN_PUT, 0, [Card(constants.COLOR_GREEN, 2, 1)], put_correct=False)
+
+        self.assertEqual(game_state.get_status(), constants.GAME_LOST)
+
+        game_state = GameState(get_sorted_start_deck(), 2, 5, 10, 1)
+        game_state.card_status = {color: 5 for color in constants.COLORS}
+
+        self.assertEqual(game_state.get_status(), constants.GAME_WON)
+
+    def test_hints(self):
+        green_one, green_three = Card(constants.COLOR_GREEN, 1, 1), Card(constants.COLOR_GREEN, 3, 0)
+        self.assertNotIn(green_one, self.game.hints_by_card)
+        self.assertEqual(self.game.get_hints_for_card(green_one), ["", "", "", ""])
+
+        # green hint to user 2, value 1 hint to user 1, not blue hint to user 2, not 5 hint to user 1,
+        # value 3 hint to user 2
+        for turn_id in [10, 15, 11, 19, 17]:
+            self.make_turn(turn_id)
+
+        self.assertEqual(len(self.game.hints_by_card), 10)
+
+        self.assertEqual(self.game.get_hints_for_card(green_one),
+                         ["", "Color is green", "", "Color is not blue"])
+        self.assertEqual(self.game.get_hints_for_card(green_three),
+                         ["Value is 3", "Color is green", "", "Color is not blue"])
+        self.assertEqual(self.game.get_hints_for_card(Card(constants.COLOR_GREEN, 1, 0)),
+                         ["Value is 1", "", "Value is not 5", ""])
+        self.assertEqual(self.game.get_hints_for_card(Card(constants.COLOR_GREEN, 2, 1)),
+                         ["", "", "Value is not 5", ""])
+
+        # The index is also updated incrementally: not white hint to user 1
+        possible_turn = self.game.get_possible_turns(self.user_2)[12]
+        self.game.add_turn(possible_turn)
+        self.assertEqual(self.game.get_hints_for_card(Card(constants.COLOR_GREEN, 1, 0)),
+                         ["Value is 1", "", "Value is not 5", "Color is not white"])
+
+    def test_summary(self):
+        self.assertEqual(self.game.number_of_turns, 0)
+        self.assertEqual(self.game.hints_left, 10)
+        self.assertEqual(self.game.failures_left, 3)
+        self.assertEqual(self.game.score, 0)
+        self.assertEqual(self.game.current_player, self.user)
+        self.assertIsNotNone(self.game.last_activity)
+
+        # put green 1, hint to user 1, put green 1 again (wrong)
+        for turn_id in [0, 10, 0]:
+            self.make_turn(turn_id)
+
+        self.assertEqual(self.game.number_of_turns, 3)
+        self.assertEqual(self.game.hints_left, 9)
+        self.assertEqual(self.game.failures_left, 2)
+        self.assertEqual(self.game.score, 1)
+        self.assertEqual(self.game.current_player, self.user_2)
+
+    def test_possible_turns_are_lazy(self):
+        possible_turns = self.game.get_possible_turns(self.user)
+        other_possible_turns = self.game.get_possible_turns(self.user_2)
+
+        self.assertEqual(len(possible_turns), 20)
+        self.assertEqual(possible_turns._turns, {})
+
+        # green hint to user 2
+        possible_turn = possible_turns[10]
+        self.assertEqual(possible_turn.possibility_number, 10)
+        self.assertEqual(possible_turn.hint_user, self.user_2)
+        self.assertEqual(possible_turn.cards, self.start_deck[1:10:2])
+        self.assertEqual(possible_turn._card, ",".join(map(str, self.start_deck[1:10:2])))
+        self.assertEqual(list(possible_turns._turns), [10])
+        self.assertIs(possible_turns[10], possible_turn)
+        self.assertRaises(IndexError, possible_turns.__getitem__, 20)
+
+        green_one = self.start_deck[1]
+        self.assertEqual([turn.possibility_number for turn in possible_turns.for_card(green_one)],
+                         [turn.possibility_number for turn in possible_turns if green_one in turn.cards])
+        self.assertEqual([turn.possibility_number for turn in possible_turns.for_card(self.start_deck[0])], [0, 1])
+
+        # The turns of an older state can not be created anymore
+        self.game.add_turn(possible_turns[0])
+        self.assertRaises(RuntimeError, other_possible_turns.__getitem__, 2)
+
+    def test_move_numbers(self):
+        random_generator = random.Random(3)
+        simulated_game = SimulatedGame(Game.get_random_start_deck(random_generator), 3)
+
+        while not simulated_game.finished:
+            game_state = simulated_game.game_state
+
+            for player_index in range(3):
+                moves = game_state.get_moves(player_index)
+                self.assertEqual(moves, get_moves_with_filters(game_state, player_index))
+                self.assertEqual(game_state.get_number_of_moves(player_index), len(moves))
+                self.assertEqual([game_state.get_move(player_index, number) for number in range(len(moves))], moves)
+
+                for card in itertools.chain.from_iterable(game_state.get_all_hands()):
+                    self.assertEqual(game_state.get_move_numbers_for_card(player_index, card),
+                                     [number for number, move in enumerate(moves) if card in move.cards])
+
+            simulated_game.make_move(random_generator.choice(simulated_game.get_moves()))
+
+
+def get_moves_with_filters(game_state, player_index):
+    """
+    Straightforward implementation of GameState.get_moves, filtering the hands for every hint.
+    """
+    moves = []
+
+    for card in game_state.get_hand(player_index):
+        moves.append(Move(constants.TURN_PUT, (card,), -1, None))
+        moves.append(Move(constants.TURN_DESTROY, (card,), -1, None))
+
+    if game_state.number_of_hints > 0:
+        for other_player_index in range(game_state.number_of_players):
+            if other_player_index == player_index:
+                continue
+
+            other_players_cards = tuple(game_state.get_hand(other_player_index))
+            for color in constants.COLORS:
+                cards = tuple(card for card in other_players_cards if card.color == color)
+                if cards:
+                    moves.append(Move(constants.TURN_HINT, cards, constants.HINT_COLOR, other_player_index))
+                else:
+                    moves.append(Move(constants.TURN_HINT, other_players_cards, constants.HINT_NOT_COLOR[color],
+                                      other_player_index))
+
+            for value in constants.VALUES:
+                cards = tuple(card for card in other_players_cards if card.value == value)
+                if cards:
+                    moves.append(Move(constants.TURN_HINT, cards, constants.HINT_VALUE, other_player_index))
+                else:
+                    moves.append(Move(constants.TURN_HINT, other_players_cards, constants.HINT_NOT_VALUE[value],
+                                      other_player_index))
+
+    return moves
+
+
+class TestHands(TestCase):
+    def test_add_and_remove(self):
+        hands = Hands(2, 3)
+
+        for card_id in [0, 1, 2]:
+            hands.add(0, card_id)
+        hands.add(1, 10)
+
+        self.assertEqual(hands.get_card_ids(0), [0, 1, 2])
+        self.assertEqual(hands.get_card_ids(1), [10])
+        self.assertRaises(ValueError, hands.add, 0, 3)
+
+        hands.remove(0, 1)
+        self.assertEqual(hands.get_card_ids(0), [0, 2])
+        hands.add(0, 3)
+        self.assertEqual(hands.get_card_ids(0), [0, 2, 3])
+
+        # The card is owned by the other player
+        self.assertRaises(ValueError, hands.remove, 1, 0)
+
+        hands.remove(1, 10)
+        self.assertEqual(hands.get_card_ids(1), [])
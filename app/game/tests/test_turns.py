@@ -0,0 +1,78 @@
+from sqlalchemy import event
+
+from app import app, db
+from app.game import constants
+from app.game.models import Turn
+from app.game.tests.fixtures import StartedGameTest
+from app.game.turns import apply_turn, make_turn, TurnConflictError
+
+
+class TestTurns(StartedGameTest):
+    def test_apply_turn(self):
+        possible_turn = self.game.get_possible_turns(self.user)[1]
+        turn = apply_turn(self.game, possible_turn)
+
+        self.assertEqual(turn.type, constants.TURN_DESTROY)
+        self.assertEqual(turn.turn_number, 0)
+        # The game is updated in memory, before anything is written
+        self.assertEqual(self.game.number_of_turns, 1)
+        self.assertEqual(self.game.current_player, self.user_2)
+        self.assertIn(self.game, db.session.dirty)
+
+        db.session.commit()
+        self.reload()
+        self.assertEqual(self.game.number_of_turns, 1)
+        self.assertEqual(Turn.query.filter_by(game=self.game).count(), 1)
+
+    def test_single_transaction(self):
+        self.reload()
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.split()[0])
+
+        def commit(conn):
+            statements.append("COMMIT")
+
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(db.engine, "commit", commit)
+        try:
+            with app.test_request_context():
+                make_turn(self.game_id, self.user, 1)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+            event.remove(db.engine, "commit", commit)
+
+        # The turn and the update of the game are written together by one commit
+        writes = [statement for statement in statements if statement != "SELECT"]
+        self.assertEqual(writes, ["UPDATE", "INSERT", "COMMIT"])
+
+        self.reload()
+        self.assertEqual(self.game.number_of_turns, 1)
+        self.assertEqual(self.game.version, 2)
+
+    def test_make_turn_errors(self):
+        self.reload()
+
+        self.assertRaisesRegex(AttributeError, "It is not the users turn.", make_turn, self.game_id, self.user_2, 1)
+        self.assertRaisesRegex(RuntimeError, "Turn is not possible.", make_turn, self.game_id, self.user, 1000)
+        self.assertRaises(TurnConflictError, make_turn, self.game_id, self.user, 1, expected_turn_number=1)
+
+        make_turn(self.game_id, self.user, 1, expected_turn_number=0)
+        self.assertRaises(TurnConflictError, make_turn, self.game_id, self.user_2, 1, expected_turn_number=0)
+
+        self.reload()
+        self.assertEqual(self.game.number_of_turns, 1)
+
+    def test_start_game(self):
+        self.game.state = constants.GAME_CREATED
+        db.session.commit()
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = self.user_id
+        self.assertEqual(client.get("/game/start_game/{game_id}".format(game_id=self.game_id)).status_code, 302)
+
+        self.reload()
+        self.assertEqual(self.game.state, constants.GAME_STARTED)
+        self.assertEqual(self.game.version, 3)
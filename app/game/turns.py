@@ -0,0 +1,102 @@
+# Applying the turns of the players to their games. A turn is applied in memory: the game state of the game is
+# advanced by it and the summary and status of the game are computed from the new state. The new Turn, the update
+# of the Game (checked against its version) and a possible snapshot are then written by a single flush and commit,
+# so every turn needs exactly one transaction.
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import db
+from app.game.models import Game, Turn
+
+
+class TurnConflictError(RuntimeError):
+    """
+    The turn can not be made, because the game was changed by other turns.
+    """
+    pass
+
+
+def apply_turn(game, possible_turn, last_activity=None):
+    """
+    Create the Turn of the possible turn, add it to the session and apply it to the game, including its summary
+    and status. Nothing is written to the database before the next flush.
+
+    :param game: The game of the possible turn.
+    :param possible_turn: One of the possible turns of the current user of the game.
+    :param last_activity: The time of the turn. Defaults to now.
+    :return: The new Turn.
+    """
+    turn = Turn.from_possible_turn(possible_turn)
+
+    db.session.add(turn)
+    game.add_turn(turn)
+    game.update_summary(last_activity)
+    game.update_game_status()
+
+    return turn
+
+
+def get_check_error(error, conflict_seen):
+    if conflict_seen:
+        return TurnConflictError("The game was changed by another turn: " + str(error))
+    return error
+
+
+def store_turn(game_id, user, turn_id, expected_turn_number=None, conflict_seen=False):
+    """
+    Load the game, check the turn and store it together with the update of the game in a single transaction.
+    The commit fails with a StaleDataError (or an IntegrityError for the turn number), if the game was changed
+    since it was loaded.
+
+    :param game_id: The id of the game.
+    :param user: The user making the turn, which has to be the current user of the game.
+    :param turn_id: The number of the possible turn.
+    :param expected_turn_number: If given, the turn is only made if the game still has this number of turns.
+    :param conflict_seen: Whether an earlier try failed, because the game was changed by another turn. Then the
+        turn is usually not possible anymore because of this other turn (e.g. the same turn submitted twice), so
+        a failing check raises a TurnConflictError instead.
+    :return: The updated game.
+    """
+    game = Game.query.filter_by(id=game_id).one()
+
+    if expected_turn_number is not None and game.number_of_turns != expected_turn_number:
+        raise TurnConflictError("The game has changed since the turn was chosen.")
+
+    if user != game.current_user:
+        raise get_check_error(AttributeError("It is not the users turn."), conflict_seen)
+
+    possible_turns = game.get_possible_turns(user)
+
+    if turn_id >= len(possible_turns):
+        raise get_check_error(RuntimeError("Turn is not possible."), conflict_seen)
+
+    possible_turn = possible_turns[turn_id]
+
+    assert possible_turn.possibility_number == turn_id
+
+    apply_turn(game, possible_turn)
+    db.session.commit()
+
+    return game
+
+
+def make_turn(game_id, user, turn_id, expected_turn_number=None, retries=0):
+    """
+    Store the turn (see store_turn). If another turn of the game was stored at the same time, the turn is checked
+    and tried again on the changed game, at most retries times.
+
+    :return: The updated game.
+    :raises TurnConflictError: If the game does not have the expected number of turns (anymore), if the turn is
+        not possible anymore after another turn was stored at the same time or if the game was changed by other
+        turns during all tries.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return store_turn(game_id, user, turn_id, expected_turn_number, conflict_seen=attempt > 0)
+        except (StaleDataError, IntegrityError):
+            # The version of the game or the turn number is already taken. Start again with fresh objects,
+            # as the cached game state of the game is not valid anymore.
+            db.session.rollback()
+            db.session.expunge_all()
+
+    raise TurnConflictError("The game was changed by other turns too often.")
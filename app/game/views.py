@@ -1,14 +1,27 @@
+import json
+import time
+
 from flask import Blueprint
+from flask import Response
+from flask import abort
+from flask import current_app
 from flask import g
+from flask import jsonify
 from flask import redirect
 from flask import request
 from flask import url_for
+from markupsafe import Markup
+from sqlalchemy.orm import joinedload
 
 from app import db
+from app.database import read_only
 from app.functions import render_template_with_user, add_before_request, redirect_back_or
-from app.game import constants
+from app.game import constants, turns
 from app.game.forms import NewGameForm
-from app.game.models import Game, UsersInGames, Turn
+from app.game.models import Game, UsersInGames
+from app.game.notifications import GameEvent, game_channels, create_game_event
+from app.game.render_cache import get_render_cache, make_key
+from app.game.repository import GameRepository
 from app.users.models import User
 
 mod = Blueprint('game', __name__, url_prefix='/game')
@@ -16,8 +29,17 @@ add_before_request(mod)
 
 
 @mod.route('/home/', methods=['GET'])
+@read_only
 def home():
-    current_games = UsersInGames.query.filter_by(user=g.user)
+    if g.user:
+        # Everything shown is in the summary of the games, so there is no need to look at their turns.
+        current_games = Game.query.join(UsersInGames, Game.to_users) \
+            .filter(UsersInGames._user_id == g.user.id) \
+            .options(joinedload(Game.to_users).joinedload(UsersInGames.user), joinedload(Game.current_player)) \
+            .order_by(Game.last_activity.desc()).all()
+    else:
+        current_games = []
+
     return render_template_with_user("game/home.html", current_games=list(enumerate(current_games)))
 
 
@@ -46,49 +68,160 @@ def new_game():
 
 
 @mod.route('/game/<int:game_id>', methods=['GET'])
+@read_only
 def game(game_id):
-    current_game = Game.query.filter_by(id=game_id).one()
-    return render_template_with_user("game/game.html", game=current_game)
+    render_cache = get_render_cache()
+    viewer_id = g.user.id if g.user else None
+
+    # The content only changes with the turn number and the state of the game, which are both in the summary
+    # of the game. So if it is cached, there is no need to load (or even render) anything else.
+    number_of_turns, state = db.session.query(Game.number_of_turns, Game.state).filter_by(id=game_id).one()
+    content = render_cache.get(make_key(game_id, number_of_turns, state, viewer_id))
+
+    if content is None:
+        current_game = GameRepository.load_for_view(game_id)
+        content = render_template_with_user("game/game_content.html", game=current_game)
+        # The game may have changed in the meantime, so use the key of the really rendered game.
+        render_cache.set(make_key(game_id, current_game.number_of_turns, current_game.state, viewer_id), content)
+
+    return render_template_with_user("game/game.html", content=Markup(content))
 
 
 @mod.route('/start_game/<int:game_id>', methods=['GET'])
 def start_game(game_id):
     current_game = Game.query.filter_by(id=int(game_id)).one()
     current_game.state = constants.GAME_STARTED
+    # The current player is not known for games created with new users
+    current_game.update_summary()
 
-    db.session.merge(current_game)
+    # The game is already in the session, so the change is written by the commit
     db.session.commit()
+    get_render_cache().invalidate_game(game_id)
+    game_channels.publish(create_game_event(current_game))
 
     return redirect_back_or("game.game", game_id=game_id)
 
 
 @mod.route('/make_turn/<int:game_id>/<int:turn_id>', methods=['GET'])
 def make_turn(game_id, turn_id):
-    current_game = Game.query.filter_by(id=game_id).one()
+    """
+    Make the possible turn with the given number for the logged in user.
+    With the parameter turn_number, the turn is only made if the game still has this number of turns, so e.g.
+    a second click on the same link is rejected with 409 Conflict instead of making another turn. If another turn
+    of the game was stored at the same time (by another request or process), the turn is checked and tried again
+    up to MAKE_TURN_RETRIES times.
+    """
+    expected_turn_number = request.args.get("turn_number", type=int)
+
+    try:
+        current_game = turns.make_turn(game_id, g.user, turn_id, expected_turn_number,
+                                       retries=current_app.config.get("MAKE_TURN_RETRIES", 3))
+    except turns.TurnConflictError as e:
+        abort(409, str(e))
+
+    get_render_cache().invalidate_game(game_id)
+    game_channels.publish(create_game_event(current_game))
 
-    if g.user != current_game.current_user:
-        raise AttributeError("It is not the users turn.")
+    # Now all the caches of the game are invalid. But this does not matter, as we will leave the scope anyhow.
 
-    possible_turns = current_game.get_possible_turns(g.user)
+    return redirect(url_for("game.game", game_id=game_id))
 
-    if turn_id >= len(possible_turns):
-        raise RuntimeError("Turn is not possible.")
 
-    possible_turn = possible_turns[turn_id]
+def load_game_event(game_id):
+    """
+    Create the event of the game from its summary in the database.
+    """
+    return GameEvent(*db.session.query(Game.id, Game.number_of_turns, Game.state, Game._current_player_id,
+                                       User.name).outerjoin(User, Game.current_player).filter(Game.id == game_id).one())
 
-    assert possible_turn.possibility_number == turn_id
 
-    turn = Turn.from_possible_turn(possible_turn)
+def get_game_event(game_id):
+    """
+    Return the current event of the game. It is loaded from the database, as the turns made in other processes
+    are not published in this one, and published here, if it changed.
+    """
+    return game_channels.update(load_game_event(game_id))
 
-    db.session.add(turn)
-    db.session.commit()
 
-    current_game.update_game_status()
-    db.session.merge(current_game)
+def wait_for_game_event(game_id, event, timeout):
+    """
+    Wait until the event of the game differs from the given one or until the timeout (in seconds) is over, and
+    return the event of the game then. While waiting, the summary of the game is read from the database again
+    every NOTIFICATION_REFRESH_INTERVAL seconds to find the turns made in other processes. The database session
+    is removed afterwards, so no connection is kept while waiting.
+    """
+    refresh_interval = current_app.config.get("NOTIFICATION_REFRESH_INTERVAL", 5)
+    end_time = time.monotonic() + timeout
 
-    db.session.commit()
+    while True:
+        remaining_time = max(end_time - time.monotonic(), 0)
+        new_event = game_channels.wait_for_change(game_id, event, min(remaining_time, refresh_interval))
 
-    # Now all the caches of the game are invalid. But this does not matter, as we will leave the scope anyhow.
+        if new_event is event:
+            new_event = get_game_event(game_id)
+            db.session.remove()
 
-    return redirect(url_for("game.game", game_id=game_id))
+        if new_event is not event or remaining_time <= refresh_interval:
+            return new_event
+
+
+def is_finished(event):
+    return event.state in [constants.GAME_WON, constants.GAME_LOST]
+
+
+def format_server_sent_event(event):
+    return "id: {turn_number}\nevent: game\ndata: {data}\n\n".format(turn_number=event.turn_number,
+                                                                     data=json.dumps(event._asdict()))
+
+
+@mod.route('/events/<int:game_id>', methods=['GET'])
+def game_events(game_id):
+    """
+    Stream the events of the game as server-sent events: first the current state and then one event for
+    every change (a new turn or the start of the game), until the game is finished.
+    """
+    event = get_game_event(game_id)
+    heartbeat_interval = current_app.config.get("NOTIFICATION_HEARTBEAT", 15)
+    # The stream is sent after the request, so the database is used with a new app context
+    current_app_object = current_app._get_current_object()
+
+    # Do not keep the database connection while waiting.
+    db.session.remove()
+
+    def stream(event):
+        yield format_server_sent_event(event)
+
+        while not is_finished(event):
+            with current_app_object.app_context():
+                new_event = wait_for_game_event(game_id, event, heartbeat_interval)
+
+            if new_event is event:
+                # Comment to keep the connection open and to find out about closed connections
+                yield ": keep-alive\n\n"
+            else:
+                event = new_event
+                yield format_server_sent_event(event)
+
+    return Response(stream(event), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@mod.route('/poll/<int:game_id>', methods=['GET'])
+@read_only
+def poll_game(game_id):
+    """
+    Long polling alternative to game_events: return the current event of the game as soon as its turn number
+    differs from the given one (parameter since), but wait at most the given number of seconds (parameter
+    timeout, limited by LONG_POLL_TIMEOUT) for it.
+    """
+    event = get_game_event(game_id)
+    max_timeout = current_app.config.get("LONG_POLL_TIMEOUT", 30)
+    timeout = min(request.args.get("timeout", max_timeout, type=float), max_timeout)
+
+    db.session.remove()
+
+    since = request.args.get("since", type=int)
+    if since == event.turn_number and not is_finished(event):
+        event = wait_for_game_event(game_id, event, timeout)
 
+    return jsonify(event._asdict())
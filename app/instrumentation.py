@@ -0,0 +1,217 @@
+# Opt-in instrumentation of the requests, enabled with INSTRUMENTATION = True in the config.
+# For every request it measures
+#
+#     the number of SQL statements and the time spent executing them,
+#     the time spent rendering templates (with render_template_with_user),
+#     the time spent computing the values of every CachedClassProperty and CachedClassFunction (by their name,
+#     including the cached values needed for them, so the times of nested ones overlap)
+#
+# and sends them to the client in the Server-Timing header. The measurements of the last INSTRUMENTATION_WINDOW
+# requests of every endpoint are kept in the memory of the process and their percentiles are served as JSON by
+# /instrumentation/stats. Without INSTRUMENTATION, nothing is measured.
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from flask import Blueprint, current_app, g, has_request_context, jsonify, abort, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.game.functions import set_computation_observer
+
+PERCENTILES = [50, 90, 99]
+
+mod = Blueprint('instrumentation', __name__, url_prefix='/instrumentation')
+
+_install_lock = threading.Lock()
+_installed = False
+
+
+class RequestMetrics:
+    """
+    The measurements of a single request.
+    """
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.duration = None
+
+        self.number_of_statements = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.computation_times = defaultdict(float)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start_time
+
+    def get_server_timing(self):
+        """
+        Return the value of the Server-Timing header (durations in milliseconds).
+        """
+        metrics = ['sql;dur={duration:.3f};desc="{number} statements"'.format(
+                       duration=self.sql_time * 1000, number=self.number_of_statements),
+                   'template;dur={duration:.3f}'.format(duration=self.template_time * 1000)]
+        metrics.extend('cache.{name};dur={duration:.3f}'.format(name=name, duration=duration * 1000)
+                       for name, duration in sorted(self.computation_times.items()))
+        metrics.append('total;dur={duration:.3f}'.format(duration=self.duration * 1000))
+
+        return ", ".join(metrics)
+
+
+def get_percentiles(values):
+    """
+    Return the PERCENTILES of the values (nearest rank) by their name, e.g. "p50".
+    """
+    values = sorted(values)
+    return {"p{percentile}".format(percentile=percentile):
+            values[max(0, -(-percentile * len(values) // 100) - 1)] for percentile in PERCENTILES}
+
+
+class RequestStatistics:
+    """
+    The measurements of the last window_size requests of every endpoint.
+    """
+    def __init__(self, window_size):
+        self.window_size = window_size
+
+        self._metrics_by_endpoint = defaultdict(lambda: deque(maxlen=self.window_size))
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, metrics):
+        with self._lock:
+            self._metrics_by_endpoint[endpoint].append(metrics)
+
+    def get_summary(self):
+        """
+        Return the number of measured requests and the percentiles of the measurements (durations in
+        milliseconds) for every endpoint.
+        """
+        with self._lock:
+            metrics_by_endpoint = {endpoint: list(metrics) for endpoint, metrics in self._metrics_by_endpoint.items()}
+
+        summary = {}
+        for endpoint, metrics in metrics_by_endpoint.items():
+            names = sorted({name for request_metrics in metrics for name in request_metrics.computation_times})
+            summary[endpoint] = {
+                "requests": len(metrics),
+                "total_ms": get_percentiles([request_metrics.duration * 1000 for request_metrics in metrics]),
+                "sql_ms": get_percentiles([request_metrics.sql_time * 1000 for request_metrics in metrics]),
+                "statements": get_percentiles([request_metrics.number_of_statements for request_metrics in metrics]),
+                "template_ms": get_percentiles([request_metrics.template_time * 1000 for request_metrics in metrics]),
+                # Requests, which did not compute the value, count with 0
+                "cache_ms": {name: get_percentiles([request_metrics.computation_times.get(name, 0.0) * 1000
+                                                    for request_metrics in metrics])
+                             for name in names},
+            }
+
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self._metrics_by_endpoint.clear()
+
+
+def is_enabled(app=None):
+    return (app or current_app).config.get("INSTRUMENTATION", False)
+
+
+def get_statistics(app=None):
+    """
+    Return the RequestStatistics of the given (or the current) app. They are created on first use.
+    """
+    app = app or current_app
+
+    try:
+        return app.extensions["instrumentation"]
+    except KeyError:
+        statistics = app.extensions["instrumentation"] = RequestStatistics(
+            app.config.get("INSTRUMENTATION_WINDOW", 1000))
+        return statistics
+
+
+def get_current_metrics():
+    """
+    Return the RequestMetrics of the current request or None, if it is not measured.
+    """
+    if not has_request_context():
+        return None
+    return g.get("request_metrics")
+
+
+@contextmanager
+def measure_template_rendering():
+    metrics = get_current_metrics()
+    if metrics is None:
+        yield
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.template_time += time.perf_counter() - start_time
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if get_current_metrics() is not None:
+        context.instrumentation_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = get_current_metrics()
+    start_time = getattr(context, "instrumentation_start_time", None)
+
+    if metrics is not None and start_time is not None:
+        metrics.number_of_statements += 1
+        metrics.sql_time += time.perf_counter() - start_time
+
+
+def _observe_computation(name, duration):
+    metrics = get_current_metrics()
+    if metrics is not None:
+        metrics.computation_times[name] += duration
+
+
+def install():
+    """
+    Listen to the SQL statements of all engines and to the computations of the cached values. This is done
+    on the first measured request, so there is no overhead at all, as long as the instrumentation is not enabled.
+    """
+    global _installed
+
+    with _install_lock:
+        if _installed:
+            return
+
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        set_computation_observer(_observe_computation)
+        _installed = True
+
+
+def start_request():
+    if not is_enabled():
+        return
+
+    install()
+    g.request_metrics = RequestMetrics()
+
+
+def finish_request(response):
+    metrics = get_current_metrics()
+    if metrics is None:
+        return response
+
+    metrics.finish()
+    response.headers["Server-Timing"] = metrics.get_server_timing()
+    get_statistics().add(request.endpoint, metrics)
+
+    return response
+
+
+@mod.route('/stats', methods=['GET'])
+def stats():
+    if not is_enabled():
+        abort(404)
+
+    return jsonify(get_statistics().get_summary())
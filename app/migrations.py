@@ -0,0 +1,211 @@
+# Schema migrations for databases created with an older version of the models.
+# The schema version of a database is stored in the user_version pragma of SQLite. Every migration brings the
+# database from one version to the next one and must also work for a database, which was already created
+# with the current models (e.g. by db.create_all()), as those start with version 0 as well.
+from sqlalchemy import inspect, text, select
+
+MIGRATIONS = []
+
+
+def migration(f):
+    """
+    Register the decorated function as the next migration. It is called with an open connection
+    inside of a transaction.
+    """
+    MIGRATIONS.append(f)
+    return f
+
+
+def get_schema_version(connection):
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+
+def set_schema_version(connection, version):
+    # Pragmas do not support bound parameters.
+    connection.execute(text("PRAGMA user_version = {version:d}".format(version=version)))
+
+
+def create_missing_indexes(connection, table):
+    existing_index_names = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+
+    for index in table.indexes:
+        if index.name not in existing_index_names:
+            index.create(connection)
+
+
+def add_missing_columns(connection, table_name, column_definitions):
+    """
+    Add all columns from the given list of (name, SQL definition), which are not already in the table.
+    """
+    existing_column_names = {column["name"] for column in inspect(connection).get_columns(table_name)}
+
+    for name, definition in column_definitions:
+        if name not in existing_column_names:
+            connection.execute(text("ALTER TABLE {table_name} ADD COLUMN {name} {definition}".format(
+                table_name=table_name, name=name, definition=definition)))
+
+
+@migration
+def add_turn_and_user_indexes(connection):
+    """
+    Add the indexes for replaying the turns of a game and for the games of a user,
+    and make the turn number unique per game.
+    """
+    from app.game.models import Turn, UsersInGames
+
+    # Older versions could store two turns with the same number, if a user clicked twice.
+    # The order of the ids is the order the turns were made in, so renumber the turns of these games.
+    games_with_duplicates = connection.execute(text(
+        "SELECT DISTINCT _game_id FROM turns GROUP BY _game_id, turn_number HAVING COUNT(*) > 1")).fetchall()
+
+    for game_id, in games_with_duplicates:
+        turn_ids = connection.execute(text("SELECT id FROM turns WHERE _game_id = :game_id ORDER BY turn_number, id"),
+                                      game_id=game_id).fetchall()
+        for turn_number, (turn_id, ) in enumerate(turn_ids):
+            connection.execute(text("UPDATE turns SET turn_number = :turn_number WHERE id = :turn_id"),
+                               turn_number=turn_number, turn_id=turn_id)
+
+    create_missing_indexes(connection, Turn.__table__)
+    create_missing_indexes(connection, UsersInGames.__table__)
+
+
+@migration
+def add_game_summary(connection):
+    """
+    Add the summary columns of the games and fill them by replaying the turns of every game.
+    """
+    from app.game.models import Game
+
+    add_missing_columns(connection, "games", [
+        ("number_of_turns", "INTEGER NOT NULL DEFAULT 0"),
+        ("hints_left", "INTEGER"),
+        ("failures_left", "INTEGER"),
+        ("score", "INTEGER NOT NULL DEFAULT 0"),
+        ("_current_player_id", "INTEGER REFERENCES users_user (id)"),
+        ("last_activity", "DATETIME"),
+    ])
+
+    games = Game.__table__
+
+    for game in select_games(connection):
+        user_ids, game_state = replay_game(connection, game)
+
+        if not user_ids:
+            continue
+
+        # There is no time stored for the turns, so the best guess for the last activity is the start of the game.
+        connection.execute(games.update().where(games.c.id == game.id).values(
+            number_of_turns=game_state.turn_number,
+            hints_left=game_state.number_of_hints,
+            failures_left=game_state.number_of_failures,
+            score=sum(game_state.card_status.values()),
+            _current_player_id=user_ids[game_state.current_player_index],
+            last_activity=game.started))
+
+
+@migration
+def add_game_snapshots(connection):
+    """
+    Add the table of the game snapshots and store the snapshots of all existing games.
+    """
+    from app.game.models import GameSnapshot, SNAPSHOT_INTERVAL
+
+    snapshots = GameSnapshot.__table__
+    snapshots.create(connection, checkfirst=True)
+
+    for game in select_games(connection):
+        existing_turn_numbers = {turn_number for turn_number, in connection.execute(
+            select([snapshots.c.turn_number]).where(snapshots.c._game_id == game.id))}
+
+        def store_snapshot(game_state):
+            if game_state.turn_number % SNAPSHOT_INTERVAL == 0 and \
+                    game_state.turn_number not in existing_turn_numbers:
+                connection.execute(snapshots.insert().values(_game_id=game.id, turn_number=game_state.turn_number,
+                                                             data=game_state.to_bytes()))
+
+        replay_game(connection, game, on_turn=store_snapshot)
+
+
+@migration
+def add_game_version(connection):
+    """
+    Add the version of the games, which is checked by every update of a game.
+    """
+    add_missing_columns(connection, "games", [("version", "INTEGER NOT NULL DEFAULT 1")])
+
+
+def select_games(connection):
+    """
+    Return the rows of all games with the columns needed for replay_game. Only these are selected, as the
+    columns added by later migrations do not exist yet.
+    """
+    from app.game.models import Game
+
+    games = Game.__table__
+    return connection.execute(select([games.c.id, games.c._start_deck, games.c.started, games.c.start_failures,
+                                      games.c.start_hints, games.c.start_number_of_cards])).fetchall()
+
+
+def replay_game(connection, game, on_turn=None):
+    """
+    Build the game state of the given game row by replaying all of its turns.
+
+    :param connection: The connection to read the turns with.
+    :param game: The row of the game.
+    :param on_turn: If given, it is called with the game state after every turn.
+    :return: The ids of the users of the game (ordered like Game.users) and the game state.
+        If the game does not have any users, there is no game state (None).
+    """
+    from app.game.models import Turn, UsersInGames, CARDS_BY_STRING, replay_turn_rows
+    from app.game.state import GameState
+
+    turns = Turn.__table__
+    users_to_games = UsersInGames.__table__
+
+    user_ids = [user_id for user_id, in connection.execute(
+        select([users_to_games.c._user_id]).where(users_to_games.c._game_id == game.id)
+        .order_by(users_to_games.c._user_id))]
+
+    if not user_ids:
+        return user_ids, None
+
+    game_state = GameState([CARDS_BY_STRING[card_string] for card_string in game._start_deck.split(",")],
+                           len(user_ids), game.start_number_of_cards, game.start_hints, game.start_failures)
+
+    turn_rows = connection.execution_options(stream_results=True).execute(
+        select([turns.c.type, turns.c._user_id, turns.c._card, turns.c.hint_type, turns.c.last_card_drawn,
+                turns.c.put_correct, turns.c.hint_restored]).where(turns.c._game_id == game.id)
+        .order_by(turns.c.turn_number, turns.c.id))
+    replay_turn_rows(game_state, turn_rows, {user_id: index for index, user_id in enumerate(user_ids)}, on_turn)
+
+    return user_ids, game_state
+
+
+def upgrade(engine):
+    """
+    Apply all migrations the database behind the engine is still missing, each in its own transaction.
+
+    :param engine: The engine of the database to upgrade.
+    :return: The list of the names of the applied migrations.
+    """
+    applied_migrations = []
+
+    with engine.connect() as connection:
+        current_version = get_schema_version(connection)
+
+    for version, migration_function in enumerate(MIGRATIONS[current_version:], current_version + 1):
+        with engine.begin() as connection:
+            migration_function(connection)
+            set_schema_version(connection, version)
+
+        applied_migrations.append(migration_function.__name__)
+
+    return applied_migrations
+
+
+def stamp(engine):
+    """
+    Mark the database behind the engine as up to date, e.g. after it was created with db.create_all().
+    """
+    with engine.begin() as connection:
+        set_schema_version(connection, len(MIGRATIONS))
@@ -79,6 +79,29 @@ function addBindings() {
     });
 }
 
+function listenForGameEvents() {
+    var gameEvents = $("#game-events");
+
+    if(gameEvents.length == 0 || typeof(EventSource) == "undefined") {
+        return;
+    }
+
+    var turnNumber = gameEvents.attr("data-turn-number");
+    var state = gameEvents.attr("data-state");
+
+    // Only load the page again, if the game has really changed
+    var eventSource = new EventSource(gameEvents.attr("data-url"));
+    eventSource.addEventListener("game", function(message) {
+        var event = JSON.parse(message.data);
+
+        if(event.turn_number != turnNumber || event.state != state) {
+            eventSource.close();
+            window.location.reload();
+        }
+    });
+}
+
 $(document).ready(function() {
     addBindings();
+    listenForGameEvents();
 });
@@ -0,0 +1,159 @@
+# Identity of the logged in user of a request (g.user), without loading the User from the database every time.
+# g.user is a UserRecord: an immutable record with the id and the name of the user, which compares equal to the
+# User with the same id and has the same hash (so it can be used e.g. in game.users.index(g.user), in templates
+# or together with Users in sets). The records are cached in the process for USER_CACHE_TTL seconds (at most
+# USER_CACHE_SIZE of them, the least recently used ones are dropped first). With USER_SESSION_RECORD, the record
+# is also stored in the session cookie, which is signed with the SECRET_KEY, so it can not be changed by the client
+# and the database is not needed at all.
+# Everything changing a user must call forget_user (or remember_user) to drop the cached record.
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+
+from app.users.models import User
+
+
+class UserRecord(namedtuple("UserRecord", ["id", "name"])):
+    """
+    The identity of a user. It is equal to the User (and UserRecord) with the same id.
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def from_user(user):
+        return UserRecord(user.id, user.name)
+
+    def __eq__(self, other):
+        if isinstance(other, (UserRecord, User)):
+            return self.id == other.id
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return "User: {self.name} ({self.id})".format(self=self)
+
+
+class UserCache:
+    """
+    Process local cache of UserRecords by their id, which expire after ttl seconds.
+    """
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        # user id -> (record, expiration time)
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            try:
+                record, expiration_time = self._records[user_id]
+            except KeyError:
+                return None
+
+            if expiration_time < time.monotonic():
+                del self._records[user_id]
+                return None
+
+            self._records.move_to_end(user_id)
+            return record
+
+    def set(self, record):
+        with self._lock:
+            self._records[record.id] = record, time.monotonic() + self.ttl
+            self._records.move_to_end(record.id)
+
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._records.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def __len__(self):
+        return len(self._records)
+
+
+def get_user_cache(app=None):
+    """
+    Return the user cache of the given (or the current) app. It is created on first use.
+    """
+    app = app or current_app
+
+    try:
+        return app.extensions["user_cache"]
+    except KeyError:
+        user_cache = app.extensions["user_cache"] = UserCache(app.config.get("USER_CACHE_SIZE", 1024),
+                                                              app.config.get("USER_CACHE_TTL", 300))
+        return user_cache
+
+
+def load_user_record(user_id):
+    """
+    Return the UserRecord of the user with the given id from the cache or the database (None if there is no such
+    user).
+    """
+    user_cache = get_user_cache()
+
+    record = user_cache.get(user_id)
+    if record is None:
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+
+        record = UserRecord.from_user(user)
+        user_cache.set(record)
+
+    return record
+
+
+def get_session_user(session):
+    """
+    Return the UserRecord of the user logged in the given session or None.
+    """
+    user_id = session.get("user_id")
+    if user_id is None:
+        return None
+
+    if current_app.config.get("USER_SESSION_RECORD", False):
+        session_record = session.get("user_record")
+        if session_record and session_record[0] == user_id:
+            return UserRecord(*session_record)
+
+    return load_user_record(user_id)
+
+
+def remember_user(session, user):
+    """
+    Log in the given User in the session and replace its cached record.
+    """
+    record = UserRecord.from_user(user)
+
+    session["user_id"] = record.id
+    if current_app.config.get("USER_SESSION_RECORD", False):
+        session["user_record"] = list(record)
+
+    get_user_cache().set(record)
+
+
+def forget_user(session, user_id):
+    """
+    Log out the user with the given id from the session and drop its cached record.
+    """
+    get_user_cache().invalidate(user_id)
+
+    session.pop("user_id", None)
+    session.pop("user_record", None)
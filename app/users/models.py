@@ -16,5 +16,23 @@ class User(db.Model):
         self.email = email
         self.password = password
 
+    def __eq__(self, other):
+        # Users are equal by their id, like the UserRecords of app/users/identity.py (which compare equal to the
+        # User with their id). Users, which are not stored yet, are only equal to themselves.
+        if isinstance(other, User):
+            if self.id is None or other.id is None:
+                return self is other
+            return self.id == other.id
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        # The same hash as the UserRecord of the user. It changes when a new user gets its id, so new users should
+        # not be put into sets or dictionaries before they are stored.
+        return object.__hash__(self) if self.id is None else hash(self.id)
+
     def __repr__(self):
         return "User: {self.name} ({self.id})".format(self=self)
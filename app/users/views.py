@@ -2,6 +2,7 @@ from app import db
 from app.functions import render_template_with_user, requires_login, add_before_request, redirect_back_or, \
     get_redirect_target
 from app.users.forms import RegisterForm, LoginForm
+from app.users.identity import remember_user, forget_user
 from app.users.models import User
 from flask import Blueprint, request, flash, g, session, redirect, url_for
 from werkzeug import check_password_hash, generate_password_hash
@@ -13,11 +14,9 @@ add_before_request(mod)
 @mod.route('/logout/', methods=['GET', 'POST'])
 def logout():
     if g.user:
+        forget_user(session, g.user.id)
         del g.user
 
-        if "user_id" in session:
-            del session["user_id"]
-
         if "download_id" in session:
             del session["download_id"]
 
@@ -44,7 +43,7 @@ def login():
         if user and check_password_hash(user.password, form.password.data):
             # the session can't be modified as it's signed,
             # it's a safe place to store the user id
-            session['user_id'] = user.id
+            remember_user(session, user)
             flash('Welcome %s' % user.name)
             return redirect_back_or('game.home')
 
@@ -68,8 +67,8 @@ def register():
         db.session.add(user)
         db.session.commit()
 
-        # Log the user in, as he now has an id
-        session['user_id'] = user.id
+        # Log the user in, as he now has an id (an old record with the same id is replaced)
+        remember_user(session, user)
 
         # flash will display a message to the user
         flash('Thanks for registering')
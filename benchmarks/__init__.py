@@ -0,0 +1,3 @@
+# Benchmarks for the performance critical parts of the project. Every module can be run with
+#
+#     python -m benchmarks.<module name>
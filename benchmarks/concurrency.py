@@ -0,0 +1,193 @@
+# Benchmark of concurrent players: some threads poll the game page of their game over and over again, while others
+# make turns in their games, for every database setup (see app/database.py) in PROFILES. For every setup the number
+# of requests per second, their latencies and the errors (e.g. "database is locked") are shown. Run it with
+#
+#     python -m benchmarks.concurrency [--pollers 8] [--players 4] [--seconds 5]
+#
+# The render cache is disabled, so every poll reads the game from the database. The databases are created in a
+# temporary directory, the configured app.db is never touched.
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import config
+from app import app, db
+from app.game import constants
+from app.game.models import Game
+from app.game.render_cache import NullRenderCache
+from app.users.models import User
+
+# The database setups to compare, as the options of the config
+PROFILES = {
+    "default": {"SQLITE_PRAGMAS": None, "DATABASE_POOL_SIZE": None, "DATABASE_READ_ONLY": False},
+    "wal + pool": {"SQLITE_PRAGMAS": config.SQLITE_PRAGMAS, "DATABASE_POOL_SIZE": config.DATABASE_POOL_SIZE,
+                   "DATABASE_READ_ONLY": False},
+    "wal + pool + read only": {"SQLITE_PRAGMAS": config.SQLITE_PRAGMAS,
+                               "DATABASE_POOL_SIZE": config.DATABASE_POOL_SIZE, "DATABASE_READ_ONLY": True},
+}
+
+# The turn made by the players: destroying the first card is always possible, as long as the game is running
+DESTROY_FIRST_CARD = 1
+
+
+class Measurements:
+    def __init__(self):
+        self.latencies = []
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, latency, error=None):
+        with self._lock:
+            if error is None:
+                self.latencies.append(latency)
+            else:
+                self.errors[error] += 1
+
+
+def seed_games(number_of_games, name):
+    """
+    Create the games (started, without turns) with two new users each and return the ids of the games
+    and of their users.
+    """
+    games = []
+    for game_number in range(number_of_games):
+        users = [User("{name}_{game_number}_{index}".format(name=name, game_number=game_number, index=index))
+                 for index in range(2)]
+        db.session.add_all(users)
+        db.session.flush()
+
+        game = Game(start_deck=Game.get_random_start_deck(), users=users, start_player=users[0],
+                    start_failures=3, start_hints=10, start_number_of_cards=5)
+        game.state = constants.GAME_STARTED
+        db.session.add(game)
+        games.append(game)
+
+    db.session.commit()
+    result = [(game.id, [user.id for user in game.users]) for game in games]
+    db.session.remove()
+
+    return result
+
+
+def create_client(user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    return client
+
+
+def timed_request(client, url, expected_status_code, measurements):
+    start_time = time.perf_counter()
+    try:
+        response = client.get(url)
+        error = None if response.status_code == expected_status_code else "status " + str(response.status_code)
+    except Exception as e:
+        # In debug mode, the exceptions of the views are raised by the test client
+        error = type(e).__name__ + ": " + str(e).splitlines()[0][:60]
+    measurements.add(time.perf_counter() - start_time, error)
+    return error
+
+
+def poll(game_id, user_id, stop_event, measurements):
+    client = create_client(user_id)
+    url = "/game/game/{game_id}".format(game_id=game_id)
+
+    while not stop_event.is_set():
+        timed_request(client, url, 200, measurements)
+
+
+def play(games, stop_event, measurements):
+    """
+    Make turns in the games one after the other (the next one, when a game is finished).
+    """
+    for game_id, user_ids in games:
+        clients = [create_client(user_id) for user_id in user_ids]
+        url = "/game/make_turn/{game_id}/{turn_id}".format(game_id=game_id, turn_id=DESTROY_FIRST_CARD)
+        turn_number = 0
+
+        while not stop_event.is_set():
+            error = timed_request(clients[turn_number % len(clients)], url, 302, measurements)
+            if error is None:
+                turn_number += 1
+            elif error.startswith("RuntimeError"):
+                # The game is finished
+                break
+            # Otherwise the turn failed and is tried again
+
+        if stop_event.is_set():
+            return
+
+
+def run_profile(directory, name, profile, number_of_pollers, number_of_players, seconds):
+    app.config.update(profile)
+    # A new database, so a new engine with the options of the profile is created
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(directory, name.replace(" ", "_") + ".db")
+    db.create_all()
+
+    poller_games = seed_games(number_of_pollers, "poller")
+    # Enough games for the players not to run out of them
+    player_games = seed_games(number_of_players * 10, "player")
+
+    poll_measurements, turn_measurements = Measurements(), Measurements()
+    stop_event = threading.Event()
+
+    threads = [threading.Thread(target=poll, args=(game_id, user_ids[0], stop_event, poll_measurements))
+               for game_id, user_ids in poller_games]
+    threads.extend(threading.Thread(target=play, args=(player_games[player::number_of_players], stop_event,
+                                                       turn_measurements))
+                   for player in range(number_of_players))
+
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+
+    db.session.remove()
+    db.engine.dispose()
+
+    return poll_measurements, turn_measurements
+
+
+def describe(name, measurements, seconds):
+    latencies = sorted(measurements.latencies)
+    if latencies:
+        print("    {name:<6} {rate:>8.1f}/s  median {median:>7.2f} ms  p95 {p95:>8.2f} ms  errors {errors}".format(
+            name=name, rate=len(latencies) / seconds, median=statistics.median(latencies) * 1000,
+            p95=latencies[int(0.95 * (len(latencies) - 1))] * 1000, errors=sum(measurements.errors.values())))
+    else:
+        print("    {name:<6} no successful requests, errors {errors}".format(
+            name=name, errors=sum(measurements.errors.values())))
+
+    for error, count in measurements.errors.most_common(3):
+        print("           {count} x {error}".format(count=count, error=error))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent polling players and turns per database setup.")
+    parser.add_argument("--pollers", type=int, default=8, help="Number of threads polling the game page.")
+    parser.add_argument("--players", type=int, default=4, help="Number of threads making turns.")
+    parser.add_argument("--seconds", type=float, default=5, help="Duration of every measurement.")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES),
+                        help="The database setups to measure.")
+    args = parser.parse_args()
+
+    # Every poll has to read from the database
+    app.extensions["render_cache"] = NullRenderCache()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.profiles:
+            poll_measurements, turn_measurements = run_profile(directory, name, PROFILES[name], args.pollers,
+                                                               args.players, args.seconds)
+            print(name + ":")
+            describe("polls", poll_measurements, args.seconds)
+            describe("turns", turn_measurements, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+# Benchmark of the hot paths of the game models and of the HTTP endpoints, measured on running games with
+# a realistic number of turns. For every operation the median and 95th percentile of its latency and the
+# number of SQL statements it needs are measured. Run it with
+#
+#     python -m benchmarks.hot_paths [--games 20] [--turns 40] [--repetitions 50] [--output results.json]
+#                                    [--baseline baseline.json] [--threshold 0.2]
+#
+# The results can be stored as JSON (--output) and compared against the results of an earlier run (--baseline):
+# the benchmark fails (exit code 1), if an operation got slower by more than the threshold (0.2 = 20 %) or needs
+# more SQL statements than before. The games are stored in a temporary database, the configured app.db is never
+# touched.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from app import app, db
+from app.game.models import Game
+from app.game.render_cache import get_render_cache
+from app.game.simulation import SimulatedGame, CautiousBot, persist_game
+from app.users.models import User
+
+RESULTS_VERSION = 1
+
+
+class StatementCounter:
+    """
+    Count the SQL statements executed with the engine while the counter is used as a context manager.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.number_of_statements = 0
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.number_of_statements += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+
+
+def play_running_game(number_of_turns, random_generator):
+    """
+    Play a game with bots until it has the given number of turns. Games, which are finished earlier, are
+    dropped and played again with a new start deck.
+    """
+    while True:
+        simulated_game = SimulatedGame(Game.get_random_start_deck(random_generator), 2)
+        bots = [CautiousBot(random_generator) for _ in range(2)]
+
+        while len(simulated_game.history) < number_of_turns and simulated_game.get_moves():
+            player_index = simulated_game.game_state.current_player_index
+            simulated_game.make_move(bots[player_index].choose_move(simulated_game.game_state, player_index,
+                                                                    simulated_game.get_moves()))
+
+        if not simulated_game.finished and len(simulated_game.history) == number_of_turns:
+            return simulated_game
+
+
+def seed_games(number_of_games, number_of_turns, random_generator):
+    """
+    Store the running games and their two users in the database and return the ids of the games.
+    """
+    users = [User("benchmark_1"), User("benchmark_2")]
+    db.session.add_all(users)
+    db.session.flush()
+
+    games = [persist_game(play_running_game(number_of_turns, random_generator), users)
+             for _ in range(number_of_games)]
+    db.session.commit()
+
+    game_ids = [game.id for game in games]
+    db.session.remove()
+
+    return game_ids
+
+
+def load_game(game_id):
+    """
+    Load the game with an empty session, like every request does.
+    """
+    db.session.remove()
+    return Game.query.get(game_id)
+
+
+def get_model_operations():
+    """
+    The operations on the models as a dictionary name -> function(game), which are measured on freshly
+    loaded games.
+    """
+    def get_possible_turns(game):
+        return list(game.get_possible_turns(game.current_user))
+
+    def get_cards_of_user(game):
+        return game.get_cards_of_user(game.users[0])
+
+    def get_hints_for_card(game):
+        return [game.get_hints_for_card(card) for card in game.get_cards_of_user(game.users[1])]
+
+    def card_status(game):
+        return game.card_status
+
+    return {
+        "get_possible_turns": get_possible_turns,
+        "get_cards_of_user": get_cards_of_user,
+        "get_hints_for_card": get_hints_for_card,
+        "card_status": card_status,
+    }
+
+
+def create_client(user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user_id
+    return client
+
+
+def summarize(timings, statements):
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": sorted(timings)[int(0.95 * (len(timings) - 1))] * 1000,
+        "statements": max(statements),
+        "repetitions": len(timings),
+    }
+
+
+def measure(function, setups, engine):
+    """
+    Measure the function for every argument, which is prepared (without being measured) by the setups.
+    """
+    timings, statements = [], []
+
+    for setup in setups:
+        argument = setup()
+
+        with StatementCounter(engine) as counter:
+            start_time = time.perf_counter()
+            function(argument)
+            timings.append(time.perf_counter() - start_time)
+
+        statements.append(counter.number_of_statements)
+
+    return summarize(timings, statements)
+
+
+def run_benchmarks(game_ids, repetitions, random_generator):
+    """
+    Run all benchmarks on the seeded games and return their results by the name of the operation.
+    """
+    engine = db.engine
+    render_cache = get_render_cache(app)
+    results = {}
+
+    def get_random_game_id():
+        return random_generator.choice(game_ids)
+
+    for name, operation in get_model_operations().items():
+        with app.test_request_context():
+            results[name] = measure(operation, [lambda: load_game(get_random_game_id())] * repetitions, engine)
+
+    user_id = load_game(game_ids[0]).users[0].id
+    client = create_client(user_id)
+
+    def render_game_page(game_id):
+        response = client.get("/game/game/{game_id}".format(game_id=game_id))
+        assert response.status_code == 200
+
+    def get_uncached_game_id():
+        render_cache.clear()
+        return get_random_game_id()
+
+    results["game.html (render)"] = measure(render_game_page, [get_uncached_game_id] * repetitions, engine)
+    for game_id in game_ids:
+        render_game_page(game_id)
+    results["game.html (cached)"] = measure(render_game_page, [get_random_game_id] * repetitions, engine)
+
+    # One turn per game, made by its current user (so the number of measurements is the number of games)
+    clients = {}
+
+    def prepare_turn(game_id):
+        current_user_id = load_game(game_id).current_user.id
+        db.session.remove()
+        clients.setdefault(current_user_id, create_client(current_user_id))
+        return clients[current_user_id], game_id
+
+    def make_turn(argument):
+        turn_client, game_id = argument
+        response = turn_client.get("/game/make_turn/{game_id}/0".format(game_id=game_id))
+        assert response.status_code == 302
+
+    results["make_turn"] = measure(make_turn, [lambda game_id=game_id: prepare_turn(game_id)
+                                               for game_id in game_ids], engine)
+
+    return results
+
+
+def compare_results(results, baseline, threshold):
+    """
+    Return the descriptions of all regressions of the results compared to the baseline: operations, which are
+    slower by more than the threshold (relative, in their median) or need more SQL statements.
+    """
+    regressions = []
+
+    for name, result in sorted(results.items()):
+        try:
+            baseline_result = baseline[name]
+        except KeyError:
+            continue
+
+        if result["median_ms"] > baseline_result["median_ms"] * (1 + threshold):
+            regressions.append("{name}: median {median:.3f} ms instead of {baseline_median:.3f} ms".format(
+                name=name, median=result["median_ms"], baseline_median=baseline_result["median_ms"]))
+        if result["statements"] > baseline_result["statements"]:
+            regressions.append("{name}: {statements} SQL statements instead of {baseline_statements}".format(
+                name=name, statements=result["statements"], baseline_statements=baseline_result["statements"]))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and SQL statements of the model hot paths and views.")
+    parser.add_argument("--games", type=int, default=20, help="Number of running games to seed.")
+    parser.add_argument("--turns", type=int, default=40, help="Turns already played in every game.")
+    parser.add_argument("--repetitions", type=int, default=50, help="Measurements of every operation.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the games and of the measured game order.")
+    parser.add_argument("--output", help="Store the results as JSON in this file.")
+    parser.add_argument("--baseline", help="Compare with the results stored in this file.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed relative increase of the median latency compared to the baseline.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The engine is only created on its first use, so it uses this database
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(directory, "benchmark.db")
+        app.config["RENDER_CACHE_BACKEND"] = "memory"
+        db.create_all()
+
+        game_ids = seed_games(args.games, args.turns, random.Random(args.seed))
+        results = run_benchmarks(game_ids, args.repetitions, random.Random(args.seed))
+
+        db.session.remove()
+        db.engine.dispose()
+
+    print("{:<22} {:>12} {:>12} {:>12}".format("operation", "median [ms]", "p95 [ms]", "statements"))
+    for name, result in results.items():
+        print("{:<22} {:>12.3f} {:>12.3f} {:>12}".format(name, result["median_ms"], result["p95_ms"],
+                                                         result["statements"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"version": RESULTS_VERSION, "games": args.games, "turns": args.turns, "results": results},
+                      f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare_results(results, baseline["results"], args.threshold)
+        if regressions:
+            print("Regressions compared to " + args.baseline + ":")
+            for regression in regressions:
+                print("    " + regression)
+            sys.exit(1)
+
+        print("No regressions compared to " + args.baseline + ".")
+
+
+if __name__ == '__main__':
+    main()
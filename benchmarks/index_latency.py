@@ -0,0 +1,148 @@
+# Benchmark of the latency of the hot queries on the turns and users_to_games tables with and without
+# the indexes added in app.migrations, for a growing number of games. Run it with
+#
+#     python -m benchmarks.index_latency [--games 1000 10000 30000] [--turns 40] [--repetitions 200]
+#
+# The databases are created in a temporary directory, the configured app.db is never touched.
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, select, func
+
+from app import db
+import app.game.constants as constants
+from app.game.models import Game, Turn, UsersInGames
+from app.users.models import User
+
+NUMBER_OF_USERS = 100
+PLAYERS_PER_GAME = 2
+
+
+def get_queries():
+    """
+    The queries to measure as a dictionary name -> function(connection, game_id, user_id).
+    """
+    turns = Turn.__table__
+    users_to_games = UsersInGames.__table__
+
+    replay = select([turns]).where(turns.c._game_id == db.bindparam("game_id")).order_by(turns.c.turn_number)
+    count_hints = select([func.count()]).select_from(turns).where(
+        (turns.c._game_id == db.bindparam("game_id")) & (turns.c.type == constants.TURN_HINT))
+    turns_since = select([turns]).where(
+        (turns.c._game_id == db.bindparam("game_id")) & (turns.c.turn_number >= 10)).order_by(turns.c.turn_number)
+    games_of_user = select([users_to_games]).where(users_to_games.c._user_id == db.bindparam("user_id"))
+
+    return {
+        "replay turns of game": lambda connection, game_id, user_id:
+            connection.execute(replay, game_id=game_id).fetchall(),
+        "count hints of game": lambda connection, game_id, user_id:
+            connection.execute(count_hints, game_id=game_id).scalar(),
+        "turns since number": lambda connection, game_id, user_id:
+            connection.execute(turns_since, game_id=game_id).fetchall(),
+        "games of user": lambda connection, game_id, user_id:
+            connection.execute(games_of_user, user_id=user_id).fetchall(),
+    }
+
+
+def create_database(path, with_indexes):
+    engine = create_engine("sqlite:///" + path)
+    db.metadata.create_all(engine)
+
+    if not with_indexes:
+        for table in [Turn.__table__, UsersInGames.__table__]:
+            for index in table.indexes:
+                index.drop(engine)
+
+    engine.execute(User.__table__.insert(), [{"id": user_id, "name": "user_{user_id}".format(user_id=user_id)}
+                                             for user_id in range(1, NUMBER_OF_USERS + 1)])
+
+    return engine
+
+
+def add_games(engine, first_game_id, last_game_id, turns_per_game, random_generator):
+    start_deck = ",".join(map(str, Game.get_random_start_deck()))
+
+    game_rows = []
+    user_rows = []
+    turn_rows = []
+
+    for game_id in range(first_game_id, last_game_id + 1):
+        user_ids = random_generator.sample(range(1, NUMBER_OF_USERS + 1), PLAYERS_PER_GAME)
+
+        game_rows.append({"id": game_id, "_start_deck": start_deck, "started": datetime.now(),
+                          "start_failures": 3, "start_hints": 10, "start_number_of_cards": 5,
+                          "_start_player_id": user_ids[0], "state": constants.GAME_STARTED})
+        user_rows.extend({"_game_id": game_id, "_user_id": user_id} for user_id in user_ids)
+        turn_rows.extend({"_game_id": game_id, "turn_number": turn_number,
+                          "type": random_generator.choice([constants.TURN_PUT, constants.TURN_DESTROY,
+                                                           constants.TURN_HINT]),
+                          "_user_id": user_ids[turn_number % PLAYERS_PER_GAME], "_card": "000"}
+                         for turn_number in range(turns_per_game))
+
+    with engine.begin() as connection:
+        connection.execute(Game.__table__.insert(), game_rows)
+        connection.execute(UsersInGames.__table__.insert(), user_rows)
+        connection.execute(Turn.__table__.insert(), turn_rows)
+
+
+def measure(engine, number_of_games, repetitions, random_generator):
+    """
+    Return the median latency in milliseconds of every query for random games and users.
+    """
+    latencies = {}
+
+    with engine.connect() as connection:
+        for name, query in get_queries().items():
+            timings = []
+            for _ in range(repetitions):
+                game_id = random_generator.randint(1, number_of_games)
+                user_id = random_generator.randint(1, NUMBER_OF_USERS)
+
+                start_time = time.perf_counter()
+                query(connection, game_id, user_id)
+                timings.append(time.perf_counter() - start_time)
+
+            latencies[name] = statistics.median(timings) * 1000
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query latency with and without the turn indexes.")
+    parser.add_argument("--games", type=int, nargs="+", default=[1000, 10000, 30000],
+                        help="Number of games to measure at (ascending).")
+    parser.add_argument("--turns", type=int, default=40, help="Turns per game.")
+    parser.add_argument("--repetitions", type=int, default=200, help="Executions of every query per measurement.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engines = {with_indexes: create_database(os.path.join(directory, "indexes_{}.db".format(with_indexes)),
+                                                 with_indexes)
+                   for with_indexes in [False, True]}
+
+        print("{:>8} {:<22} {:>14} {:>14}".format("games", "query", "no index [ms]", "indexes [ms]"))
+
+        number_of_games = 0
+        for target_number_of_games in sorted(args.games):
+            latencies = {}
+            for with_indexes, engine in engines.items():
+                # Use the same games and the same queries for both databases
+                add_games(engine, number_of_games + 1, target_number_of_games, args.turns,
+                          random.Random(target_number_of_games))
+                latencies[with_indexes] = measure(engine, target_number_of_games, args.repetitions,
+                                                  random.Random(0))
+
+            number_of_games = target_number_of_games
+
+            for name in latencies[True]:
+                print("{:>8} {:<22} {:>14.3f} {:>14.3f}".format(number_of_games, name,
+                                                                latencies[False][name], latencies[True][name]))
+
+
+if __name__ == '__main__':
+    main()
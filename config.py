@@ -7,4 +7,41 @@ SQLALCHEMY_DATABASE_PATH = os.path.join(_basedir, 'app.db')
 SQLALCHEMY_DATABASE_URI = 'sqlite:///' + SQLALCHEMY_DATABASE_PATH
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-SECRET_KEY = 'This string will be replaced with a proper key in production.'
\ No newline at end of file
+SECRET_KEY = 'This string will be replaced with a proper key in production.'
+
+# Cache for the rendered game pages, see app/game/render_cache.py
+RENDER_CACHE_BACKEND = 'memory'
+RENDER_CACHE_SIZE = 1024
+RENDER_CACHE_PATH = os.path.join(_basedir, 'render_cache')
+# The sqlite backend stores the time of the last use of a page at most once in this interval (seconds)
+RENDER_CACHE_REFRESH_INTERVAL = 60
+
+# Waiting for game events, see app/game/notifications.py (in seconds)
+NOTIFICATION_HEARTBEAT = 15
+LONG_POLL_TIMEOUT = 30
+# Turns made by other processes (workers) are found by reading the game from the database in this interval (seconds)
+NOTIFICATION_REFRESH_INTERVAL = 5
+
+# Measure every request and serve the statistics under /instrumentation/stats, see app/instrumentation.py
+INSTRUMENTATION = False
+INSTRUMENTATION_WINDOW = 1000
+
+# Identity of the logged in users, see app/users/identity.py (TTL in seconds)
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 300
+USER_SESSION_RECORD = False
+
+# Database setup for many concurrent players, see app/database.py
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+}
+DATABASE_POOL_SIZE = 10
+DATABASE_MAX_OVERFLOW = 10
+DATABASE_POOL_TIMEOUT = 30
+DATABASE_READ_ONLY = False
+
+# How often a turn is tried again, if another turn of the same game was stored in the meantime
+MAKE_TURN_RETRIES = 3
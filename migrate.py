@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# Upgrade the schema of an existing database to the current models.
+# Use it with
+#
+#     python migrate.py [path/to/app.db]
+#
+# Without a path, the database configured in config.py is upgraded.
+import sys
+
+from sqlalchemy import create_engine
+
+from app import db
+from app.migrations import upgrade
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        engine = create_engine("sqlite:///" + sys.argv[1])
+    else:
+        engine = db.engine
+
+    applied_migrations = upgrade(engine)
+
+    if applied_migrations:
+        for migration_name in applied_migrations:
+            print("Applied {migration_name}".format(migration_name=migration_name))
+    else:
+        print("The database is already up to date.")
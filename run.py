@@ -1,2 +1,15 @@
+# Serve with gevent, if it is installed: then every client waiting for the events of a game
+# (see app/game/notifications.py) only needs a greenlet instead of a thread.
+try:
+    from gevent import monkey
+    monkey.patch_all()
+    from gevent.pywsgi import WSGIServer
+except ImportError:
+    WSGIServer = None
+
 from app import app
-app.run(debug=True)
+
+if WSGIServer is not None:
+    WSGIServer(("127.0.0.1", 5000), app).serve_forever()
+else:
+    app.run(debug=True, threaded=True)
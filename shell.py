@@ -5,6 +5,7 @@ from pprint import pprint
 from flask import *
 from app import *
 from app.game.models import User, Turn, Game
+from app.migrations import stamp
 
 
 def create_db():
@@ -12,6 +13,7 @@ def create_db():
     Convenience function to create the db file with all needed tables.
     """
     db.create_all()
+    stamp(db.engine)
 
 
 if __name__ == '__main__':
@@ -23,6 +25,7 @@ if __name__ == '__main__':
             os.unlink("app.db")
 
         db.create_all()
+        stamp(db.engine)
 
         user = User(u"test", "test@test.com", "pbkdf2:sha1:1000$VUu0UWDW$211afd0957df48d23553a119668dbc331b84c8cd")
         db.session.add(user)